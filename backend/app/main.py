@@ -1,9 +1,54 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.routes import auth, analytics, chat, reports, admin
+from app.database import get_db
+from app.services.analytics_service import warm_dashboard_cache
+from app.services.columnar_engine import engine
+from app.services.summary_store import refresh_worker
+from app.services.audit_sink import audit_sink
+from app.services.intent_router import intent_router
 
-app = FastAPI(title="InsightLens AI")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background = []
+    # Conversation / report logs are batched in the background, flushed on shutdown
+    await audit_sink.start(await get_db())
+
+    # Intent router: load vocabulary / train in the background; queries go to Gemini until ready
+    if intent_router.enabled:
+        intent_router.schedule_refresh(await get_db())
+
+    # Columnar analytics backend: load the review columns before serving
+    if engine.enabled:
+        await engine.load(await get_db())
+
+    # Optional: precompute dashboards for known scopes without delaying startup
+    if os.getenv("WARM_DASHBOARD_CACHE", "0") == "1":
+        db = await get_db()
+        background.append(asyncio.create_task(warm_dashboard_cache(db)))
+
+    # Optional: keep summaries of the most-viewed products fresh as reviews change
+    if os.getenv("SUMMARY_REFRESH", "0") == "1":
+        db = await get_db()
+        background.append(asyncio.create_task(refresh_worker(
+            db,
+            interval=float(os.getenv("SUMMARY_REFRESH_INTERVAL", "300")),
+            top_n=int(os.getenv("SUMMARY_REFRESH_TOP", "20"))
+        )))
+
+    yield
+
+    for task in background:
+        task.cancel()
+    await audit_sink.stop()
+
+
+app = FastAPI(title="InsightLens AI", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -5,6 +5,18 @@ from bson import ObjectId
 
 from app.utils.dependencies import get_current_user, require_admin
 from app.database import get_db
+from app.services.catalog_service import reassign_product_category
+from app.services.analytics_service import (
+    invalidate_allowed_categories, scope_cache_stats, dashboard_cache_stats
+)
+from app.services.columnar_engine import engine
+from app.services.answer_cache import answer_cache
+from app.services.intent_router import intent_router
+from app.services.gemini_gateway import gateway
+from app.utils.prompt_packing import packing_stats
+from app.utils.singleflight import single_flight_stats
+from app.services.audit_sink import audit_sink
+from app.services.chat_tools import registry as tool_registry
 
 router = APIRouter()
 
@@ -19,6 +31,11 @@ class RevokeCategoryRequest(BaseModel):
     category: str
 
 
+class ProductCategoryRequest(BaseModel):
+    product_id: int
+    category: str
+
+
 # ─── User Management ──────────────────────────────────────────────────────────
 
 @router.get("/users")
@@ -49,6 +66,15 @@ async def get_all_categories(admin=Depends(require_admin), db=Depends(get_db)):
     return sorted(categories)
 
 
+@router.put("/product-category")
+async def set_product_category(req: ProductCategoryRequest, admin=Depends(require_admin), db=Depends(get_db)):
+    """Move a product to another category; its reviews and rollup follow."""
+    result = await reassign_product_category(db, req.product_id, req.category)
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+
 # ─── Category Assignment ──────────────────────────────────────────────────────
 
 @router.post("/assign-category")
@@ -75,6 +101,7 @@ async def assign_category(req: AssignCategoryRequest, admin=Depends(require_admi
         "user_id": req.user_id,
         "category": req.category
     })
+    await invalidate_allowed_categories(db, req.user_id)
     return {"message": f"'{req.category}' assigned to analyst successfully"}
 
 
@@ -94,6 +121,8 @@ async def revoke_category(req: RevokeCategoryRequest, admin=Depends(require_admi
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
+    await invalidate_allowed_categories(db, req.user_id)
+
     return {"message": f"'{req.category}' revoked from analyst successfully"}
 
 
@@ -103,3 +132,28 @@ async def get_user_categories(user_id: str, admin=Depends(require_admin), db=Dep
     cursor = db.analyst_category.find({"user_id": user_id})
     cats = await cursor.to_list(length=100)
     return {"user_id": user_id, "categories": [c["category"] for c in cats]}
+
+
+# ─── Cache Diagnostics ────────────────────────────────────────────────────────
+
+@router.get("/cache-stats")
+async def cache_stats(admin=Depends(require_admin)):
+    """Hit / miss counters for the in-process caches of this worker."""
+    return {
+        "scope": scope_cache_stats(),
+        "dashboard": dashboard_cache_stats(),
+        "answers": answer_cache.stats(),
+        "engine": engine.stats(),
+        "intent_router": intent_router.stats(),
+        "gemini": gateway.stats(),
+        "prompt_packing": packing_stats(),
+        "single_flight": single_flight_stats(),
+        "audit_sink": audit_sink.stats(),
+        "tool_results": tool_registry.cache.stats()
+    }
+
+
+@router.get("/tool-stats")
+async def tool_stats(admin=Depends(require_admin)):
+    """Per chat tool: calls, cache hits, timeouts, invalid args, errors and a latency histogram (this worker)."""
+    return tool_registry.stats()
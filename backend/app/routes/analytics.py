@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends
-from typing import List, Optional
-from pydantic import BaseModel
+import json
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from datetime import date
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.services.analytics_service import (
-    get_product_reviews, sentiment_counts, get_dashboard_stats,
-    get_analytics_data, get_nps_for_category, get_trend_over_time, compare_products
+    get_product_nps, sentiment_counts, get_dashboard_stats,
+    get_analytics_data, get_nps_for_category, get_trend_over_time, compare_products,
+    parse_window, iter_reviews, get_reviews_page, parse_review_fields, parse_review_cursor,
+    serialize_review, REVIEW_PAGE_MAX, run_analytics_batch, MAX_COMPARE_PRODUCTS, COMPARE_LIMIT_ERROR
 )
-from app.services.nps_service import calculate_nps
 from app.utils.dependencies import get_current_user
 from app.database import get_db
 
 router = APIRouter()
 
+
+class DateWindow:
+    """Optional `from` / `to` query params (YYYY-MM-DD, both inclusive)."""
+    def __init__(
+        self,
+        date_from: Optional[date] = Query(None, alias="from"),
+        date_to: Optional[date] = Query(None, alias="to")
+    ):
+        self.date_from, self.date_to = parse_window(date_from, date_to)
+
 # ─── Existing Routes ──────────────────────────────────────────────────────────
 
 @router.get("/dashboard-stats")
-async def dashboard_stats(user=Depends(get_current_user), db=Depends(get_db)):
-    return await get_dashboard_stats(db, user["user_id"], user.get("role"))
+async def dashboard_stats(window: DateWindow = Depends(), user=Depends(get_current_user), db=Depends(get_db)):
+    return await get_dashboard_stats(db, user["user_id"], user.get("role"), window.date_from, window.date_to)
 
 
 @router.get("/products")
@@ -42,36 +56,57 @@ async def get_products(user=Depends(get_current_user), db=Depends(get_db)):
 async def analytics_data(
     category: Optional[str] = None,
     product_id: Optional[int] = None,
+    window: DateWindow = Depends(),
     user=Depends(get_current_user),
     db=Depends(get_db)
 ):
-    return await get_analytics_data(db, user["user_id"], user.get("role"), category, product_id)
+    return await get_analytics_data(
+        db, user["user_id"], user.get("role"), category, product_id, window.date_from, window.date_to
+    )
 
 
 class InsightsRequest(BaseModel):
     category: Optional[str] = None
     product_id: Optional[int] = None
+    mode: Literal["sample", "full"] = "sample"   # full: map-reduce over every review
 
 
 @router.post("/insights")
 async def get_insights(req: InsightsRequest, user=Depends(get_current_user), db=Depends(get_db)):
-    from app.services.analytics_service import get_filtered_reviews
-    from app.services.llm_service import summarize_reviews
-
-    reviews = await get_filtered_reviews(db, user["user_id"], user.get("role"), req.category, req.product_id)
+    from app.services.analytics_service import get_review_sample
+    from app.services.summary_store import get_summary, TEMPLATES
+
+    if req.mode == "full":
+        from app.services.map_reduce_summary import summarize_all
+        from app.services.llm_service import summary_error_message
+        try:
+            full = await summarize_all(
+                db, TEMPLATES["insights"], user["user_id"], user.get("role"), req.category, req.product_id
+            )
+        except Exception as e:
+            return {"insights": summary_error_message(e)}
+        if not full["reviews"]:
+            return {"insights": "No reviews found for the selected filters."}
+        return {"insights": full["summary"], "reviews_analyzed": full["reviews"], "chunks": full["chunks"]}
+
+    # A rating-stratified sample keeps the themes representative of the whole scope
+    reviews, _ = await get_review_sample(
+        db, user["user_id"], user.get("role"), req.category, req.product_id, k=25, stratified=True
+    )
     if not reviews:
         return {"insights": "No reviews found for the selected filters."}
 
-    prompt = "Please provide 3-4 bullet points summarizing the main themes, complaints, and highlights from these reviews."
-    insights = await summarize_reviews(prompt, reviews)
+    # Same reviews + same prompt -> the stored summary, no Gemini call
+    insights = await get_summary(
+        db, TEMPLATES["insights"], reviews, req.category, req.product_id, stratified=True
+    )
     return {"insights": insights}
 
 
 @router.get("/nps/{product_id}")
 async def nps(product_id: int, user=Depends(get_current_user), db=Depends(get_db)):
-    reviews = await get_product_reviews(db, product_id, user["user_id"], user.get("role"))
-    score = calculate_nps(reviews)
-    return {"nps_score": score}
+    acc = await get_product_nps(db, product_id, user["user_id"], user.get("role"))
+    return {"nps_score": acc.score}
 
 
 @router.get("/sentiment/{product_id}")
@@ -83,24 +118,95 @@ async def sentiment(product_id: int, user=Depends(get_current_user), db=Depends(
 # ─── Phase 3 — New Routes ────────────────────────────────────────────────────
 
 @router.get("/category-nps")
-async def category_nps(category: str, user=Depends(get_current_user), db=Depends(get_db)):
+async def category_nps(category: str, window: DateWindow = Depends(), user=Depends(get_current_user), db=Depends(get_db)):
     """NPS score for an entire product category."""
-    return await get_nps_for_category(db, category, user["user_id"], user.get("role"))
+    return await get_nps_for_category(db, category, user["user_id"], user.get("role"), window.date_from, window.date_to)
 
 
 @router.get("/trend")
-async def trend(category: str, user=Depends(get_current_user), db=Depends(get_db)):
+async def trend(category: str, window: DateWindow = Depends(), user=Depends(get_current_user), db=Depends(get_db)):
     """Monthly NPS trend + review volume for a category (last 6-12 months)."""
-    return await get_trend_over_time(db, category, user["user_id"], user.get("role"))
+    return await get_trend_over_time(db, category, user["user_id"], user.get("role"), window.date_from, window.date_to)
 
 
 class CompareRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     product_ids: List[int]
+    date_from: Optional[date] = Field(None, alias="from")
+    date_to: Optional[date] = Field(None, alias="to")
 
 
 @router.post("/compare")
 async def compare(req: CompareRequest, user=Depends(get_current_user), db=Depends(get_db)):
-    """Side-by-side comparison of up to 5 products."""
-    if len(req.product_ids) > 5:
-        return {"error": "Maximum 5 products can be compared at once"}
-    return await compare_products(db, req.product_ids, user["user_id"], user.get("role"))
\ No newline at end of file
+    """Side-by-side comparison of up to MAX_COMPARE_PRODUCTS products."""
+    if len(req.product_ids) > MAX_COMPARE_PRODUCTS:
+        return {"error": COMPARE_LIMIT_ERROR}
+    date_from, date_to = parse_window(req.date_from, req.date_to)
+    return await compare_products(db, req.product_ids, user["user_id"], user.get("role"), date_from, date_to)
+
+
+# ─── Review Listing ───────────────────────────────────────────────────────────
+
+@router.get("/reviews")
+async def list_reviews(
+    category: Optional[str] = None,
+    product_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated review fields"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=REVIEW_PAGE_MAX),
+    stream: bool = Query(False, description="Stream every matching review as NDJSON"),
+    window: DateWindow = Depends(),
+    user=Depends(get_current_user),
+    db=Depends(get_db)
+):
+    """
+    Scoped review listing. Pages are keyset-paginated on _id: pass the
+    returned `next_cursor` back as `cursor`. With `stream=true` the whole
+    result is sent as newline-delimited JSON while the DB cursor is read.
+    """
+    try:
+        field_list = parse_review_fields(fields)
+        after = parse_review_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    role = user.get("role")
+    if stream:
+        async def ndjson():
+            async for doc in iter_reviews(db, user["user_id"], role, category, product_id, field_list,
+                                          after, None, window.date_from, window.date_to):
+                yield json.dumps(serialize_review(doc)) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    return await get_reviews_page(db, user["user_id"], role, category, product_id, field_list,
+                                  after, limit, window.date_from, window.date_to)
+
+
+# ─── Batch ────────────────────────────────────────────────────────────────────
+
+class BatchItem(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    metric: str   # dashboard_stats | analytics_data | category_nps | trend | compare | best_worst | sentiment
+    key: Optional[str] = None
+    category: Optional[str] = None
+    product_id: Optional[int] = None
+    product_ids: Optional[List[int]] = None
+    date_from: Optional[date] = Field(None, alias="from")
+    date_to: Optional[date] = Field(None, alias="to")
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=20)
+
+
+@router.post("/batch")
+async def batch(req: BatchRequest, user=Depends(get_current_user), db=Depends(get_db)):
+    """
+    Several analytics metrics in one round trip, run concurrently.
+    Results are keyed by each item's `key` (default: its metric name);
+    a failing item carries {"error": ...} without failing the batch.
+    """
+    items = [item.model_dump() for item in req.requests]
+    return {"results": await run_analytics_batch(db, user["user_id"], user.get("role"), items)}
@@ -2,18 +2,27 @@
 chat.py — Chat route using Gemini tool-calling via llm_service.run_tool_call
 
 Request:  { query: str, context_product_id?: int }
-Response: { answer: str, tool_used: str, tool_args: dict, chart_data: dict | None }
+Response: { answer: str, tool_used: str, tool_args: dict, chart_data: dict | None, charts: list }
+
+Compound questions run several tools in one turn: tool_used is then "multiple",
+tool_args is { calls: [{ tool, args }] } and charts holds every chart.
+
+/chat/stream takes the same request and answers with server-sent events:
+tool, result (tool result + charts), token..., done (the /ask response).
 
 Every conversation is logged with:
-  user_id, query, tool_used, tool_args, answer, chart_data (bool), timestamp
+  user_id, query, tool_used, tool_args, answer, chart_data (bool), routed_by, timestamp
 """
 
+import json
 from datetime import datetime
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
-from app.services.llm_service import run_tool_call
+from app.services.llm_service import run_tool_call, stream_tool_call
+from app.services.audit_sink import audit_sink
 from app.utils.dependencies import get_current_user
 from app.database import get_db
 
@@ -39,7 +48,7 @@ async def ask(req: ChatRequest, user=Depends(get_current_user), db=Depends(get_d
     and returns a formatted answer + optional chart data.
     """
     if not req.query.strip():
-        return {"answer": "Please enter a question.", "tool_used": None, "chart_data": None}
+        return {"answer": "Please enter a question.", "tool_used": None, "chart_data": None, "charts": []}
 
     result = await run_tool_call(
         query=req.query,
@@ -49,24 +58,68 @@ async def ask(req: ChatRequest, user=Depends(get_current_user), db=Depends(get_d
         context_product_id=req.context_product_id
     )
 
-    # Traceability: log the full conversation turn
-    await db.conversations.insert_one({
+    await _log_turn(db, user, req.query, result)
+    return result
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/stream")
+async def ask_stream(req: ChatRequest, user=Depends(get_current_user), db=Depends(get_db)):
+    """
+    Streaming variant of /ask: the tool choice and tool result are sent as soon
+    as they are known, then the answer token by token. Logged once complete.
+    """
+    async def events():
+        if not req.query.strip():
+            answer = "Please enter a question."
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {"answer": answer, "tool_used": None, "chart_data": None, "charts": []})
+            return
+
+        try:
+            async for event, data in stream_tool_call(
+                query=req.query,
+                db=db,
+                user_id=user["user_id"],
+                role=user.get("role"),
+                context_product_id=req.context_product_id
+            ):
+                yield _sse(event, data)
+                if event == "done":
+                    await _log_turn(db, user, req.query, data)
+        except Exception as e:
+            print(f"Chat stream failed: {e}")
+            yield _sse("error", {"message": "Something went wrong while answering. Please try again."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _log_turn(db, user, query: str, result: dict):
+    # Traceability: log the full conversation turn (write-behind, off the response path)
+    await audit_sink.write(db, "conversations", {
         "user_id": user["user_id"],
-        "query": req.query,
+        "query": query,
         "tool_used": result.get("tool_used"),
         "tool_args": result.get("tool_args", {}),
         "answer": result.get("answer"),
         "has_chart": result.get("chart_data") is not None,
+        "routed_by": result.get("routed_by"),
+        "timings": result.get("timings"),
         "timestamp": datetime.utcnow().isoformat()
     })
 
-    return result
-
 
 @router.post("/save")
 async def save_report(req: SaveReportRequest, user=Depends(get_current_user), db=Depends(get_db)):
     """Save a chat answer as a named report for later retrieval."""
-    await db.reports.insert_one({
+    await audit_sink.write(db, "reports", {
         "user_id": user["user_id"],
         "product_id": req.product_id,
         "query": req.query,
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from app.utils.dependencies import get_current_user
 from app.database import get_db
+from app.services.pipeline_builder import build_pipeline, lookup
 
 router = APIRouter()
 
@@ -10,29 +11,23 @@ async def my_reports(user=Depends(get_current_user), db = Depends(get_db)):
     if user.get("role") != "admin":
         match_stage = {"user_id": user["user_id"]}
         
-    pipeline = []
-    if match_stage:
-        pipeline.append({"$match": match_stage})
-        
-    pipeline.extend([
-        {"$lookup": {
-            "from": "products",
-            "localField": "product_id",
-            "foreignField": "id",
-            "as": "product_info"
-        }},
-        {"$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": True}},
-        {"$project": {
-            "_id": 1,
-            "user_id": 1,
-            "question": 1,
-            "response": 1,
-            "timestamp": 1,
-            "product_id": 1,
-            "product_name": "$product_info.name"
-        }},
-        {"$sort": {"timestamp": -1}}
-    ])
+    pipeline = build_pipeline(
+        match=match_stage,
+        joins=[lookup("products", "product_id", "id", "product_info", fields=["name"])],
+        stages=[
+            {"$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "_id": 1,
+                "user_id": 1,
+                "question": 1,
+                "response": 1,
+                "timestamp": 1,
+                "product_id": 1,
+                "product_name": "$product_info.name"
+            }},
+            {"$sort": {"timestamp": -1}}
+        ]
+    )
     
     reports_cursor = db.reports.aggregate(pipeline)
     formatted_reports = []
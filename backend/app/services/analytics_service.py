@@ -1,27 +1,168 @@
+import os
+import copy
+import json
+import asyncio
+import hashlib
+import inspect
+import traceback
+from datetime import date, datetime, time, timedelta
+
+from bson import ObjectId
+
+from app.services.stats_service import (
+    RATING_KEYS, data_version, month_start, rating_accumulators, rollup_fields
+)
+from app.services.pipeline_builder import scope_match, build_pipeline, lookup
+from app.services.columnar_engine import engine
+from app.services.nps_service import NPSAccumulator, star_bucket_bounds
+from app.utils.cache import TTLCache, VersionCounter, MISSING
+from app.utils.singleflight import single_flight
+
+# Per-user category scope, shared across requests in this worker.
+# Assign/revoke bump the "analyst_scope" version so other workers drop theirs too.
+_scope_cache = TTLCache(
+    maxsize=int(os.getenv("SCOPE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SCOPE_CACHE_TTL", "60"))
+)
+_scope_version = VersionCounter("analyst_scope")
+
+
 async def get_allowed_categories(db, user_id):
+    _scope_cache.sync_version(await _scope_version.current(db))
+
+    cached = _scope_cache.get(user_id)
+    if cached is not MISSING:
+        return list(cached)
+
     cursor = db.analyst_category.find({"user_id": user_id})
     rows = await cursor.to_list(length=100)
-    return [r["category"] for r in rows]
+    categories = [r["category"] for r in rows]
+    _scope_cache.set(user_id, tuple(categories))
+    return categories
+
+
+async def invalidate_allowed_categories(db, user_id):
+    """Forget a user's cached scope here and signal every other worker to do the same."""
+    _scope_cache.pop(user_id)
+    _scope_cache.sync_version(await _scope_version.bump(db))
+
+
+def scope_cache_stats() -> dict:
+    return _scope_cache.stats()
+
+
+async def _resolve_scope(db, user_id, role, allowed_cats=None) -> list:
+    """The caller's categories ([] for admin); a batch passes the scope it already resolved."""
+    if role == "admin":
+        return []
+    return allowed_cats if allowed_cats is not None else await get_allowed_categories(db, user_id)
+
+
+def scope_fingerprint(role, allowed_cats) -> str:
+    """Stable cache key for a category scope; analysts with the same set share it."""
+    if role == "admin":
+        return "admin"
+    joined = "\x1f".join(sorted(set(allowed_cats)))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+def _scoped_single_flight(fn):
+    """
+    single_flight keyed on (function, scope fingerprint, remaining args) for
+    functions taking (db, role, allowed_cats, ...): users who share a scope
+    share one in-flight computation instead of each keying on their user_id.
+    """
+    signature = inspect.signature(fn)
+
+    def key(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        rest = dict(bound.arguments)
+        rest.pop("db")
+        scope = scope_fingerprint(rest.pop("role"), rest.pop("allowed_cats"))
+        return json.dumps([fn.__name__, scope, rest], sort_keys=True, default=str)
+
+    return single_flight(key=key)(fn)
+
+
+# ─── Date Windows ─────────────────────────────────────────────────────────────
+
+def _as_datetime(value, end: bool):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value) if len(value) <= 10 else datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    # A bare date: `from` starts that day, `to` includes all of it
+    return datetime.combine(value, time.min) + (timedelta(days=1) if end else timedelta(0))
+
+
+def parse_window(date_from=None, date_to=None):
+    """
+    Normalize from/to (date, datetime or ISO strings) into a half-open
+    [start, end) datetime window. Raises ValueError on malformed input.
+    """
+    return _as_datetime(date_from, end=False), _as_datetime(date_to, end=True)
+
+
+def _window_filter(field, date_from, date_to) -> dict:
+    cond = {}
+    if date_from is not None:
+        cond["$gte"] = date_from
+    if date_to is not None:
+        cond["$lt"] = date_to
+    return {field: cond} if cond else {}
+
+
+def _avg_rating(rating_sum, total, digits: int = 1):
+    """
+    Mean rating for display. The sum is rounded first: rollup $inc, $sum and
+    the columnar engine add in different orders, and that float noise must
+    not flip the last digit of an average that sits on a half (3.05).
+    """
+    return round(round(rating_sum, 6) / total, digits) if total > 0 else 0
+
+
+def _histogram_sums() -> dict:
+    """$group accumulators adding rollup histograms into rating_1..rating_5 (see NPSAccumulator)."""
+    return {f"rating_{k}": {"$sum": f"$histogram.{k}"} for k in RATING_KEYS}
+
+
+def _rollup_pipeline(db, match, date_from=None, date_to=None, rows=None, stages=(), names=False):
+    """
+    Return (collection, pipeline) yielding product_stats-shaped rows for `match`.
+
+    Without a window this reads the product_stats rollup directly. With one, it
+    groups just the window's reviews per product, using the
+    (category|product_id, review_date) indexes. `rows` filters the rollup rows
+    (e.g. a minimum review_count); `names` joins product names when needed.
+    """
+    window = _window_filter("review_date", date_from, date_to)
+    if not window:
+        return db.product_stats, build_pipeline(match={**match, **(rows or {})}, stages=stages)
+
+    per_product = [{"$group": {"_id": "$product_id", "category": {"$first": "$category"}, **rating_accumulators()}}]
+    project = {"_id": 0, "product_id": "$_id", "category": 1, **rollup_fields()}
+    if names:
+        per_product.append(lookup("products", "_id", "id", "product", fields=["name"]))
+        project["name"] = {"$ifNull": [{"$first": "$product.name"}, ""]}
+    per_product.append({"$project": project})
+    if rows:
+        per_product.append({"$match": rows})
+
+    return db.reviews, build_pipeline(match={**match, **window}, stages=per_product + list(stages))
+
 
 async def get_product_reviews(db, product_id, user_id, role):
     allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
-    
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$lookup": {
-            "from": "products",
-            "localField": "product_id",
-            "foreignField": "id",
-            "as": "product_info"
-        }},
-        {"$unwind": "$product_info"}
-    ]
-    
-    if role != "admin":
-        if not allowed_cats:
-            return []
-        pipeline.append({"$match": {"product_info.category": {"$in": allowed_cats}}})
-        
+
+    if role != "admin" and not allowed_cats:
+        return []
+
+    # Reviews carry their product's category, so scoping needs no join
+    pipeline = build_pipeline(match=scope_match(role, allowed_cats, product_id=product_id))
+
     cursor = db.reviews.aggregate(pipeline)
     reviews = []
     async for doc in cursor:
@@ -29,47 +170,182 @@ async def get_product_reviews(db, product_id, user_id, role):
     return reviews
 
 
-async def sentiment_counts(db, product_id, user_id, role):
+SUMMARY_FIELDS = {"_id": 0, "review_text": 1, "rating": 1, "helpful_votes": 1}
+
+
+def _stratified_quotas(histogram: dict, k: int) -> dict:
+    """
+    Split `k` across rating buckets in proportion to their review counts
+    (largest remainder), guaranteeing one slot to every non-empty bucket
+    when k allows so minority ratings are heard.
+    """
+    counts = {b: int(histogram.get(b, 0)) for b in RATING_KEYS}
+    total = sum(counts.values())
+    if total <= k:
+        return counts
+
+    present = [b for b in RATING_KEYS if counts[b] > 0]
+    quotas = {b: 0 for b in RATING_KEYS}
+    if k >= len(present):
+        for b in present:
+            quotas[b] = 1
+    budget = k - sum(quotas.values())
+
+    shares = {b: budget * counts[b] / total for b in present}
+    for b in present:
+        quotas[b] += min(int(shares[b]), counts[b] - quotas[b])
+    # Largest remainder first; keep going round while full buckets push slots elsewhere
+    leftover = k - sum(quotas.values())
+    order = sorted(present, key=lambda b: shares[b] - int(shares[b]), reverse=True)
+    while leftover > 0:
+        open_buckets = [b for b in order if quotas[b] < counts[b]]
+        if not open_buckets:
+            break
+        for b in open_buckets[:leftover]:
+            quotas[b] += 1
+            leftover -= 1
+    return quotas
+
+
+def _rating_range(bucket: str) -> dict:
+    """Ratings that fall into a histogram bucket (see nps_service.star_bucket_bounds)."""
+    low, high = star_bucket_bounds(bucket)
+    cond = {}
+    if low is not None:
+        cond["$gte"] = low
+    if high is not None:
+        cond["$lt"] = high
+    return cond
+
+
+async def get_review_sample(db, user_id, role, category=None, product_id=None, k=25, stratified=False):
+    """
+    Up to `k` reviews for summarization, selected in the database.
+
+    Default: the k most helpful, read off the (product_id|category, helpful_votes)
+    index with $sort + $limit. `stratified` instead splits k across star
+    ratings in proportion to the rollup histogram and reads the most helpful
+    reviews of each rating, so at most k documents are fetched either way.
+    Returns (reviews, total_reviews_in_scope).
+    """
     allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
-    
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$lookup": {
-            "from": "products",
-            "localField": "product_id",
-            "foreignField": "id",
-            "as": "product_info"
-        }},
-        {"$unwind": "$product_info"}
-    ]
-    
-    if role != "admin":
-        if not allowed_cats:
-            return 0, 0
-        pipeline.append({"$match": {"product_info.category": {"$in": allowed_cats}}})
-        
-    pipeline.append({
-        "$group": {
-            "_id": "$sentiment",
-            "count": {"$sum": 1}
-        }
-    })
-    
-    cursor = db.reviews.aggregate(pipeline)
-    happy, unhappy = 0, 0
-    async for doc in cursor:
-        if doc["_id"] == "happy":
-            happy = doc["count"]
-        elif doc["_id"] == "unhappy":
-            unhappy = doc["count"]
-            
-    return happy, unhappy
 
+    if role != "admin" and not allowed_cats:
+        return [], 0
+    return await _review_sample(db, role, allowed_cats, category, product_id, k, stratified)
+
+
+@_scoped_single_flight
+async def _review_sample(db, role, allowed_cats, category=None, product_id=None, k=25, stratified=False):
+    match = scope_match(role, allowed_cats, category, product_id)
+    cursor = db.product_stats.aggregate(build_pipeline(match=match, stages=[
+        {"$group": {"_id": None, **_histogram_sums()}}
+    ]))
+    rollup = await cursor.to_list(length=1)
+    acc = NPSAccumulator.from_histogram(rollup[0], prefix="rating_") if rollup else NPSAccumulator()
+    if not acc.total:
+        return [], 0
+    total = acc.total
+
+    def top(extra, n):
+        return db.reviews.find(
+            scope_match(role, allowed_cats, category, product_id, extra=extra), SUMMARY_FIELDS
+        ).sort("helpful_votes", -1).limit(n).to_list(length=n)
+
+    if not stratified:
+        return await top({}, k), total
+
+    quotas = _stratified_quotas(acc.histogram(), k)
+    parts = await asyncio.gather(*[
+        top({"rating": _rating_range(b)}, n) for b, n in quotas.items() if n > 0
+    ])
+    return [r for part in parts for r in part], total
+
+
+async def sentiment_counts(db, product_id, user_id, role, date_from=None, date_to=None, *, allowed_cats=None):
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
+
+    if role != "admin" and not allowed_cats:
+        return 0, 0
+
+    coll, pipeline = _rollup_pipeline(
+        db, scope_match(role, allowed_cats, product_id=product_id), date_from, date_to,
+        stages=[{"$project": {"_id": 0, "happy": 1, "unhappy": 1}}]
+    )
 
-async def get_dashboard_stats(db, user_id, role):
+    cursor = coll.aggregate(pipeline)
+    result = await cursor.to_list(length=1)
+    if not result:
+        return 0, 0
+    return result[0]["happy"], result[0]["unhappy"]
+
+
+async def get_product_nps(db, product_id, user_id, role, date_from=None, date_to=None) -> NPSAccumulator:
+    """Star-bucket counts for one product, read from its rollup row (no review documents)."""
     allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
-    
-    match_stage = {"$match": {"category": {"$in": allowed_cats}}} if (role != "admin" and allowed_cats) else {}
+
+    if role != "admin" and not allowed_cats:
+        return NPSAccumulator()
+
+    coll, pipeline = _rollup_pipeline(
+        db, scope_match(role, allowed_cats, product_id=product_id), date_from, date_to,
+        stages=[{"$project": {"_id": 0, "histogram": 1}}]
+    )
+
+    cursor = coll.aggregate(pipeline)
+    result = await cursor.to_list(length=1)
+    return NPSAccumulator.from_histogram(result[0]["histogram"]) if result else NPSAccumulator()
+
+
+def _dashboard_facets() -> dict:
+    """
+    The three dashboard sections as sub-pipelines over product_stats rows.
+    Run together under one $facet so the rollup is scanned once per request.
+    """
+    return {
+        # 1. Category Performance
+        "categories": [
+            {"$group": {
+                "_id": "$category",
+                "total_reviews": {"$sum": "$review_count"},
+                "rating_sum": {"$sum": "$rating_sum"},
+                **_histogram_sums()
+            }},
+            {"$sort": {"total_reviews": -1}},
+            {"$limit": 5}
+        ],
+        # 2. Product Performance
+        "products": [
+            {"$match": {"review_count": {"$gte": 5}}},
+            {"$project": {
+                "_id": 0, "name": 1, "category": 1, "review_count": 1,
+                "rating_sum": 1, "histogram": 1
+            }}
+        ],
+        # 3. Overall KPIs
+        "kpis": [
+            {"$group": {
+                "_id": None,
+                "total_reviews": {"$sum": "$review_count"},
+                "happy": {"$sum": "$happy"},
+                "unhappy": {"$sum": "$unhappy"},
+                **_histogram_sums()
+            }}
+        ]
+    }
+
+
+# Dashboard results shared by every user with the same scope fingerprint.
+# Entries die when the review data version moves (ingest, rebuild, reassignment).
+_dashboard_cache = TTLCache(
+    maxsize=int(os.getenv("DASHBOARD_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+)
+
+
+async def get_dashboard_stats(db, user_id, role, date_from=None, date_to=None, *, allowed_cats=None):
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
+
     if role != "admin" and not allowed_cats:
         return {
             "category_performance": [], "top_products": [], "bad_products": [],
@@ -78,121 +354,109 @@ async def get_dashboard_stats(db, user_id, role):
             "rating_distribution": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
         }
 
-    # Pipeline for Products + Reviews data combined
-    pipeline = []
-    if match_stage:
-        pipeline.append(match_stage)
-        
-    pipeline.extend([
-        {"$lookup": {
-            "from": "reviews",
-            "localField": "id",
-            "foreignField": "product_id",
-            "as": "reviews"
-        }},
-        {"$unwind": {"path": "$reviews", "preserveNullAndEmptyArrays": False}},
-        {"$project": {
-            "id": 1,
-            "name": 1,
-            "category": 1,
-            "rating": "$reviews.rating",
-            "is_promoter": {"$cond": [{"$gte": ["$reviews.rating", 4]}, 1, 0]},
-            "is_detractor": {"$cond": [{"$lte": ["$reviews.rating", 2]}, 1, 0]},
-        }}
+    return copy.deepcopy(await _cached_dashboard_stats(db, role, allowed_cats, date_from, date_to))
+
+
+async def _cached_dashboard_stats(db, role, allowed_cats, date_from=None, date_to=None):
+    version = await data_version.current(db)
+    _dashboard_cache.sync_version(version)
+
+    key = scope_fingerprint(role, allowed_cats)
+    if date_from is not None or date_to is not None:
+        key = f"{key}|{date_from.isoformat() if date_from else ''}|{date_to.isoformat() if date_to else ''}"
+    cached = _dashboard_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    # Concurrent misses for the same scope and data version wait on one computation;
+    # a request that saw a newer version never joins a computation started before it
+    return await _fill_dashboard_cache(db, key, version, role, allowed_cats, date_from, date_to)
+
+
+@single_flight(key=lambda db, key, version, *_: (key, version), copy_result=False)
+async def _fill_dashboard_cache(db, key, version, role, allowed_cats, date_from=None, date_to=None):
+    result = await _compute_dashboard_stats(db, role, allowed_cats, date_from, date_to)
+    if _dashboard_cache.version == version:
+        _dashboard_cache.set(key, result)
+    return result
+
+
+async def warm_dashboard_cache(db) -> int:
+    """Precompute the dashboard for the admin scope and every distinct analyst scope."""
+    cursor = db.analyst_category.aggregate([
+        {"$group": {"_id": "$user_id", "categories": {"$addToSet": "$category"}}}
     ])
-    
-    # 1. Category Performance Pipeline
-    cat_pipeline = pipeline + [
-        {"$group": {
-            "_id": "$category",
-            "total_reviews": {"$sum": 1},
-            "avg_rating": {"$avg": "$rating"},
-            "promoters": {"$sum": "$is_promoter"},
-            "detractors": {"$sum": "$is_detractor"}
-        }},
-        {"$sort": {"total_reviews": -1}},
-        {"$limit": 5}
-    ]
-    
-    cat_cursor = db.products.aggregate(cat_pipeline)
+    scopes = {"admin": ("admin", [])}
+    async for row in cursor:
+        if row["categories"]:
+            scopes.setdefault(scope_fingerprint("analyst", row["categories"]), ("analyst", row["categories"]))
+
+    for role, cats in scopes.values():
+        await _cached_dashboard_stats(db, role, cats)
+    return len(scopes)
+
+
+def dashboard_cache_stats() -> dict:
+    return {**_dashboard_cache.stats(), "inflight": _fill_dashboard_cache.flight.inflight}
+
+
+async def _compute_dashboard_stats(db, role, allowed_cats, date_from=None, date_to=None):
+    if engine.enabled:
+        facets = await engine.dashboard_facets(db, role, allowed_cats, date_from, date_to)
+    else:
+        # Single scan of the per-product rows; all three sections come back together
+        coll, pipeline = _rollup_pipeline(
+            db, scope_match(role, allowed_cats), date_from, date_to,
+            rows={"review_count": {"$gt": 0}},
+            stages=[{"$facet": _dashboard_facets()}],
+            names=True
+        )
+
+        cursor = coll.aggregate(pipeline)
+        result = await cursor.to_list(length=1)
+        facets = result[0] if result else {"categories": [], "products": [], "kpis": []}
+
     categories = []
-    async for stat in cat_cursor:
-        nps = ((stat["promoters"] - stat["detractors"]) / stat["total_reviews"] * 100) if stat["total_reviews"] > 0 else 0
+    for stat in facets["categories"]:
         categories.append({
             "category": stat["_id"],
-            "nps": round(nps),
-            "avg_rating": round(stat["avg_rating"], 1) if stat["avg_rating"] else 0
+            "nps": NPSAccumulator.from_histogram(stat, prefix="rating_").score,
+            "avg_rating": _avg_rating(stat["rating_sum"], stat["total_reviews"])
         })
 
-    # 2. Product Performance Pipeline
-    prod_pipeline = pipeline + [
-        {"$group": {
-            "_id": "$id",
-            "name": {"$first": "$name"},
-            "category": {"$first": "$category"},
-            "total_reviews": {"$sum": 1},
-            "avg_rating": {"$avg": "$rating"},
-            "promoters": {"$sum": "$is_promoter"},
-            "detractors": {"$sum": "$is_detractor"}
-        }},
-        {"$match": {"total_reviews": {"$gte": 5}}}
-    ]
-    
-    prod_cursor = db.products.aggregate(prod_pipeline)
     product_scores = []
-    async for p in prod_cursor:
-        nps = ((p["promoters"] - p["detractors"]) / p["total_reviews"] * 100) if p["total_reviews"] > 0 else 0
+    for p in facets["products"]:
+        total = p["review_count"]
         name = p["name"]
         product_scores.append({
             "name": name[:30] + '...' if len(name) > 30 else name,
             "category": p["category"],
-            "nps": round(nps),
-            "rating": round(p["avg_rating"], 1) if p["avg_rating"] else 0
+            "nps": NPSAccumulator.from_histogram(p["histogram"]).score,
+            "rating": _avg_rating(p["rating_sum"], total)
         })
-        
+
     product_scores.sort(key=lambda x: x["nps"], reverse=True)
-    
+
     top_products = product_scores[:5]
     bad_products = product_scores[-5:]
     bad_products.sort(key=lambda x: x["nps"])
 
-    # 3. Overall KPIs Pipeline
-    kpi_pipeline = pipeline + [
-        {"$group": {
-            "_id": None,
-            "total_reviews": {"$sum": 1},
-            "promoters": {"$sum": "$is_promoter"},
-            "detractors": {"$sum": "$is_detractor"},
-            "happy": {"$sum": {"$cond": [{"$gte": ["$rating", 4]}, 1, 0]}},
-            "unhappy": {"$sum": {"$cond": [{"$lte": ["$rating", 3]}, 1, 0]}},
-            "rating_1": {"$sum": {"$cond": [{"$eq": ["$rating", 1]}, 1, 0]}},
-            "rating_2": {"$sum": {"$cond": [{"$eq": ["$rating", 2]}, 1, 0]}},
-            "rating_3": {"$sum": {"$cond": [{"$eq": ["$rating", 3]}, 1, 0]}},
-            "rating_4": {"$sum": {"$cond": [{"$eq": ["$rating", 4]}, 1, 0]}},
-            "rating_5": {"$sum": {"$cond": [{"$eq": ["$rating", 5]}, 1, 0]}}
-        }}
-    ]
-    
-    kpi_cursor = db.products.aggregate(kpi_pipeline)
     kpis = {"nps": 0, "total_reviews": 0, "happy_pct": 0, "worst_product": "N/A"}
     satisfaction = {"happy": 0, "unhappy": 0}
     rating_distribution = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
 
-    async for stat in kpi_cursor:
+    for stat in facets["kpis"]:
         total = stat["total_reviews"]
         if total > 0:
             kpis["total_reviews"] = total
-            kpis["nps"] = round(((stat["promoters"] - stat["detractors"]) / total) * 100)
+            kpis["nps"] = NPSAccumulator.from_histogram(stat, prefix="rating_").score
             kpis["happy_pct"] = round((stat["happy"] / total) * 100)
-        
+
         satisfaction["happy"] = stat["happy"]
         satisfaction["unhappy"] = stat["unhappy"]
-        
-        rating_distribution["1"] = stat["rating_1"]
-        rating_distribution["2"] = stat["rating_2"]
-        rating_distribution["3"] = stat["rating_3"]
-        rating_distribution["4"] = stat["rating_4"]
-        rating_distribution["5"] = stat["rating_5"]
+
+        for k in RATING_KEYS:
+            rating_distribution[k] = stat[f"rating_{k}"]
 
     if bad_products:
         kpis["worst_product"] = bad_products[0]["name"]
@@ -207,114 +471,172 @@ async def get_dashboard_stats(db, user_id, role):
     }
 
 async def get_filtered_reviews(db, user_id, role, category=None, product_id=None):
+    """First 100 scoped reviews (in _id order), text fields only."""
+    return [doc async for doc in iter_reviews(
+        db, user_id, role, category, product_id,
+        fields=["rating", "review_text", "helpful_votes"], limit=100
+    )]
+
+
+# ─── Review Listing ───────────────────────────────────────────────────────────
+
+REVIEW_FIELDS = ("product_id", "category", "rating", "review_text", "review_date", "sentiment", "helpful_votes")
+DEFAULT_REVIEW_FIELDS = ("product_id", "rating", "review_text", "review_date")
+REVIEW_PAGE_MAX = 500
+
+
+def parse_review_fields(fields=None) -> list:
+    """Validate a comma-separated (or list) field selection; ValueError on unknown names."""
+    if not fields:
+        return list(DEFAULT_REVIEW_FIELDS)
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(fields) - set(REVIEW_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown review field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_review_cursor(token):
+    """A page cursor is the hex _id of the last review returned; ValueError if malformed."""
+    if not token:
+        return None
+    if not ObjectId.is_valid(token):
+        raise ValueError("Invalid cursor")
+    return ObjectId(token)
+
+
+def serialize_review(doc: dict) -> dict:
+    """JSON-safe review: `_id` becomes the string `id`, dates become ISO strings."""
+    out = {"id": str(doc["_id"])}
+    for k, v in doc.items():
+        if k != "_id":
+            out[k] = v.isoformat() if isinstance(v, datetime) else v
+    return out
+
+
+async def iter_reviews(db, user_id, role, category=None, product_id=None, fields=None,
+                       after=None, limit=None, date_from=None, date_to=None, batch_size=200):
+    """
+    Yield scoped reviews in ascending _id order straight off the Motor cursor.
+
+    Keyset pagination: pass the last seen _id as `after` to resume. The
+    (category, _id) / (product_id, _id) indexes serve both the filter and the
+    sort, so no page ever needs an in-memory sort or a skip.
+    """
     allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
-    
+
     if role != "admin" and not allowed_cats:
-        return []
-        
-    pipeline = []
+        return
+
+    extra = _window_filter("review_date", date_from, date_to)
+    if after is not None:
+        extra["_id"] = {"$gt": after}
+
+    cursor = db.reviews.find(
+        scope_match(role, allowed_cats, category, product_id, extra=extra),
+        {f: 1 for f in parse_review_fields(fields)}
+    ).sort("_id", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    async for doc in cursor:
+        yield doc
+
+
+async def get_reviews_page(db, user_id, role, category=None, product_id=None, fields=None,
+                           after=None, limit=50, date_from=None, date_to=None) -> dict:
+    """One page of reviews plus the cursor for the next page (None on the last page)."""
+    limit = max(1, min(limit, REVIEW_PAGE_MAX))
+    docs = [doc async for doc in iter_reviews(
+        db, user_id, role, category, product_id, fields, after, limit + 1, date_from, date_to,
+        batch_size=limit + 1
+    )]
+    more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        "reviews": [serialize_review(d) for d in docs],
+        "next_cursor": str(docs[-1]["_id"]) if more else None
+    }
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+async def _monthly_trend(db, role, allowed_cats, category=None, product_id=None, months=12,
+                         date_from=None, date_to=None):
+    """
+    Most recent `months` monthly buckets (oldest first) as
+    [{"month", "nps": NPSAccumulator}], read from the pre-aggregated
+    bucket collections rather than raw reviews. A window selects whole months.
+    """
     if product_id is not None:
-        pipeline.append({"$match": {"product_id": product_id}})
-
-    pipeline.extend([
-        {"$lookup": {
-            "from": "products",
-            "localField": "product_id",
-            "foreignField": "id",
-            "as": "product_info"
-        }},
-        {"$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": False}}
-    ])
-    
-    match_conditions = []
-    if role != "admin":
-        match_conditions.append({"product_info.category": {"$in": allowed_cats}})
-        
-    if category:
-        match_conditions.append({"product_info.category": category})
-        
-    if match_conditions:
-        pipeline.append({"$match": {"$and": match_conditions}})
-        
-    cursor = db.reviews.aggregate(pipeline)
-    return await cursor.to_list(length=100)
+        coll = db.review_buckets
+        single_series = True
+    else:
+        coll = db.category_buckets
+        single_series = bool(category)
 
-async def get_analytics_data(db, user_id, role, category=None, product_id=None):
-    allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
+    # One bucket per month for a single product/category: cut to `months` docs up front
+    head = [{"$sort": {"month": -1}}, {"$limit": months}] if single_series else []
+
+    pipeline = build_pipeline(
+        match=scope_match(role, allowed_cats, category, product_id, extra=_window_filter(
+            "month", month_start(date_from) if date_from else None, date_to
+        )),
+        stages=head + [
+            {"$group": {"_id": "$month", **_histogram_sums()}},
+            {"$sort": {"_id": -1}},
+            {"$limit": months}
+        ]
+    )
+
+    cursor = coll.aggregate(pipeline)
+    rows = await cursor.to_list(length=months)
+    rows.reverse()
+    return [{"month": r["_id"], "nps": NPSAccumulator.from_histogram(r, prefix="rating_")} for r in rows]
+
+
+def _month_label(dt) -> str:
+    return f"{MONTH_NAMES[dt.month - 1]} {dt.year}"
+
+
+async def get_analytics_data(db, user_id, role, category=None, product_id=None, date_from=None, date_to=None,
+                             *, allowed_cats=None):
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
     
     if role != "admin" and not allowed_cats:
-        return {"current_nps": 0, "trend": [0,0,0,0,0,0], "distribution": {}}
-        
-    pipeline = []
-    if product_id is not None:
-        pipeline.append({"$match": {"product_id": product_id}})
-
-    pipeline.extend([
-        {"$lookup": {
-            "from": "products",
-            "localField": "product_id",
-            "foreignField": "id",
-            "as": "product_info"
-        }},
-        {"$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": False}}
-    ])
-    
-    match_conditions = []
-    if role != "admin":
-        match_conditions.append({"product_info.category": {"$in": allowed_cats}})
-        
-    if category:
-        match_conditions.append({"product_info.category": category})
-        
-    if match_conditions:
-        pipeline.append({"$match": {"$and": match_conditions}})
-        
-    # Facet to get both summary and distribution in one pass
-    pipeline.append({
-        "$facet": {
-            "summary": [
-                {"$group": {
-                    "_id": None,
-                    "total": {"$sum": 1},
-                    "promoters": {"$sum": {"$cond": [{"$gte": ["$rating", 4]}, 1, 0]}},
-                    "detractors": {"$sum": {"$cond": [{"$lte": ["$rating", 2]}, 1, 0]}}
-                }}
-            ],
-            "distribution": [
-                {"$group": {
-                    "_id": "$rating",
-                    "count": {"$sum": 1}
-                }}
-            ]
-        }
-    })
-    
-    cursor = db.reviews.aggregate(pipeline)
+        return {"current_nps": 0, "trend": [], "trend_labels": [], "distribution": {}}
+    return await _analytics_data(db, role, allowed_cats, category, product_id, date_from, date_to)
+
+
+@_scoped_single_flight
+async def _analytics_data(db, role, allowed_cats, category=None, product_id=None, date_from=None, date_to=None):
+    # Summary and distribution both come from summing the per-product rollups
+    coll, pipeline = _rollup_pipeline(
+        db, scope_match(role, allowed_cats, category, product_id), date_from, date_to,
+        rows={"review_count": {"$gt": 0}},
+        stages=[{"$group": {"_id": None, **_histogram_sums()}}]
+    )
+
+    cursor = coll.aggregate(pipeline)
     result = await cursor.to_list(length=1)
-    
-    if not result or not result[0]["summary"]:
-        return {"current_nps": 0, "trend": [0,0,0,0,0,0], "distribution": {}}
-        
-    summary = result[0]["summary"][0]
-    total = summary["total"]
-    
-    current_nps = round(((summary["promoters"] - summary["detractors"]) / total * 100)) if total > 0 else 0
-    
-    nps_trend = [
-        current_nps - 12,
-        current_nps - 8,
-        current_nps - 2,
-        current_nps - 5,
-        current_nps - 1,
-        current_nps
-    ]
-    
-    distribution_list = result[0]["distribution"]
-    distribution = {str(int(d["_id"])): d["count"] for d in distribution_list if d["_id"] is not None}
+
+    if not result:
+        return {"current_nps": 0, "trend": [], "trend_labels": [], "distribution": {}}
+
+    summary = NPSAccumulator.from_histogram(result[0], prefix="rating_")
+
+    monthly = await _monthly_trend(db, role, allowed_cats, category, product_id, months=6,
+                                   date_from=date_from, date_to=date_to)
+    nps_trend = [m["nps"].score for m in monthly]
+
+    distribution = {k: n for k, n in summary.histogram().items() if n}
     
     return {
-        "current_nps": current_nps,
+        "current_nps": summary.score,
         "trend": nps_trend,
+        "trend_labels": [_month_label(m["month"]) for m in monthly],
         "distribution": distribution
     }
 
@@ -323,122 +645,64 @@ async def get_analytics_data(db, user_id, role, category=None, product_id=None):
 # Phase 3 — New Analytics Functions
 # ─────────────────────────────────────────────────────────────────────────────
 
-async def get_nps_for_category(db, category: str, user_id, role):
+async def get_nps_for_category(db, category: str, user_id, role, date_from=None, date_to=None, *, allowed_cats=None):
     """Return NPS score for an entire category, respecting role scoping."""
-    allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
 
     if role != "admin" and category not in allowed_cats:
         return {"error": "Access denied: category not in your scope", "nps": None}
+    return await _category_nps(db, role, allowed_cats, category, date_from, date_to)
 
-    pipeline = [
-        {"$lookup": {
-            "from": "reviews",
-            "localField": "id",
-            "foreignField": "product_id",
-            "as": "reviews"
-        }},
-        {"$match": {"category": category}},
-        {"$unwind": {"path": "$reviews", "preserveNullAndEmptyArrays": False}},
-        {"$group": {
-            "_id": None,
-            "total": {"$sum": 1},
-            "promoters": {"$sum": {"$cond": [{"$gte": ["$reviews.rating", 4]}, 1, 0]}},
-            "detractors": {"$sum": {"$cond": [{"$lte": ["$reviews.rating", 2]}, 1, 0]}}
-        }}
-    ]
-
-    cursor = db.products.aggregate(pipeline)
-    result = await cursor.to_list(length=1)
+
+@_scoped_single_flight
+async def _category_nps(db, role, allowed_cats, category: str, date_from=None, date_to=None):
+    if engine.enabled:
+        result = await engine.category_totals(db, role, allowed_cats, category, date_from, date_to)
+    else:
+        coll, pipeline = _rollup_pipeline(
+            db, scope_match(role, allowed_cats, category), date_from, date_to,
+            rows={"review_count": {"$gt": 0}},
+            stages=[{"$group": {"_id": None, **_histogram_sums()}}]
+        )
+
+        cursor = coll.aggregate(pipeline)
+        result = await cursor.to_list(length=1)
 
     if not result:
         return {"category": category, "nps": 0, "total_reviews": 0}
 
-    r = result[0]
-    total = r["total"]
-    nps = round(((r["promoters"] - r["detractors"]) / total) * 100) if total > 0 else 0
+    acc = NPSAccumulator.from_histogram(result[0], prefix="rating_")
 
     return {
         "category": category,
-        "nps": nps,
-        "promoters": r["promoters"],
-        "detractors": r["detractors"],
-        "total_reviews": total
+        "nps": acc.score,
+        "promoters": acc.promoters,
+        "detractors": acc.detractors,
+        "total_reviews": acc.total
     }
 
 
-async def get_trend_over_time(db, category: str, user_id, role):
+async def get_trend_over_time(db, category: str, user_id, role, date_from=None, date_to=None, *, allowed_cats=None):
     """
-    Return monthly NPS and review count for the last 6 months in a category.
+    Return monthly NPS and review count for the last 12 months with data in a category.
+    Reads the pre-aggregated category_buckets (one small doc per month).
     Produces chart_data compatible with a Plotly line chart.
-    Falls back to synthetic offsets if reviews lack date fields.
     """
-    allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
 
     if role != "admin" and category not in allowed_cats:
         return {"error": "Access denied: category not in your scope"}
+    return await _category_trend(db, role, allowed_cats, category, date_from, date_to)
 
-    # Try to fetch monthly data with real dates
-    pipeline = [
-        {"$lookup": {
-            "from": "reviews",
-            "localField": "id",
-            "foreignField": "product_id",
-            "as": "reviews"
-        }},
-        {"$match": {"category": category}},
-        {"$unwind": {"path": "$reviews", "preserveNullAndEmptyArrays": False}},
-        {"$project": {
-            "rating": "$reviews.rating",
-            "date": "$reviews.date"
-        }},
-        {"$match": {"date": {"$exists": True, "$ne": None}}},
-        {"$group": {
-            "_id": {
-                "year": {"$year": {"$dateFromString": {"dateString": "$date", "onError": None}}},
-                "month": {"$month": {"$dateFromString": {"dateString": "$date", "onError": None}}}
-            },
-            "total": {"$sum": 1},
-            "promoters": {"$sum": {"$cond": [{"$gte": ["$rating", 4]}, 1, 0]}},
-            "detractors": {"$sum": {"$cond": [{"$lte": ["$rating", 2]}, 1, 0]}}
-        }},
-        {"$sort": {"_id.year": 1, "_id.month": 1}},
-        {"$limit": 12}
-    ]
-
-    cursor = db.products.aggregate(pipeline)
-    monthly = await cursor.to_list(length=12)
-
-    if monthly and len(monthly) >= 2:
-        labels = []
-        nps_values = []
-        review_counts = []
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                       "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        for m in monthly:
-            yr = m["_id"]["year"]
-            mo = m["_id"]["month"]
-            if yr is None or mo is None:
-                continue
-            labels.append(f"{month_names[mo - 1]} {yr}")
-            total = m["total"]
-            nps = round(((m["promoters"] - m["detractors"]) / total) * 100) if total > 0 else 0
-            nps_values.append(nps)
-            review_counts.append(total)
-    else:
-        # Fallback: compute current NPS then synthesize 6-month progression
-        nps_data = await get_nps_for_category(db, category, user_id, role)
-        current_nps = nps_data.get("nps", 0) if "nps" in nps_data else 0
-        offsets = [-12, -8, -5, -2, -1, 0]
-        month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                       "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-        from datetime import datetime, timedelta
-        now = datetime.utcnow()
-        labels = []
-        for i in range(5, -1, -1):
-            dt = now - timedelta(days=30 * i)
-            labels.append(f"{month_names[dt.month - 1]} {dt.year}")
-        nps_values = [current_nps + o for o in offsets]
-        review_counts = [120, 145, 130, 160, 175, 190]
+
+@_scoped_single_flight
+async def _category_trend(db, role, allowed_cats, category: str, date_from=None, date_to=None):
+    monthly = await _monthly_trend(db, role, allowed_cats, category, months=12,
+                                   date_from=date_from, date_to=date_to)
+
+    labels = [_month_label(m["month"]) for m in monthly]
+    nps_values = [m["nps"].score for m in monthly]
+    review_counts = [m["nps"].total for m in monthly]
 
     return {
         "category": category,
@@ -457,65 +721,49 @@ async def get_trend_over_time(db, category: str, user_id, role):
     }
 
 
-async def compare_products(db, product_ids: list, user_id, role):
+# Shared by /compare, the batch "compare" metric and the compare_products chat tool
+MAX_COMPARE_PRODUCTS = 5
+COMPARE_LIMIT_ERROR = f"Maximum {MAX_COMPARE_PRODUCTS} products can be compared at once"
+
+
+async def compare_products(db, product_ids: list, user_id, role, date_from=None, date_to=None, *, allowed_cats=None):
     """
-    Side-by-side comparison of up to 5 products: avg rating, NPS, review count.
-    Enforces role scoping by checking each product's category.
+    Side-by-side comparison of up to MAX_COMPARE_PRODUCTS products: avg rating, NPS, review count.
+    Enforces role scoping by filtering on each product's category.
     """
-    allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
+    return await _compare_products(db, role, allowed_cats, product_ids, date_from, date_to)
 
-    pipeline = [
-        {"$match": {"id": {"$in": product_ids}}},
-        {"$lookup": {
-            "from": "reviews",
-            "localField": "id",
-            "foreignField": "product_id",
-            "as": "reviews"
-        }},
-        {"$project": {
-            "id": 1,
-            "name": 1,
-            "category": 1,
-            "review_count": {"$size": "$reviews"},
-            "avg_rating": {"$avg": "$reviews.rating"},
-            "promoters": {
-                "$size": {
-                    "$filter": {
-                        "input": "$reviews",
-                        "as": "r",
-                        "cond": {"$gte": ["$$r.rating", 4]}
-                    }
-                }
-            },
-            "detractors": {
-                "$size": {
-                    "$filter": {
-                        "input": "$reviews",
-                        "as": "r",
-                        "cond": {"$lte": ["$$r.rating", 2]}
-                    }
-                }
-            }
-        }}
-    ]
-
-    cursor = db.products.aggregate(pipeline)
-    raw = await cursor.to_list(length=10)
+
+@_scoped_single_flight
+async def _compare_products(db, role, allowed_cats, product_ids: list, date_from=None, date_to=None):
+    if engine.enabled:
+        raw = (await engine.product_rows(db, role, allowed_cats, product_ids=product_ids,
+                                         date_from=date_from, date_to=date_to))[:10]
+    else:
+        # Role scoping: products outside the analyst's categories never leave the DB
+        coll, pipeline = _rollup_pipeline(
+            db, scope_match(role, allowed_cats, product_ids=product_ids), date_from, date_to,
+            stages=[{"$project": {
+                "_id": 0, "product_id": 1, "name": 1, "category": 1,
+                "review_count": 1, "rating_sum": 1, "histogram": 1
+            }}],
+            names=True
+        )
+
+        cursor = coll.aggregate(pipeline)
+        raw = await cursor.to_list(length=10)
 
     results = []
     for p in raw:
-        # Role scoping: skip products in categories not assigned to analyst
-        if role != "admin" and p.get("category") not in allowed_cats:
-            continue
-
         total = p["review_count"]
-        nps = round(((p["promoters"] - p["detractors"]) / total) * 100) if total > 0 else 0
-        avg_rating = round(p["avg_rating"], 2) if p["avg_rating"] else 0
+        nps = NPSAccumulator.from_histogram(p["histogram"]).score
+        avg_rating = _avg_rating(p["rating_sum"], total, digits=2)
         name = p["name"]
         short_name = name[:25] + "…" if len(name) > 25 else name
 
         results.append({
-            "product_id": p["id"],
+            "product_id": p["product_id"],
             "name": short_name,
             "category": p.get("category", ""),
             "avg_rating": avg_rating,
@@ -539,4 +787,129 @@ async def compare_products(db, product_ids: list, user_id, role):
                 {"label": "Review Count", "data": [r["review_count"] for r in results]}
             ]
         }
-    }
\ No newline at end of file
+    }
+
+
+async def get_best_worst_products(db, category: str, user_id, role, date_from=None, date_to=None,
+                                  *, allowed_cats=None):
+    """Top 5 and worst 5 products by NPS within a category (min. 3 reviews)."""
+    allowed_cats = await _resolve_scope(db, user_id, role, allowed_cats)
+    if role != "admin" and category not in allowed_cats:
+        return {"error": "Access denied"}
+    return await _best_worst_products(db, role, allowed_cats, category, date_from, date_to)
+
+
+@_scoped_single_flight
+async def _best_worst_products(db, role, allowed_cats, category: str, date_from=None, date_to=None):
+    if engine.enabled:
+        raw = (await engine.product_rows(db, role, allowed_cats, category, date_from=date_from,
+                                         date_to=date_to, min_reviews=3))[:50]
+    else:
+        coll, pipeline = _rollup_pipeline(
+            db, scope_match(role, allowed_cats, category), date_from, date_to,
+            rows={"review_count": {"$gte": 3}},
+            stages=[{"$project": {
+                "_id": 0, "name": 1, "review_count": 1, "rating_sum": 1, "histogram": 1
+            }}],
+            names=True
+        )
+
+        cursor = coll.aggregate(pipeline)
+        raw = await cursor.to_list(length=50)
+
+    scored = []
+    for p in raw:
+        total = p["review_count"]
+        nps = NPSAccumulator.from_histogram(p["histogram"]).score
+        name = p["name"]
+        scored.append({
+            "name": name[:30] + "…" if len(name) > 30 else name,
+            "nps": nps,
+            "avg_rating": _avg_rating(p["rating_sum"], total),
+            "review_count": total
+        })
+
+    scored.sort(key=lambda x: x["nps"], reverse=True)
+    top = scored[:5]
+    worst = sorted(scored[-5:], key=lambda x: x["nps"])
+
+    return {
+        "category": category,
+        "top_products": top,
+        "worst_products": worst,
+        "chart_data": {
+            "type": "bar",
+            "title": f"Top & Worst Products — {category}",
+            "labels": [p["name"] for p in top + worst],
+            "datasets": [{"label": "NPS Score", "data": [p["nps"] for p in top + worst]}]
+        }
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch — several metrics in one request
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _require(args: dict, name: str):
+    if args.get(name) in (None, "", []):
+        raise ValueError(f"'{name}' is required")
+    return args[name]
+
+
+async def _batch_sentiment(db, user_id, role, cats, a, f, t):
+    happy, unhappy = await sentiment_counts(db, _require(a, "product_id"), user_id, role, f, t, allowed_cats=cats)
+    return {"happy": happy, "unhappy": unhappy}
+
+
+async def _batch_compare(db, user_id, role, cats, a, f, t):
+    product_ids = _require(a, "product_ids")
+    if len(product_ids) > MAX_COMPARE_PRODUCTS:
+        raise ValueError(COMPARE_LIMIT_ERROR)
+    return await compare_products(db, product_ids, user_id, role, f, t, allowed_cats=cats)
+
+
+# metric name -> runner(db, user_id, role, allowed_cats, args, date_from, date_to)
+BATCH_METRICS = {
+    "dashboard_stats": lambda db, u, r, c, a, f, t: get_dashboard_stats(db, u, r, f, t, allowed_cats=c),
+    "analytics_data": lambda db, u, r, c, a, f, t: get_analytics_data(
+        db, u, r, a.get("category"), a.get("product_id"), f, t, allowed_cats=c),
+    "category_nps": lambda db, u, r, c, a, f, t: get_nps_for_category(
+        db, _require(a, "category"), u, r, f, t, allowed_cats=c),
+    "trend": lambda db, u, r, c, a, f, t: get_trend_over_time(db, _require(a, "category"), u, r, f, t, allowed_cats=c),
+    "compare": _batch_compare,
+    "best_worst": lambda db, u, r, c, a, f, t: get_best_worst_products(
+        db, _require(a, "category"), u, r, f, t, allowed_cats=c),
+    "sentiment": _batch_sentiment,
+}
+
+
+async def _run_batch_item(db, user_id, role, allowed_cats, item: dict):
+    runner = BATCH_METRICS.get(item.get("metric"))
+    if runner is None:
+        return {"error": f"Unknown metric: {item.get('metric')}"}
+    try:
+        date_from, date_to = parse_window(item.get("date_from"), item.get("date_to"))
+        return await runner(db, user_id, role, allowed_cats, item, date_from, date_to)
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"{item.get('metric')} failed: {e}"}
+
+
+async def run_analytics_batch(db, user_id, role, items: list) -> dict:
+    """
+    Run every requested metric concurrently and return {key: result}.
+    Scope is resolved once up front and handed to every metric, so a scope
+    change mid-batch cannot give its items different views of the data.
+    A failing item reports {"error": ...} under its own key.
+    """
+    allowed_cats = await _resolve_scope(db, user_id, role)
+
+    keys = []
+    for i, item in enumerate(items):
+        key = item.get("key") or item.get("metric") or str(i)
+        keys.append(key if key not in keys else f"{key}#{i}")
+
+    results = await asyncio.gather(*[_run_batch_item(db, user_id, role, allowed_cats, item) for item in items])
+    return dict(zip(keys, results))
@@ -0,0 +1,147 @@
+"""
+answer_cache.py — Cache for the Gemini formatting step (tool result → prose)
+
+Step 2 of run_tool_call only turns a tool result into an answer, so the answer
+is reused whenever the same question (up to case, spacing and trailing
+punctuation) ran the same tool with the same arguments, produced the same
+result JSON, and the prompt / model are unchanged. The key is
+
+    sha256(sha256(question), tool_name, normalized tool_args, sha256(tool_result), prompt_version)
+
+The question is part of it because the answer is written for it: "is Books'
+NPS good?" and "how many detractors in Books?" share a result, not an answer.
+
+so any data change produces a new result hash and stale answers are never
+served; TTL only bounds how long unused entries linger.
+
+Entries live in an in-process TTLCache (LRU) and, if ANSWER_CACHE_DB names a
+file, in SQLite as well so they survive restarts and are shared by workers on
+the same host.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+from contextlib import closing, contextmanager
+
+from app.utils.cache import TTLCache, MISSING
+
+
+def _normalize(value):
+    """Canonical form of Gemini function-call args (it sends ints as floats, e.g. 3.0)."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join((question or "").lower().split()).rstrip("?!. ")
+
+
+def answer_key(question: str, tool_name: str, tool_args: dict, tool_result, prompt_version: str) -> str:
+    return _digest([_digest(_normalize_question(question)), tool_name, _normalize(tool_args or {}),
+                    _digest(tool_result), prompt_version])
+
+
+class AnswerCache:
+    def __init__(self, maxsize: int = 2048, ttl: float = 86400.0, path: str | None = None, max_rows: int = 50_000):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.path = path or None
+        self.max_rows = max_rows
+        self.disk_hits = 0
+        self._writes = 0
+        if self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS answers ("
+                    " key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS answers_used_at ON answers (used_at)")
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits / rolls back; close explicitly
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    # ─── SQLite (run in a thread) ─────────────────────────────────────────────
+
+    def _disk_get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT answer, expires_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE answers SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _disk_set(self, key, answer, prune):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, answer, now + self.ttl, now)
+            )
+            if prune:
+                # Expired rows first, then least recently used beyond max_rows
+                conn.execute("DELETE FROM answers WHERE expires_at < ?", (now,))
+                conn.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    " SELECT key FROM answers ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,)
+                )
+
+    # ─── Public API ───────────────────────────────────────────────────────────
+
+    async def get(self, key):
+        answer = self.memory.get(key)
+        if answer is not MISSING:
+            return answer
+        if not self.path:
+            return None
+        try:
+            answer = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            print(f"Answer cache read failed: {e}")
+            return None
+        if answer is not None:
+            self.disk_hits += 1
+            self.memory.set(key, answer)
+        return answer
+
+    async def set(self, key, answer: str):
+        self.memory.set(key, answer)
+        if not self.path:
+            return
+        self._writes += 1
+        try:
+            await asyncio.to_thread(self._disk_set, key, answer, self._writes % 100 == 0)
+        except sqlite3.Error as e:
+            print(f"Answer cache write failed: {e}")
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk": self.path, "disk_hits": self.disk_hits}
+
+
+answer_cache = AnswerCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+    path=os.getenv("ANSWER_CACHE_DB") or None
+)
@@ -0,0 +1,169 @@
+"""
+audit_sink.py — Write-behind inserts for logs that the response need not wait on
+
+Routes call `await audit_sink.write(db, collection, doc)`. While the sink is
+running (started / stopped by the app lifespan) that only puts the document
+on a bounded in-process queue; a background task drains it with insert_many,
+grouped by collection, whenever AUDIT_BATCH_SIZE documents are waiting or
+AUDIT_FLUSH_INTERVAL seconds have passed, and once more on shutdown.
+
+When the queue is full, or a batch insert fails, documents go to the
+AUDIT_SPILL_PATH file (JSON lines, replayed on the next start) if one is
+set, and are dropped otherwise; both are counted in stats(). Outside the app
+(scripts, tests without a lifespan) write() falls back to a direct insert.
+"""
+
+import os
+import asyncio
+from collections import Counter
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+_STOP = object()   # queued by stop(): flush what came before it, then exit
+
+
+class WriteBehindSink:
+    def __init__(self, maxsize: int = 10_000, batch_size: int = 200, flush_interval: float = 1.0,
+                 spill_path: str | None = None):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._queue = None
+        self._task = None
+        self._db = None
+        self.counts = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def write(self, db, collection: str, doc: dict):
+        if not self.running:
+            await db[collection].insert_one(doc)
+            self.counts["direct"] += 1
+            return
+        try:
+            self._queue.put_nowait((collection, doc))
+            self.counts["queued"] += 1
+        except asyncio.QueueFull:
+            self._overflow([(collection, doc)], "overflow")
+
+    # ─── Lifecycle ────────────────────────────────────────────────────────────
+
+    async def start(self, db):
+        if self.running:
+            return
+        self._db = db
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        await self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the drain task."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        # Writes that raced the stop marker
+        await self._flush(self._drain_nowait())
+
+    # ─── Draining ─────────────────────────────────────────────────────────────
+
+    def _drain_nowait(self) -> list:
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list):
+        by_collection = {}
+        for collection, doc in batch:
+            by_collection.setdefault(collection, []).append(doc)
+        for collection, docs in by_collection.items():
+            try:
+                await self._db[collection].insert_many(docs, ordered=False)
+                self.counts["written"] += len(docs)
+                self.counts["batches"] += 1
+            except BulkWriteError as e:
+                # ordered=False: the rest went in; duplicate keys (a replayed spill) were already written
+                errors = e.details.get("writeErrors", [])
+                failed = [err["index"] for err in errors if err.get("code") != 11000]
+                self.counts["written"] += len(docs) - len(errors)
+                if failed:
+                    self._overflow([(collection, docs[i]) for i in failed], "failed")
+            except Exception as e:
+                print(f"Audit sink: insert into {collection} failed: {e}")
+                self._overflow([(collection, d) for d in docs], "failed")
+
+    # ─── Overflow ─────────────────────────────────────────────────────────────
+
+    def _overflow(self, items: list, reason: str):
+        self.counts[reason] += len(items)
+        if not self.spill_path:
+            self.counts["dropped"] += len(items)
+            return
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for collection, doc in items:
+                f.write(json_util.dumps({"collection": collection, "doc": doc}) + "\n")
+        self.counts["spilled"] += len(items)
+
+    async def _replay_spill(self):
+        if not self.spill_path:
+            return
+        spill = self.spill_path + ".replay"   # left behind if a previous replay was interrupted
+        if not os.path.exists(spill):
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, spill)
+        with open(spill, encoding="utf-8") as f:
+            items = [json_util.loads(line) for line in f if line.strip()]
+        for i in range(0, len(items), self.batch_size):
+            await self._flush([(it["collection"], it["doc"]) for it in items[i:i + self.batch_size]])
+        os.remove(spill)
+        self.counts["replayed"] += len(items)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self.maxsize,
+            **self.counts,
+        }
+
+
+audit_sink = WriteBehindSink(
+    maxsize=int(os.getenv("AUDIT_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("AUDIT_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0")),
+    spill_path=os.getenv("AUDIT_SPILL_PATH") or None
+)
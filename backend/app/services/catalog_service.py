@@ -0,0 +1,49 @@
+"""
+catalog_service.py — Product catalog mutations that must keep denormalized
+copies of product fields in sync.
+
+`category` is copied onto every review, product_stats row and monthly
+bucket so that role-scoped analytics can filter without joining products. Any change to a
+product's category has to go through here.
+"""
+
+from pymongo import UpdateMany
+
+from app.services.stats_service import bump_data_version, rebuild_category_buckets
+
+
+async def reassign_product_category(db, product_id: int, category: str) -> dict:
+    """Move a product to a new category and propagate it to its reviews, rollup and buckets."""
+    product = await db.products.find_one_and_update(
+        {"id": product_id}, {"$set": {"category": category}}, projection={"category": 1}
+    )
+    if product is None:
+        return {"error": "Product not found"}
+
+    reviews = await db.reviews.update_many({"product_id": product_id}, {"$set": {"category": category}})
+    await db.product_stats.update_one({"product_id": product_id}, {"$set": {"category": category}})
+    await db.review_buckets.update_many({"product_id": product_id}, {"$set": {"category": category}})
+    await rebuild_category_buckets(db, {product.get("category"), category})
+    await bump_data_version(db)
+
+    return {"product_id": product_id, "category": category, "reviews_updated": reviews.modified_count}
+
+
+async def backfill_review_categories(db, batch_size: int = 500) -> int:
+    """Copy each product's category onto all of its reviews. Returns reviews modified."""
+    modified = 0
+    ops = []
+    async for p in db.products.find({}, {"_id": 0, "id": 1, "category": 1}):
+        ops.append(UpdateMany(
+            {"product_id": p["id"], "category": {"$ne": p.get("category")}},
+            {"$set": {"category": p.get("category")}}
+        ))
+        if len(ops) >= batch_size:
+            result = await db.reviews.bulk_write(ops, ordered=False)
+            modified += result.modified_count
+            ops = []
+
+    if ops:
+        result = await db.reviews.bulk_write(ops, ordered=False)
+        modified += result.modified_count
+    return modified
@@ -0,0 +1,230 @@
+"""
+chat_tools.py — The six chat tools Gemini can call, each next to its handler
+
+Every declaration is registered with its handler, deadline and result-cache
+TTL on `registry` (see tool_registry.py); llm_service passes registry.tools()
+to Gemini and runs the calls it returns through registry.dispatch().
+
+Env:
+  TOOL_TIMEOUT          deadline of the metric tools, seconds (default 10)
+  TOOL_SUMMARY_TIMEOUT  deadline of summarize_product_reviews (default 90; all_reviews map-reduces)
+  TOOL_CACHE_TTL        seconds a metric result is reused for the same scope / args (default 60, 0 = off)
+  TOOL_CACHE_SIZE       cached results kept per worker (default 512)
+"""
+
+import os
+
+from google.genai import types
+
+from app.services.analytics_service import (
+    get_nps_for_category, get_best_worst_products, sentiment_counts,
+    get_trend_over_time, compare_products, get_review_sample, MAX_COMPARE_PRODUCTS
+)
+from app.services.tool_registry import ToolRegistry
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+TOOL_SUMMARY_TIMEOUT = float(os.getenv("TOOL_SUMMARY_TIMEOUT", "90"))
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "60"))
+
+registry = ToolRegistry(cache_size=int(os.getenv("TOOL_CACHE_SIZE", "512")))
+
+# Optional time window shared by every metric tool
+DATE_RANGE_PROPERTIES = {
+    "date_from": types.Schema(
+        type="STRING",
+        description="Optional start date (YYYY-MM-DD) when the user asks about a specific period"
+    ),
+    "date_to": types.Schema(
+        type="STRING",
+        description="Optional end date (YYYY-MM-DD, inclusive) when the user asks about a specific period"
+    )
+}
+
+
+# ─── Category metrics ─────────────────────────────────────────────────────────
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="get_nps",
+        description="Get the current NPS (Net Promoter Score) for a product category. Use when the user asks about NPS, promoters, detractors, or customer loyalty for a category.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "category": types.Schema(
+                    type="STRING",
+                    description="The product category name, e.g. 'Electronics', 'Home & Kitchen'"
+                ),
+                **DATE_RANGE_PROPERTIES
+            },
+            required=["category"]
+        )
+    ),
+    timeout=TOOL_TIMEOUT, cache_ttl=TOOL_CACHE_TTL
+)
+async def _nps(db, user_id, role, args, date_from, date_to):
+    return await get_nps_for_category(db, args["category"], user_id, role, date_from, date_to), None
+
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="get_best_worst_products",
+        description="Get the top-rated and worst-rated products in a category. Use when the user asks which products are best or worst, highest or lowest rated, or wants a ranking.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "category": types.Schema(
+                    type="STRING",
+                    description="The product category name"
+                ),
+                **DATE_RANGE_PROPERTIES
+            },
+            required=["category"]
+        )
+    ),
+    timeout=TOOL_TIMEOUT, cache_ttl=TOOL_CACHE_TTL
+)
+async def _best_worst(db, user_id, role, args, date_from, date_to):
+    result = await get_best_worst_products(db, args["category"], user_id, role, date_from, date_to)
+    return result, result.pop("chart_data", None)
+
+
+# ─── Product metrics ──────────────────────────────────────────────────────────
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="get_product_sentiment",
+        description="Get happy/unhappy sentiment counts for a specific product. Use when the user asks about sentiment, customer satisfaction, or happiness for a product by its ID.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "product_id": types.Schema(
+                    type="INTEGER",
+                    description="The numeric product ID"
+                ),
+                **DATE_RANGE_PROPERTIES
+            },
+            required=["product_id"]
+        )
+    ),
+    timeout=TOOL_TIMEOUT, cache_ttl=TOOL_CACHE_TTL
+)
+async def _product_sentiment(db, user_id, role, args, date_from, date_to):
+    product_id = args["product_id"]
+    happy, unhappy = await sentiment_counts(db, product_id, user_id, role, date_from, date_to)
+    total = happy + unhappy
+    chart_data = {
+        "type": "pie",
+        "title": f"Sentiment — Product {product_id}",
+        "labels": ["Happy (4-5★)", "Unhappy (1-3★)"],
+        "datasets": [{"label": "Sentiment", "data": [happy, unhappy]}]
+    }
+    return {
+        "product_id": product_id,
+        "happy": happy,
+        "unhappy": unhappy,
+        "happy_pct": round((happy / total) * 100) if total > 0 else 0
+    }, chart_data
+
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="get_trend",
+        description="Get the monthly NPS trend and review volume over the last 6-12 months for a category. Use when the user asks about trends, over time, how NPS changed, or review patterns.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "category": types.Schema(
+                    type="STRING",
+                    description="The product category name"
+                ),
+                **DATE_RANGE_PROPERTIES
+            },
+            required=["category"]
+        )
+    ),
+    timeout=TOOL_TIMEOUT, cache_ttl=TOOL_CACHE_TTL
+)
+async def _trend(db, user_id, role, args, date_from, date_to):
+    result = await get_trend_over_time(db, args["category"], user_id, role, date_from, date_to)
+    return result, result.pop("chart_data", None)
+
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="compare_products",
+        description=f"Compare 2-{MAX_COMPARE_PRODUCTS} products side by side: avg rating, NPS, review count. Use when the user asks to compare, contrast, or evaluate products against each other.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "product_ids": types.Schema(
+                    type="ARRAY",
+                    items=types.Schema(type="INTEGER"),
+                    min_items=2,
+                    max_items=MAX_COMPARE_PRODUCTS,
+                    description=f"List of product IDs to compare (2 to {MAX_COMPARE_PRODUCTS} IDs)"
+                ),
+                **DATE_RANGE_PROPERTIES
+            },
+            required=["product_ids"]
+        )
+    ),
+    timeout=TOOL_TIMEOUT, cache_ttl=TOOL_CACHE_TTL
+)
+async def _compare(db, user_id, role, args, date_from, date_to):
+    result = await compare_products(db, args["product_ids"], user_id, role, date_from, date_to)
+    return result, result.pop("chart_data", None)
+
+
+# ─── Review summaries ─────────────────────────────────────────────────────────
+# Not result-cached: the sample feeds summary_store, which has its own cache.
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="summarize_product_reviews",
+        description="Summarize customer reviews for a specific product, answering a specific question. Use when the user asks to summarize, analyze, explain, or get insights on reviews for a product.",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "product_id": types.Schema(
+                    type="INTEGER",
+                    description="The numeric product ID"
+                ),
+                "question": types.Schema(
+                    type="STRING",
+                    description="The specific analysis question to answer about the product"
+                ),
+                "mix_ratings": types.Schema(
+                    type="BOOLEAN",
+                    description="Sample reviews across all star ratings (representative overview) instead of only the most helpful ones"
+                ),
+                "all_reviews": types.Schema(
+                    type="BOOLEAN",
+                    description="Read every review of the product instead of a 25-review sample (slower). Use when the user asks about all / overall / every review or complaint"
+                )
+            },
+            required=["product_id", "question"]
+        )
+    ),
+    timeout=TOOL_SUMMARY_TIMEOUT
+)
+async def _summarize(db, user_id, role, args, date_from, date_to):
+    product_id = args["product_id"]
+    question = args.get("question", "Summarize these reviews.")
+    if args.get("all_reviews"):
+        from app.services.map_reduce_summary import summarize_all
+        from app.services.llm_service import summary_error_message
+        try:
+            full = await summarize_all(db, question, user_id, role, product_id=product_id)
+        except Exception as e:
+            return {"error": summary_error_message(e)}, None
+        if not full["reviews"]:
+            return {"error": "No reviews found or access denied for this product"}, None
+        return {"product_id": product_id, "review_count": full["reviews"], "question": question,
+                "summary": full["summary"]}, None
+    # Top 25 selected server-side (most helpful, or stratified by rating)
+    reviews, total = await get_review_sample(
+        db, user_id, role, product_id=product_id, k=25, stratified=bool(args.get("mix_ratings"))
+    )
+    if not reviews:
+        return {"error": "No reviews found or access denied for this product"}, None
+    return {"product_id": product_id, "review_count": total, "top_25_reviews": reviews, "question": question}, None
@@ -0,0 +1,329 @@
+"""
+columnar_engine.py — Optional in-memory columnar backend for analytics
+
+Keeps the review facts analytics actually reads (product, rating, date) as
+NumPy arrays and answers the count-style queries with vectorized operations
+instead of a Mongo aggregation round-trip.
+
+    reviews   r_prod (dense product index), r_rating, r_date (datetime64, NaT if unknown)
+    products  p_id, p_name, p_cat (category code), cat_names (code -> name)
+
+Role scope and date windows become boolean masks. Outputs are shaped exactly
+like the rows the Mongo pipelines return (product_stats rows, $facet
+sections, $group totals) so analytics_service formats both paths with the
+same code.
+
+Enable with ANALYTICS_ENGINE=columnar. Data is loaded at startup, extended in
+process by `append` as reviews are ingested, and re-synced from Mongo when
+the shared review_data version moves (ingest or reassignment elsewhere).
+"""
+
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+from bson import ObjectId
+
+from app.services.nps_service import NPSAccumulator, star_buckets
+from app.utils.cache import VersionCounter
+
+# ObjectIds from different writers are only roughly ordered; re-scan this far back on sync
+SYNC_SLACK = timedelta(seconds=120)
+
+_REVIEW_FIELDS = {"product_id": 1, "rating": 1, "review_date": 1}
+
+
+def _rating_fields(acc: NPSAccumulator) -> dict:
+    """rating_1..rating_5, as the Mongo $group sections name them."""
+    return {f"rating_{k}": n for k, n in acc.histogram().items()}
+
+
+class ColumnarEngine:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.loaded = False
+        self._version = VersionCounter("review_data")
+        self._version_seen = None
+        self._lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.cat_names = []
+        self.cat_index = {}
+        self.p_id = np.empty(0, dtype=np.int64)
+        self.p_name = []
+        self.p_cat = np.empty(0, dtype=np.int32)
+        self.p_index = {}
+
+        self._size = 0
+        self._r_prod = np.empty(1024, dtype=np.int32)
+        self._r_rating = np.empty(1024, dtype=np.float64)
+        self._r_date = np.empty(1024, dtype="datetime64[ms]")
+        self._high_water = None   # newest ObjectId generation time seen
+        self._recent_ids = {}     # ObjectId -> generation time, within SYNC_SLACK of high water
+
+    # ─── Loading / Ingest ─────────────────────────────────────────────────────
+
+    def _category_code(self, name) -> int:
+        code = self.cat_index.get(name)
+        if code is None:
+            code = len(self.cat_names)
+            self.cat_names.append(name)
+            self.cat_index[name] = code
+        return code
+
+    def _upsert_product(self, product: dict) -> int:
+        code = self._category_code(product.get("category"))
+        idx = self.p_index.get(product["id"])
+        if idx is None:
+            idx = len(self.p_name)
+            self.p_index[product["id"]] = idx
+            self.p_id = np.append(self.p_id, product["id"])
+            self.p_name.append(product.get("name", ""))
+            self.p_cat = np.append(self.p_cat, np.int32(code))
+        else:
+            self.p_name[idx] = product.get("name", "")
+            self.p_cat[idx] = code
+        return idx
+
+    def _grow(self, extra: int):
+        need = self._size + extra
+        if need <= len(self._r_prod):
+            return
+        cap = max(need, 2 * len(self._r_prod))
+        for name in ("_r_prod", "_r_rating", "_r_date"):
+            old = getattr(self, name)
+            new = np.empty(cap, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _track_id(self, oid):
+        if not isinstance(oid, ObjectId):
+            return
+        ts = oid.generation_time
+        self._recent_ids[oid] = ts
+        if self._high_water is None or ts > self._high_water:
+            self._high_water = ts
+
+    def _append_rows(self, rows):
+        """rows: iterable of (product_index, rating, review_date_or_None, _id)."""
+        rows = list(rows)
+        if not rows:
+            return
+        self._grow(len(rows))
+        start, end = self._size, self._size + len(rows)
+        self._r_prod[start:end] = [r[0] for r in rows]
+        self._r_rating[start:end] = [float(r[1]) for r in rows]
+        self._r_date[start:end] = [
+            np.datetime64(r[2], "ms") if isinstance(r[2], datetime) else np.datetime64("NaT")
+            for r in rows
+        ]
+        self._size = end
+        for r in rows:
+            self._track_id(r[3])
+
+    def _prune_recent(self):
+        if self._high_water is None:
+            return
+        cutoff = self._high_water - SYNC_SLACK
+        self._recent_ids = {k: v for k, v in self._recent_ids.items() if v >= cutoff}
+
+    async def load(self, db):
+        """Full load of products and review facts from Mongo."""
+        async with self._lock:
+            self._reset()
+            async for p in db.products.find({}, {"_id": 0, "id": 1, "name": 1, "category": 1}):
+                self._upsert_product(p)
+
+            batch = []
+            async for r in db.reviews.find({}, _REVIEW_FIELDS):
+                idx = self.p_index.get(r.get("product_id"))
+                if idx is None or r.get("rating") is None:
+                    continue
+                batch.append((idx, r["rating"], r.get("review_date"), r["_id"]))
+                if len(batch) >= 50_000:
+                    self._append_rows(batch)
+                    batch = []
+            self._append_rows(batch)
+            self._prune_recent()
+
+            self._version_seen = await self._version.current(db)
+            self.loaded = True
+
+    def append(self, product: dict, review: dict):
+        """Fold one just-ingested review in without waiting for a sync."""
+        if not self.loaded:
+            return
+        idx = self._upsert_product(product)
+        self._append_rows([(idx, review["rating"], review.get("review_date"), review.get("_id"))])
+
+    async def sync(self, db):
+        """Pick up reviews / product changes written by other processes since the last load."""
+        if not self.loaded:
+            await self.load(db)
+            return
+
+        version = await self._version.current(db)
+        if version == self._version_seen:
+            return
+
+        async with self._lock:
+            if version == self._version_seen:
+                return   # another request synced while we waited
+            async for p in db.products.find({}, {"_id": 0, "id": 1, "name": 1, "category": 1}):
+                self._upsert_product(p)
+
+            query = {}
+            if self._high_water is not None:
+                query = {"_id": {"$gt": ObjectId.from_datetime(self._high_water - SYNC_SLACK)}}
+
+            batch = []
+            async for r in db.reviews.find(query, _REVIEW_FIELDS):
+                if r["_id"] in self._recent_ids:
+                    continue
+                idx = self.p_index.get(r.get("product_id"))
+                if idx is None or r.get("rating") is None:
+                    continue
+                batch.append((idx, r["rating"], r.get("review_date"), r["_id"]))
+            self._append_rows(batch)
+            self._prune_recent()
+            self._version_seen = version
+
+    # ─── Masks ────────────────────────────────────────────────────────────────
+
+    def _review_mask(self, role, allowed_cats, category=None, product_ids=None, date_from=None, date_to=None):
+        n = self._size
+        prod = self._r_prod[:n]
+        mask = np.ones(n, dtype=bool)
+
+        if role != "admin" or category:
+            p_ok = self._product_mask(role, allowed_cats, category)
+            mask &= p_ok[prod]
+        if product_ids is not None:
+            wanted = np.zeros(len(self.p_name), dtype=bool)
+            idxs = [self.p_index[i] for i in product_ids if i in self.p_index]
+            wanted[idxs] = True
+            mask &= wanted[prod]
+
+        dates = self._r_date[:n]
+        if date_from is not None:
+            mask &= dates >= np.datetime64(date_from, "ms")
+        if date_to is not None:
+            mask &= dates < np.datetime64(date_to, "ms")
+        return mask
+
+    def _product_mask(self, role, allowed_cats, category=None):
+        ok = np.ones(len(self.p_name), dtype=bool)
+        if role != "admin":
+            codes = [self.cat_index[c] for c in allowed_cats if c in self.cat_index]
+            ok &= np.isin(self.p_cat, codes)
+        if category:
+            ok &= self.p_cat == self.cat_index.get(category, -1)
+        return ok
+
+    # ─── Vectorized Aggregates ────────────────────────────────────────────────
+
+    def _per_product(self, mask):
+        """Rollup columns per dense product index over the masked reviews."""
+        P = len(self.p_name)
+        prod = self._r_prod[:self._size][mask]
+        rating = self._r_rating[:self._size][mask]
+        bucket = star_buckets(rating) - 1
+        return {
+            "review_count": np.bincount(prod, minlength=P),
+            "rating_sum": np.bincount(prod, weights=rating, minlength=P),
+            "histogram": np.bincount(prod.astype(np.int64) * 5 + bucket, minlength=P * 5).reshape(P, 5),
+            "happy": np.bincount(prod, weights=bucket >= 3, minlength=P).astype(np.int64),
+            "unhappy": np.bincount(prod, weights=bucket <= 2, minlength=P).astype(np.int64),
+        }
+
+    def _product_row(self, cols, i) -> dict:
+        return {
+            "product_id": int(self.p_id[i]),
+            "name": self.p_name[i],
+            "category": self.cat_names[self.p_cat[i]],
+            "review_count": int(cols["review_count"][i]),
+            "rating_sum": float(cols["rating_sum"][i]),
+            "histogram": NPSAccumulator(cols["histogram"][i]).histogram(),
+        }
+
+    async def dashboard_facets(self, db, role, allowed_cats, date_from=None, date_to=None) -> dict:
+        """The same {"categories", "products", "kpis"} sections as the Mongo $facet."""
+        await self.sync(db)
+        cols = self._per_product(self._review_mask(role, allowed_cats, date_from=date_from, date_to=date_to))
+        active = cols["review_count"] > 0
+        if role != "admin":
+            active &= self._product_mask(role, allowed_cats)
+
+        # Categories: regroup the per-product columns by category code
+        C = len(self.cat_names)
+        cat = self.p_cat[active]
+        cat_total = np.bincount(cat, weights=cols["review_count"][active], minlength=C)
+        cat_sum = np.bincount(cat, weights=cols["rating_sum"][active], minlength=C)
+        cat_hist = np.zeros((C, 5), dtype=np.int64)
+        np.add.at(cat_hist, cat, cols["histogram"][active])
+        present = np.flatnonzero(cat_total > 0)
+        order = present[np.argsort(-cat_total[present], kind="stable")][:5]
+        categories = [{
+            "_id": self.cat_names[c],
+            "total_reviews": int(cat_total[c]),
+            "rating_sum": float(cat_sum[c]),
+            **_rating_fields(NPSAccumulator(cat_hist[c]))
+        } for c in order]
+
+        products = [self._product_row(cols, i) for i in np.flatnonzero(active & (cols["review_count"] >= 5))]
+
+        kpis = []
+        total = int(cols["review_count"][active].sum())
+        if total > 0:
+            kpis.append({
+                "_id": None,
+                "total_reviews": total,
+                "happy": int(cols["happy"][active].sum()),
+                "unhappy": int(cols["unhappy"][active].sum()),
+                **_rating_fields(NPSAccumulator(cols["histogram"][active].sum(axis=0)))
+            })
+
+        return {"categories": categories, "products": products, "kpis": kpis}
+
+    async def category_totals(self, db, role, allowed_cats, category, date_from=None, date_to=None) -> list:
+        """[{"rating_1".."rating_5"}] like the Mongo $group, or [] if no reviews."""
+        await self.sync(db)
+        mask = self._review_mask(role, allowed_cats, category=category, date_from=date_from, date_to=date_to)
+        rating = self._r_rating[:self._size][mask]
+        if rating.size == 0:
+            return []
+        return [{"_id": None, **_rating_fields(NPSAccumulator.from_ratings(rating))}]
+
+    async def product_rows(self, db, role, allowed_cats, category=None, product_ids=None,
+                           date_from=None, date_to=None, min_reviews=0) -> list:
+        """product_stats-shaped rows for the scoped products, like the Mongo rollup reads."""
+        await self.sync(db)
+        cols = self._per_product(self._review_mask(role, allowed_cats, category, product_ids, date_from, date_to))
+
+        selected = self._product_mask(role, allowed_cats, category)
+        if product_ids is not None:
+            wanted = np.zeros(len(self.p_name), dtype=bool)
+            wanted[[self.p_index[i] for i in product_ids if i in self.p_index]] = True
+            selected &= wanted
+
+        # Windowed Mongo reads only see products with reviews in the window
+        windowed = date_from is not None or date_to is not None
+        floor = max(min_reviews, 1) if windowed else min_reviews
+        selected &= cols["review_count"] >= floor
+
+        return [self._product_row(cols, i) for i in np.flatnonzero(selected)]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "loaded": self.loaded,
+            "reviews": self._size,
+            "products": len(self.p_name),
+            "categories": len(self.cat_names),
+            "bytes": int(self._r_prod.nbytes + self._r_rating.nbytes + self._r_date.nbytes),
+        }
+
+
+engine = ColumnarEngine(enabled=os.getenv("ANALYTICS_ENGINE", "mongo").lower() == "columnar")
@@ -0,0 +1,209 @@
+"""
+gemini_gateway.py — Shared async entry point for every Gemini call
+
+Every generate_content / generate_content_stream call goes through one
+GeminiGateway, which uses the SDK's native async client (client.aio) instead
+of worker threads and adds:
+
+  - a token bucket matched to the project quota: GEMINI_RPM requests per
+    minute, of which up to GEMINI_BURST (default: all GEMINI_RPM) may start
+    at once, so a quiet minute's quota is not dripped out one per second,
+  - a global concurrency cap (GEMINI_MAX_CONCURRENCY),
+  - retries of 429 / 5xx with jittered exponential backoff, only while the
+    caller's deadline allows another attempt (GEMINI_MAX_RETRIES),
+  - counters: queue depth, in flight, wait time, retries, failures.
+
+A call that cannot finish before its deadline raises TimeoutError; an error
+that survives every retry is re-raised unchanged for the caller to report.
+GEMINI_BASE_URL points the client elsewhere (e.g. fake_gemini_server.py).
+"""
+
+import os
+import time
+import random
+import asyncio
+from collections import deque
+
+from google import genai
+from google.genai import types, errors
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`; waiters are served FIFO."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, deadline: float):
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                if time.monotonic() + wait > deadline:
+                    raise TimeoutError("Gemini rate limit: no request slot before the deadline")
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+
+
+class GeminiGateway:
+    def __init__(self, client, max_concurrency: int = 8, rpm: float = 60, burst: float | None = None,
+                 max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate=rpm / 60.0, burst=burst or max(1.0, rpm))
+        self._waits = deque(maxlen=1000)   # ms spent queueing, most recent calls
+        self.queued = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def _retryable(e: Exception) -> bool:
+        return isinstance(e, errors.APIError) and e.code in RETRYABLE_CODES
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    async def _slot(self, deadline: float):
+        """Wait for a rate token, then a concurrency slot; both bounded by the deadline."""
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await self._bucket.acquire(deadline)
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        finally:
+            self.queued -= 1
+            self._waits.append((time.monotonic() - start) * 1000)
+
+    async def _acquire(self, deadline: float):
+        try:
+            await self._slot(deadline)
+        except (TimeoutError, asyncio.TimeoutError):
+            self.timeouts += 1
+            raise
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def _should_retry(self, e: Exception, attempt: int, delay: float, deadline: float) -> bool:
+        return self._retryable(e) and attempt < self.max_retries and time.monotonic() + delay < deadline
+
+    async def _attempts(self, call, timeout: float):
+        """Run `call()` (a coroutine factory) with queueing and retries before the deadline."""
+        deadline = time.monotonic() + timeout
+        self.requests += 1
+        attempt = 0
+        while True:
+            await self._acquire(deadline)
+            try:
+                return await asyncio.wait_for(call(), timeout=max(0.0, deadline - time.monotonic()))
+            except (TimeoutError, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise
+            except Exception as e:
+                delay = self._backoff(attempt)
+                if not self._should_retry(e, attempt, delay, deadline):
+                    self.failures += 1
+                    raise
+            finally:
+                self._release()
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def generate_content(self, *, model: str, contents, config=None, timeout: float = 15.0):
+        return await self._attempts(
+            lambda: self.client.aio.models.generate_content(model=model, contents=contents, config=config),
+            timeout
+        )
+
+    async def generate_content_stream(self, *, model: str, contents, config=None, timeout: float = 30.0):
+        """
+        Yield response chunks as Gemini produces them. The slot is held until
+        the stream ends; retries only happen before the first chunk, and the
+        whole stream must finish before the deadline.
+        """
+        deadline = time.monotonic() + timeout
+        remaining = lambda: max(0.0, deadline - time.monotonic())
+        self.requests += 1
+        attempt = 0
+        while True:
+            await self._acquire(deadline)
+            started = False
+            try:
+                stream = await asyncio.wait_for(
+                    self.client.aio.models.generate_content_stream(model=model, contents=contents, config=config),
+                    timeout=remaining()
+                )
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining())
+                    except StopAsyncIteration:
+                        return
+                    started = True
+                    yield chunk
+            except (TimeoutError, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise
+            except Exception as e:
+                delay = self._backoff(attempt)
+                if started or not self._should_retry(e, attempt, delay, deadline):
+                    self.failures += 1
+                    raise
+            finally:
+                self._release()
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rate_per_sec": self._bucket.rate,
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(sum(waits) / len(waits), 1) if waits else 0,
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0,
+        }
+
+
+def make_client():
+    base_url = os.getenv("GEMINI_BASE_URL")
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"), http_options=http_options)
+
+
+gateway = GeminiGateway(
+    make_client(),
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    rpm=float(os.getenv("GEMINI_RPM", "60")),
+    burst=float(os.getenv("GEMINI_BURST", "0")) or None,   # 0 / unset: rpm
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+)
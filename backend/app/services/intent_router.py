@@ -0,0 +1,284 @@
+"""
+intent_router.py — Local fast path in front of Gemini step 1 (tool selection)
+
+Most chat queries name their tool and arguments plainly ("NPS for Books",
+"compare products 3 and 7"). The router tries to resolve those locally:
+
+  1. Extract arguments: known category names, known product ids, and
+     context_product_id. Queries that mention a time period go to Gemini,
+     which handles date arithmetic.
+  2. Rules: keyword patterns per tool. A rule match with all required
+     arguments routes with confidence 1.0. When keywords of several tools
+     appear ("NPS trend for Electronics"), the first in RULES order wins.
+     Compound questions (several categories, several products outside a
+     comparison, or several tools' keywords joined by "and", "&", ";" or
+     "vs") are left to Gemini, which can call several tools in one turn.
+  3. Classifier: multinomial naive Bayes over uni/bigrams of past
+     `conversations` queries labelled with the tool Gemini picked. Used when
+     no rule fires; routes if its posterior clears ROUTER_MIN_CONFIDENCE and
+     the arguments that tool needs were found. Vocabulary and model are
+     reloaded every refresh_interval by a background task (fitting runs in a
+     worker thread); the previous model keeps serving meanwhile.
+
+Anything else returns None and run_tool_call falls back to Gemini. Turns are
+logged with `routed_by` so only Gemini-labelled turns feed training.
+Disable with INTENT_ROUTER=0. See eval_intent_router.py for offline accuracy.
+"""
+
+import os
+import re
+import math
+import time
+import asyncio
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+TOOL_NAMES = (
+    "get_nps", "get_best_worst_products", "get_product_sentiment",
+    "get_trend", "compare_products", "summarize_product_reviews",
+)
+
+RULES = [
+    ("compare_products", re.compile(r"\b(compare|comparison|versus|vs\.?)\b")),
+    ("get_trend", re.compile(r"\b(trend|trends|trending|over time|monthly|month by month|trajectory)\b")),
+    ("get_best_worst_products", re.compile(r"\b(best|worst|top|bottom|highest|lowest|rank(ed|ing)?)\b")),
+    ("get_product_sentiment", re.compile(r"\b(sentiment|happy|unhappy|satisf(ied|action))\b")),
+    ("summarize_product_reviews", re.compile(r"\b(summar(y|ise|ize|ization)|complain(t|ts)?|themes|what do (people|customers) say)\b")),
+    ("get_nps", re.compile(r"\b(nps|net promoter|promoters?|detractors?|loyalty)\b")),
+]
+
+# Relative / absolute periods need date arithmetic: leave those to Gemini
+PERIOD = re.compile(
+    r"\b(last|past|since|before|after|between|during|previous|ytd|yesterday|today|"
+    r"days?|weeks?|months?|quarters?|years?|q[1-4]|(19|20)\d\d|"
+    r"jan(uary)?|feb(ruary)?|march|apr(il)?|june?|july?|aug(ust)?|sept?(ember)?|oct(ober)?|nov(ember)?|dec(ember)?|"
+    # "may" only where it reads as the month ("this may", "in may", "may 3"), not the verb ("this may be")
+    r"(in|during|this|of|for|since|until|till|by|from|through|early|mid|late)\s+may(?!\s+(be|have|not|also|help|need)\b)|"
+    r"may\s+\d{1,2}(st|nd|rd|th)?)\b"
+)
+PRODUCT_LIST = re.compile(r"\b(?:products?|items?|ids?|#)\s*#?((?:\d+(?:\s*(?:,|and|&|vs\.?|versus|or)\s*#?)?)+)")
+NUMBER = re.compile(r"\d+")
+# Joins two clauses ("nps and trend for books"); conjunctions inside a product
+# list ("products 3 and 7") or a category name are removed before the search
+CLAUSE_JOIN = re.compile(r";|&|\b(and|vs\.?|versus)\b")
+ID_JOIN = re.compile(r"(\d)\s*(,|and|&|or|vs\.?|versus)\s*#?(?=\d)")
+TOKEN = re.compile(r"[a-z0-9#]+")
+
+
+@dataclass
+class Route:
+    tool: str
+    args: dict
+    confidence: float
+    source: str   # "rules" | "classifier"
+
+
+# ─── Classifier ───────────────────────────────────────────────────────────────
+
+def _features(text: str) -> list:
+    words = ["<num>" if w.isdigit() else w for w in TOKEN.findall(text)]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@dataclass
+class NaiveBayes:
+    alpha: float = 1.0
+    class_counts: Counter = field(default_factory=Counter)
+    feature_counts: dict = field(default_factory=lambda: defaultdict(Counter))
+    feature_totals: Counter = field(default_factory=Counter)
+    vocab: set = field(default_factory=set)
+
+    def fit(self, texts, labels):
+        for text, label in zip(texts, labels):
+            feats = _features(text)
+            self.class_counts[label] += 1
+            self.feature_counts[label].update(feats)
+            self.feature_totals[label] += len(feats)
+            self.vocab.update(feats)
+        return self
+
+    def predict_proba(self, text: str) -> dict:
+        if not self.class_counts:
+            return {}
+        feats = [f for f in _features(text) if f in self.vocab]
+        n = sum(self.class_counts.values())
+        v = len(self.vocab)
+        logp = {}
+        for label, count in self.class_counts.items():
+            denom = self.feature_totals[label] + self.alpha * v
+            counts = self.feature_counts[label]
+            logp[label] = math.log(count / n) + sum(math.log((counts[f] + self.alpha) / denom) for f in feats)
+        top = max(logp.values())
+        z = sum(math.exp(lp - top) for lp in logp.values())
+        return {label: math.exp(lp - top) / z for label, lp in logp.items()}
+
+
+# ─── Router ───────────────────────────────────────────────────────────────────
+
+class IntentRouter:
+    def __init__(self, enabled: bool = True, min_confidence: float = 0.9, refresh_interval: float = 600.0):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.refresh_interval = refresh_interval
+        self.categories = {}      # lowercase alias -> category name
+        self.product_ids = set()
+        self.model = NaiveBayes()
+        self._loaded_at = float("-inf")
+        self._refreshing = None
+        self.stats_counts = Counter()
+
+    # Vocabulary and model come from the DB; refreshed at most every refresh_interval
+    # in a background task, the previous model serving until the new one is fitted
+    def schedule_refresh(self, db):
+        if self._refreshing is not None and not self._refreshing.done():
+            return
+        if time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        self._loaded_at = time.monotonic()
+        self._refreshing = asyncio.create_task(self._refresh_logged(db))
+
+    async def _refresh_logged(self, db):
+        try:
+            await self.refresh(db)
+        except Exception as e:
+            print(f"Intent router refresh failed: {e}")
+
+    async def refresh(self, db):
+        """Reload vocabulary and retrain; fitting runs in a worker thread, off the event loop."""
+        self.set_vocabulary(
+            await db.products.distinct("category"),
+            await db.products.distinct("id")
+        )
+        cursor = db.conversations.find(
+            {"tool_used": {"$in": list(TOOL_NAMES)}, "routed_by": {"$ne": "local"}},
+            {"_id": 0, "query": 1, "tool_used": 1}
+        ).sort("timestamp", -1).limit(20_000)
+        rows = await cursor.to_list(length=20_000)
+        await asyncio.to_thread(self.train, [r["query"] for r in rows], [r["tool_used"] for r in rows])
+
+    def set_vocabulary(self, categories, product_ids):
+        aliases = {}
+        for name in categories:
+            if not name:
+                continue
+            aliases[name.lower()] = name
+            # Scraped names look like "Amazon Devices,mazon.co.uk"; accept the leading part
+            head = name.split(",")[0].strip().lower()
+            if len(head) > 3:
+                aliases.setdefault(head, name)
+        self.categories = aliases
+        self.product_ids = set(product_ids)
+
+    def train(self, queries, tools):
+        # Fitted aside and swapped in whole, so classify() never sees a half-trained model
+        self.model = NaiveBayes().fit([self._mask(q.lower()) for q in queries], tools)
+
+    # ─── Extraction ───────────────────────────────────────────────────────────
+
+    def _find_categories(self, text: str) -> list:
+        """[(category, alias)] mentioned in text, longest alias first, without overlaps."""
+        found = []
+        for alias in sorted(self.categories, key=len, reverse=True):
+            pattern = rf"(?<![a-z0-9]){re.escape(alias)}(?![a-z0-9])"
+            if re.search(pattern, text):
+                found.append((self.categories[alias], alias))
+                text = re.sub(pattern, " ", text)   # "home & kitchen" is not also "kitchen"
+        return list({category: (category, alias) for category, alias in found}.values())
+
+    def _mask(self, text: str) -> str:
+        """Replace category mentions so the classifier learns phrasing, not names."""
+        for _, alias in self._find_categories(text):
+            text = text.replace(alias, " <cat> ")
+        return text
+
+    def _find_products(self, text: str) -> list:
+        ids = []
+        for m in PRODUCT_LIST.finditer(text):
+            ids += [int(n) for n in NUMBER.findall(m.group(1))]
+        return [i for i in dict.fromkeys(ids) if i in self.product_ids]
+
+    def _compound(self, text: str) -> bool:
+        return bool(CLAUSE_JOIN.search(ID_JOIN.sub(r"\1 ", self._mask(text))))
+
+    def extract(self, query: str, context_product_id=None) -> dict:
+        text = query.lower()
+        categories = [category for category, _ in self._find_categories(text)]
+        products = self._find_products(text)
+        if not products and context_product_id in self.product_ids:
+            products = [context_product_id]
+        return {
+            "category": categories[0] if categories else None,
+            "categories": categories,
+            "products": products,
+            "period": bool(PERIOD.search(text)),
+        }
+
+    @staticmethod
+    def _args_for(tool: str, found: dict, query: str):
+        if tool in ("get_nps", "get_best_worst_products", "get_trend"):
+            return {"category": found["category"]} if found["category"] else None
+        if tool == "compare_products":
+            # Over the comparison limit: abstain rather than silently drop products
+            return {"product_ids": found["products"]} if 2 <= len(found["products"]) <= 5 else None
+        if len(found["products"]) != 1:
+            return None
+        if tool == "summarize_product_reviews":
+            return {"product_id": found["products"][0], "question": query}
+        return {"product_id": found["products"][0]}
+
+    # ─── Routing ──────────────────────────────────────────────────────────────
+
+    def classify(self, query: str, context_product_id=None):
+        """Route without touching the DB (vocabulary / model must already be loaded)."""
+        found = self.extract(query, context_product_id)
+        if found["period"]:
+            return None
+        text = query.lower()
+
+        # Compound questions need several tool calls: only Gemini makes those
+        matched = [tool for tool, pattern in RULES if pattern.search(text)]
+        if len(found["categories"]) > 1 or (len(matched) > 1 and self._compound(text)):
+            return None
+        if len(found["products"]) > 1 and matched[:1] != ["compare_products"]:
+            return None
+
+        if matched:
+            # One question in several tools' words ("NPS trend"): first in RULES order
+            args = self._args_for(matched[0], found, query)
+            if args is not None:
+                return Route(matched[0], args, 1.0, "rules")
+            return None   # keyword present but arguments missing: ambiguous, ask Gemini
+
+        probs = self.model.predict_proba(self._mask(text))
+        if not probs:
+            return None
+        tool, p = max(probs.items(), key=lambda kv: kv[1])
+        args = self._args_for(tool, found, query)
+        if p >= self.min_confidence and args is not None:
+            return Route(tool, args, p, "classifier")
+        return None
+
+    async def route(self, db, query: str, context_product_id=None):
+        if not self.enabled:
+            return None
+        self.schedule_refresh(db)
+        result = self.classify(query, context_product_id)
+        self.stats_counts[result.source if result else "gemini"] += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "categories": len(set(self.categories.values())),
+            "products": len(self.product_ids),
+            "training_examples": sum(self.model.class_counts.values()),
+            "refreshing": self._refreshing is not None and not self._refreshing.done(),
+            "routed": dict(self.stats_counts),
+        }
+
+
+intent_router = IntentRouter(
+    enabled=os.getenv("INTENT_ROUTER", "1") == "1",
+    min_confidence=float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.9"))
+)
@@ -4,115 +4,30 @@ llm_service.py — Gemini Function Calling Engine for InsightLens
 Architecture:
   User query
     → Gemini with 6 declared tool schemas
-    → Gemini returns a FunctionCall (tool name + args)
-    → Tool dispatcher runs the matching DB function
-    → Gemini receives tool result, generates final formatted answer
-    → Returns { answer, tool_used, tool_args, chart_data }
+    → Gemini returns one FunctionCall per analysis needed (tool name + args)
+    → Tool registry (chat_tools.py) runs the matching DB handlers concurrently,
+      each with validated args, a deadline and an optional result cache
+    → Gemini receives all tool results, generates one final formatted answer
+    → Returns { answer, tool_used, tool_args, chart_data, charts }
 """
 
 import os
 import asyncio
-from google import genai
+import time
+import hashlib
+import traceback
+from datetime import date
 from google.genai import types
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-# ─── Tool Schema Declarations ─────────────────────────────────────────────────
-# These are passed to Gemini so it can decide which function to call.
-
-TOOLS = [
-    types.Tool(function_declarations=[
-        types.FunctionDeclaration(
-            name="get_nps",
-            description="Get the current NPS (Net Promoter Score) for a product category. Use when the user asks about NPS, promoters, detractors, or customer loyalty for a category.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "category": types.Schema(
-                        type="STRING",
-                        description="The product category name, e.g. 'Electronics', 'Home & Kitchen'"
-                    )
-                },
-                required=["category"]
-            )
-        ),
-        types.FunctionDeclaration(
-            name="get_best_worst_products",
-            description="Get the top-rated and worst-rated products in a category. Use when the user asks which products are best or worst, highest or lowest rated, or wants a ranking.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "category": types.Schema(
-                        type="STRING",
-                        description="The product category name"
-                    )
-                },
-                required=["category"]
-            )
-        ),
-        types.FunctionDeclaration(
-            name="get_product_sentiment",
-            description="Get happy/unhappy sentiment counts for a specific product. Use when the user asks about sentiment, customer satisfaction, or happiness for a product by its ID.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "product_id": types.Schema(
-                        type="INTEGER",
-                        description="The numeric product ID"
-                    )
-                },
-                required=["product_id"]
-            )
-        ),
-        types.FunctionDeclaration(
-            name="get_trend",
-            description="Get the monthly NPS trend and review volume over the last 6-12 months for a category. Use when the user asks about trends, over time, how NPS changed, or review patterns.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "category": types.Schema(
-                        type="STRING",
-                        description="The product category name"
-                    )
-                },
-                required=["category"]
-            )
-        ),
-        types.FunctionDeclaration(
-            name="compare_products",
-            description="Compare 2-5 products side by side: avg rating, NPS, review count. Use when the user asks to compare, contrast, or evaluate products against each other.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "product_ids": types.Schema(
-                        type="ARRAY",
-                        items=types.Schema(type="INTEGER"),
-                        description="List of product IDs to compare (2 to 5 IDs)"
-                    )
-                },
-                required=["product_ids"]
-            )
-        ),
-        types.FunctionDeclaration(
-            name="summarize_product_reviews",
-            description="Summarize customer reviews for a specific product, answering a specific question. Use when the user asks to summarize, analyze, explain, or get insights on reviews for a product.",
-            parameters=types.Schema(
-                type="OBJECT",
-                properties={
-                    "product_id": types.Schema(
-                        type="INTEGER",
-                        description="The numeric product ID"
-                    ),
-                    "question": types.Schema(
-                        type="STRING",
-                        description="The specific analysis question to answer about the product"
-                    )
-                },
-                required=["product_id", "question"]
-            )
-        )
-    ])
-]
+from app.services.answer_cache import answer_cache, answer_key
+from app.services.intent_router import intent_router
+from app.services.gemini_gateway import gateway
+from app.services.chat_tools import registry
+from app.utils.prompt_packing import pack_reviews, compact_result
+from app.utils.singleflight import single_flight
+
+# Declarations + handlers live in chat_tools.py; this is what Gemini is offered
+TOOLS = registry.tools()
 
 
 SYSTEM_PROMPT = """You are InsightLens, an expert e-commerce product analytics AI.
@@ -120,127 +35,27 @@ You answer questions about Amazon product reviews by calling real analysis funct
 
 Rules:
 - ALWAYS call one of the provided tools to fetch real data. Never guess or make up numbers.
+- If a question needs several analyses (e.g. NPS of two categories plus a trend), call every tool needed at once.
 - After getting tool results, format your answer clearly with markdown.
 - For NPS scores, explain what the score means (>50 is excellent, 30-50 is good, 0-30 is needs improvement, <0 is poor).
 - For product comparisons, summarize key differences.
 - For trends, highlight the direction and any notable changes.
+- If the user names a time period ("last 30 days", "in March"), pass date_from / date_to as YYYY-MM-DD.
 - Keep your response concise but insightful — max 300 words unless summarizing reviews.
 """
 
+# Part of every cached step-2 answer key: editing the prompt or model retires old answers
+PROMPT_VERSION = hashlib.sha256(f"gemini-2.5-flash\n{SYSTEM_PROMPT}".encode()).hexdigest()[:12]
+
 
 # ─── Tool Dispatcher ──────────────────────────────────────────────────────────
 
 async def _dispatch_tool(tool_name: str, tool_args: dict, db, user_id, role) -> tuple[dict, dict | None]:
     """
-    Runs the actual DB function for the given tool name.
+    Runs the registered handler for the given tool name (validated args, deadline, result cache).
     Returns (result_dict, chart_data_or_None).
     """
-    from app.services.analytics_service import (
-        get_nps_for_category, get_dashboard_stats,
-        sentiment_counts, get_trend_over_time,
-        compare_products, get_product_reviews, get_allowed_categories
-    )
-
-    if tool_name == "get_nps":
-        result = await get_nps_for_category(db, tool_args["category"], user_id, role)
-        return result, None
-
-    elif tool_name == "get_best_worst_products":
-        # Use dashboard stats filtered to category, extract top/bad products
-        category = tool_args["category"]
-        allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
-        if role != "admin" and category not in allowed_cats:
-            return {"error": "Access denied"}, None
-
-        pipeline = [
-            {"$match": {"category": category}},
-            {"$lookup": {
-                "from": "reviews",
-                "localField": "id",
-                "foreignField": "product_id",
-                "as": "reviews"
-            }},
-            {"$project": {
-                "id": 1, "name": 1, "category": 1,
-                "review_count": {"$size": "$reviews"},
-                "avg_rating": {"$avg": "$reviews.rating"},
-                "promoters": {"$size": {"$filter": {
-                    "input": "$reviews", "as": "r",
-                    "cond": {"$gte": ["$$r.rating", 4]}
-                }}},
-                "detractors": {"$size": {"$filter": {
-                    "input": "$reviews", "as": "r",
-                    "cond": {"$lte": ["$$r.rating", 2]}
-                }}}
-            }},
-            {"$match": {"review_count": {"$gte": 3}}},
-        ]
-        cursor = db.products.aggregate(pipeline)
-        raw = await cursor.to_list(length=50)
-
-        scored = []
-        for p in raw:
-            total = p["review_count"]
-            nps = round(((p["promoters"] - p["detractors"]) / total) * 100) if total > 0 else 0
-            name = p["name"]
-            scored.append({
-                "name": name[:30] + "…" if len(name) > 30 else name,
-                "nps": nps,
-                "avg_rating": round(p["avg_rating"], 1) if p["avg_rating"] else 0,
-                "review_count": total
-            })
-
-        scored.sort(key=lambda x: x["nps"], reverse=True)
-        top = scored[:5]
-        worst = sorted(scored[-5:], key=lambda x: x["nps"])
-
-        chart_data = {
-            "type": "bar",
-            "title": f"Top & Worst Products — {category}",
-            "labels": [p["name"] for p in top + worst],
-            "datasets": [{"label": "NPS Score", "data": [p["nps"] for p in top + worst]}]
-        }
-        return {"category": category, "top_products": top, "worst_products": worst}, chart_data
-
-    elif tool_name == "get_product_sentiment":
-        product_id = tool_args["product_id"]
-        happy, unhappy = await sentiment_counts(db, product_id, user_id, role)
-        total = happy + unhappy
-        chart_data = {
-            "type": "pie",
-            "title": f"Sentiment — Product {product_id}",
-            "labels": ["Happy (4-5★)", "Unhappy (1-3★)"],
-            "datasets": [{"label": "Sentiment", "data": [happy, unhappy]}]
-        }
-        return {
-            "product_id": product_id,
-            "happy": happy,
-            "unhappy": unhappy,
-            "happy_pct": round((happy / total) * 100) if total > 0 else 0
-        }, chart_data
-
-    elif tool_name == "get_trend":
-        result = await get_trend_over_time(db, tool_args["category"], user_id, role)
-        chart_data = result.pop("chart_data", None)
-        return result, chart_data
-
-    elif tool_name == "compare_products":
-        from app.services.analytics_service import compare_products as _compare
-        result = await _compare(db, tool_args["product_ids"], user_id, role)
-        chart_data = result.pop("chart_data", None)
-        return result, chart_data
-
-    elif tool_name == "summarize_product_reviews":
-        product_id = tool_args["product_id"]
-        question = tool_args.get("question", "Summarize these reviews.")
-        reviews = await get_product_reviews(db, product_id, user_id, role)
-        if not reviews:
-            return {"error": "No reviews found or access denied for this product"}, None
-        # Sort by helpful votes if available, take top 25
-        reviews_sorted = sorted(reviews, key=lambda r: r.get("helpful_votes", 0), reverse=True)
-        return {"product_id": product_id, "review_count": len(reviews), "top_25_reviews": reviews_sorted[:25], "question": question}, None
-
-    return {"error": f"Unknown tool: {tool_name}"}, None
+    return await registry.dispatch(tool_name, tool_args, db, user_id, role)
 
 
 # ─── Main Entry Point ─────────────────────────────────────────────────────────
@@ -248,152 +63,330 @@ async def _dispatch_tool(tool_name: str, tool_args: dict, db, user_id, role) ->
 async def run_tool_call(query: str, db, user_id, role, context_product_id: int | None = None):
     """
     Full tool-calling pipeline:
-    1. Send query + tools to Gemini
-    2. Gemini picks a tool and returns FunctionCall
-    3. Dispatcher runs the DB function
-    4. Gemini formats the result into a final answer
+    1. Resolve the tool locally (intent_router) or send query + tools to Gemini
+    2. Gemini picks one or more tools and returns FunctionCalls
+    3. Dispatcher runs the DB functions concurrently
+    4. Gemini formats all results into one final answer
 
     Returns:
         {
           "answer": str,
-          "tool_used": str,
-          "tool_args": dict,
-          "chart_data": dict | None
+          "tool_used": str,              # "multiple" when several tools ran
+          "tool_args": dict,             # {"calls": [{tool, args}, ...]} when several
+          "chart_data": dict | None,     # first chart
+          "charts": list[dict],
+          "routed_by": "local" | "gemini",
+          "timings": {"step1_ms", "tool_ms", "step2_ms", "tokens_saved"}
         }
     """
+    augmented_query = _augment(query, context_product_id)
+    started = time.perf_counter()
+
+    # Step 1: Resolve plainly worded queries locally; otherwise ask Gemini which tools to call
+    try:
+        calls, routed_by, direct_answer = await _choose_tools(query, augmented_query, db, context_product_id)
+    except Exception as e:
+        if _rate_limited(e):
+            return {"answer": RATE_LIMIT_ANSWER, "tool_used": None, "tool_args": None, "chart_data": None, "charts": []}
+        raise
+
+    if not calls:
+        return {"answer": direct_answer, "tool_used": "none", "tool_args": {}, "chart_data": None, "charts": []}
+
+    timings = {"step1_ms": _elapsed_ms(started)}
+    return await _run_selected_tools(calls, augmented_query, db, user_id, role, routed_by, timings)
+
+
+RATE_LIMIT_ANSWER = "The AI service is temporarily unavailable due to rate limits. Please try again in a few seconds."
+FORMAT_RATE_LIMIT_ANSWER = "I have the data ready, but the AI formatter is hit with a rate limit. Please try again briefly."
+
+# Compound questions: at most MAX_TOOL_CALLS per turn, TOOL_DB_CONCURRENCY of them querying the DB at once
+MAX_TOOL_CALLS = 5
+TOOL_DB_CONCURRENCY = int(os.getenv("TOOL_DB_CONCURRENCY", "3"))
+
+# Token budgets for what we send Gemini (see app/utils/prompt_packing.py)
+TOOL_RESULT_TOKENS = int(os.getenv("TOOL_RESULT_TOKENS", "4000"))
+SUMMARY_PROMPT_TOKENS = int(os.getenv("SUMMARY_PROMPT_TOKENS", "3000"))
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _rate_limited(e: Exception) -> bool:
+    return "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+
+def _augment(query: str, context_product_id: int | None) -> str:
     # If user gives contextual product_id, inject it into the query
-    augmented_query = query
     if context_product_id:
-        augmented_query = f"{query} (Context: product_id={context_product_id})"
+        return f"{query} (Context: product_id={context_product_id})"
+    return query
+
+
+async def _choose_tools(query: str, augmented_query: str, db, context_product_id: int | None):
+    """
+    Step 1. Returns (calls, routed_by, direct_answer) where calls is a list of
+    (tool_name, tool_args); empty only when Gemini answered without a tool.
+    """
+    route = await intent_router.route(db, query, context_product_id)
+    if route:
+        return [(route.tool, route.args)], "local", None
 
     config = types.GenerateContentConfig(
-        system_instruction=SYSTEM_PROMPT,
+        system_instruction=f"{SYSTEM_PROMPT}\nToday's date is {date.today().isoformat()}.",
         tools=TOOLS,
         tool_config=types.ToolConfig(
             function_calling_config=types.FunctionCallingConfig(mode="ANY")
         )
     )
+    response1 = await gateway.generate_content(
+        model='gemini-2.5-flash',
+        contents=augmented_query,
+        config=config,
+        timeout=15.0
+    )
 
-    # Step 1: Ask Gemini which tool to call
-    def _call_gemini_step1():
-        return client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=augmented_query,
-            config=config
-        )
+    # Collect every function call in the response (compound questions yield several)
+    calls = [
+        (part.function_call.name, dict(part.function_call.args or {}))
+        for part in response1.candidates[0].content.parts
+        if part.function_call
+    ]
+    if calls:
+        return calls[:MAX_TOOL_CALLS], "gemini", None
 
-    try:
-        response1 = await asyncio.wait_for(
-            asyncio.to_thread(_call_gemini_step1),
-            timeout=15.0
-        )
-    except Exception as e:
-        if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-            return {
-                "answer": "The AI service is temporarily unavailable due to rate limits. Please try again in a few seconds.",
-                "tool_used": None,
-                "tool_args": None,
-                "chart_data": None
-            }
-        raise
+    # Gemini chose to answer directly (shouldn't happen with mode=ANY, but handle gracefully)
+    return [], "gemini", response1.text or "I couldn't determine which analysis to run."
 
-    # Extract function call from response
-    tool_name = None
-    tool_args = {}
-    for part in response1.candidates[0].content.parts:
-        if part.function_call:
-            tool_name = part.function_call.name
-            tool_args = dict(part.function_call.args)
-            break
 
-    if not tool_name:
-        # Gemini chose to answer directly (shouldn't happen with mode=ANY, but handle gracefully)
-        answer_text = response1.text or "I couldn't determine which analysis to run."
-        return {"answer": answer_text, "tool_used": "none", "tool_args": {}, "chart_data": None}
+def _describe_calls(calls: list) -> tuple[str, dict]:
+    """tool_used / tool_args as returned and logged; several calls are reported as "multiple"."""
+    if len(calls) == 1:
+        return calls[0]
+    return "multiple", {"calls": [{"tool": name, "args": args} for name, args in calls]}
 
-    # Step 2: Run the actual DB tool
-    tool_result, chart_data = await _dispatch_tool(tool_name, tool_args, db, user_id, role)
 
-    # Step 3: Handle summarize_product_reviews specially (needs LLM pass)
-    if tool_name == "summarize_product_reviews" and "error" not in tool_result:
-        reviews = tool_result["top_25_reviews"]
-        question = tool_result["question"]
-        final_answer = await summarize_reviews(question, reviews)
-        return {
-            "answer": final_answer,
-            "tool_used": tool_name,
-            "tool_args": tool_args,
-            "chart_data": None
-        }
+async def _dispatch_all(calls: list, db, user_id, role) -> tuple[list, list]:
+    """Run every call concurrently; returns (results in call order, non-empty charts)."""
+    limit = asyncio.Semaphore(TOOL_DB_CONCURRENCY)
+
+    async def run(name, args):
+        async with limit:
+            try:
+                return await _dispatch_tool(name, args, db, user_id, role)
+            except Exception as e:
+                if len(calls) == 1:
+                    raise
+                traceback.print_exc()
+                return {"error": f"{name} failed: {e}"}, None
 
-    # Step 4: Send tool result back to Gemini for final formatted answer
-    import json
-    tool_result_text = json.dumps(tool_result, default=str)
+    outcomes = await asyncio.gather(*(run(name, args) for name, args in calls))
+    return [result for result, _ in outcomes], [chart for _, chart in outcomes if chart is not None]
 
-    conversation = [
+
+def _step2_contents(augmented_query: str, calls: list, results: list) -> tuple[list, int]:
+    """Step-4 conversation with compacted tool results; also returns the tokens compaction saved."""
+    packed = [compact_result(result, TOOL_RESULT_TOKENS // len(calls)) for result in results]
+    contents = [
         types.Content(role="user", parts=[types.Part(text=augmented_query)]),
         types.Content(
             role="model",
-            parts=[types.Part(function_call=types.FunctionCall(name=tool_name, args=tool_args))]
+            parts=[types.Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in calls]
         ),
         types.Content(
             role="user",
-            parts=[types.Part(function_response=types.FunctionResponse(
-                name=tool_name,
-                response={"result": tool_result}
-            ))]
+            parts=[
+                types.Part(function_response=types.FunctionResponse(
+                    name=name,
+                    response={"result": result.value}
+                ))
+                for (name, _), result in zip(calls, packed)
+            ]
         )
     ]
+    return contents, sum(result.tokens_saved for result in packed)
 
-    config2 = types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT)
 
-    def _call_gemini_step2():
-        return client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=conversation,
-            config=config2
-        )
+def _is_summary(calls: list, results: list) -> bool:
+    """A lone summarize_product_reviews call is answered by a summary pass, not step 4."""
+    return len(calls) == 1 and calls[0][0] == "summarize_product_reviews" and "error" not in results[0]
+
+
+async def _summarize_tool_result(db, tool_args: dict, tool_result: dict) -> str:
+    """Step 3 for summarize_product_reviews: a summary pass instead of formatting."""
+    if "summary" in tool_result:   # all_reviews: already map-reduced by the dispatcher
+        return tool_result["summary"]
+    from app.services.summary_store import get_summary
+    return await get_summary(
+        db, tool_result["question"], tool_result["top_25_reviews"], product_id=tool_result["product_id"],
+        stratified=bool(tool_args.get("mix_ratings"))
+    )
 
+
+def _answer_cache_key(augmented_query: str, tool_used: str, tool_args: dict, results: list) -> str:
+    return answer_key(augmented_query, tool_used, tool_args, results[0] if len(results) == 1 else results,
+                      PROMPT_VERSION)
+
+
+async def _run_selected_tools(calls: list, augmented_query: str, db, user_id, role, routed_by: str,
+                              timings: dict | None = None):
+    """Steps 2-4 once the tools are chosen (by Gemini or the local intent router)."""
+    tool_used, tool_args = _describe_calls(calls)
+    timings = {} if timings is None else timings
+
+    # Step 2: Run the actual DB tools
+    started = time.perf_counter()
+    results, charts = await _dispatch_all(calls, db, user_id, role)
+    timings["tool_ms"] = _elapsed_ms(started)
+    response = {
+        "answer": "",
+        "tool_used": tool_used,
+        "tool_args": tool_args,
+        "chart_data": charts[0] if charts else None,
+        "charts": charts,
+        "routed_by": routed_by,
+        "timings": timings
+    }
+
+    started = time.perf_counter()
+    try:
+        response["answer"] = await _final_answer(calls, results, tool_used, tool_args, augmented_query, db, timings)
+    finally:
+        timings["step2_ms"] = _elapsed_ms(started)
+    return response
+
+
+async def _final_answer(calls: list, results: list, tool_used: str, tool_args: dict, augmented_query: str, db,
+                        timings: dict) -> str:
+    # Step 3: Handle summarize_product_reviews specially (needs LLM pass)
+    if _is_summary(calls, results):
+        return await _summarize_tool_result(db, tool_args, results[0])
+
+    # Step 4: Send tool results back to Gemini for one final formatted answer,
+    # unless this question with these exact tools / args / results was already formatted
+    cache_key = _answer_cache_key(augmented_query, tool_used, tool_args, results)
+    cached = await answer_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    contents, timings["tokens_saved"] = _step2_contents(augmented_query, calls, results)
     try:
-        response2 = await asyncio.wait_for(
-            asyncio.to_thread(_call_gemini_step2),
+        response2 = await gateway.generate_content(
+            model='gemini-2.5-flash',
+            contents=contents,
+            config=types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT),
             timeout=15.0
         )
     except Exception as e:
-        if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-            return {
-                "answer": "I have the data ready, but the AI formatter is hit with a rate limit. Please try again briefly.",
-                "tool_used": tool_name,
-                "tool_args": tool_args,
-                "chart_data": chart_data
-            }
+        if _rate_limited(e):
+            return FORMAT_RATE_LIMIT_ANSWER
         raise
 
-    final_answer = response2.text or "I retrieved the data but couldn't format an answer."
+    answer = response2.text or "I retrieved the data but couldn't format an answer."
+    if response2.text and not any("error" in r for r in results):
+        await answer_cache.set(cache_key, answer)
+    return answer
+
+
+# ─── Streaming Entry Point ────────────────────────────────────────────────────
+
+async def stream_tool_call(query: str, db, user_id, role, context_product_id: int | None = None):
+    """
+    Same pipeline as run_tool_call, yielded as (event, data) pairs as soon as
+    each stage finishes:
+
+      tool    {tool_used, tool_args, routed_by}
+      result  {tool_result, chart_data, charts}    right after the DB queries
+      token   {text}                               step-4 answer, chunk by chunk
+      done    the dict run_tool_call would return
 
-    return {
-        "answer": final_answer,
-        "tool_used": tool_name,
+    tool_result is a list (in call order) when several tools ran.
+    An error after streaming started is reported as an `error` event before `done`.
+    """
+    augmented_query = _augment(query, context_product_id)
+
+    try:
+        calls, routed_by, direct_answer = await _choose_tools(query, augmented_query, db, context_product_id)
+    except Exception as e:
+        if not _rate_limited(e):
+            raise
+        yield "token", {"text": RATE_LIMIT_ANSWER}
+        yield "done", {"answer": RATE_LIMIT_ANSWER, "tool_used": None, "tool_args": None, "chart_data": None, "charts": []}
+        return
+
+    if not calls:
+        yield "token", {"text": direct_answer}
+        yield "done", {"answer": direct_answer, "tool_used": "none", "tool_args": {}, "chart_data": None, "charts": []}
+        return
+
+    tool_used, tool_args = _describe_calls(calls)
+    yield "tool", {"tool_used": tool_used, "tool_args": tool_args, "routed_by": routed_by}
+
+    results, charts = await _dispatch_all(calls, db, user_id, role)
+    result = {
+        "answer": "",
+        "tool_used": tool_used,
         "tool_args": tool_args,
-        "chart_data": chart_data
+        "chart_data": charts[0] if charts else None,
+        "charts": charts,
+        "routed_by": routed_by,
+        "timings": {}
+    }
+    yield "result", {
+        "tool_result": results[0] if len(results) == 1 else results,
+        "chart_data": result["chart_data"],
+        "charts": charts
     }
 
+    if _is_summary(calls, results):
+        result["answer"] = await _summarize_tool_result(db, tool_args, results[0])
+        yield "token", {"text": result["answer"]}
+        yield "done", result
+        return
+
+    cache_key = _answer_cache_key(augmented_query, tool_used, tool_args, results)
+    cached = await answer_cache.get(cache_key)
+    if cached is not None:
+        result["answer"] = cached
+        yield "token", {"text": cached}
+        yield "done", result
+        return
+
+    contents, result["timings"]["tokens_saved"] = _step2_contents(augmented_query, calls, results)
+    parts = []
+    try:
+        async for chunk in gateway.generate_content_stream(
+            model='gemini-2.5-flash',
+            contents=contents,
+            config=types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT),
+            timeout=30.0
+        ):
+            if chunk.text:
+                parts.append(chunk.text)
+                yield "token", {"text": chunk.text}
+    except Exception as e:
+        if parts:
+            yield "error", {"message": str(e) or type(e).__name__}
+        elif _rate_limited(e):
+            parts.append(FORMAT_RATE_LIMIT_ANSWER)
+            yield "token", {"text": FORMAT_RATE_LIMIT_ANSWER}
+        else:
+            raise
+    else:
+        if parts and not any("error" in r for r in results):
+            await answer_cache.set(cache_key, "".join(parts))
 
-# ─── Legacy: direct summarization (still used by /analytics/insights) ─────────
+    result["answer"] = "".join(parts) or "I retrieved the data but couldn't format an answer."
+    yield "done", result
 
-async def summarize_reviews(question: str, reviews: list) -> str:
-    """Direct LLM summarization of reviews (no tool-calling). Used by analytics/insights."""
-    # Sort by helpful_votes if available, cap at 25 to control token cost
-    reviews_sorted = sorted(reviews, key=lambda r: r.get("helpful_votes", 0), reverse=True)
-    text = "\n".join([r.get("review_text", r.get("text", "")) for r in reviews_sorted[:25] if r.get("review_text") or r.get("text")])
 
-    if not text.strip():
-        return "No review text available for analysis."
+# ─── Direct summarization (stored / reused via summary_store) ─────────────────
 
-    prompt = f"""You are an expert ecommerce product analyst.
+SUMMARY_PROMPT = """You are an expert ecommerce product analyst.
 Review the following customer reviews and answer: "{question}"
 
-Customer Reviews:
+Customer Reviews ([stars ×n] = n near-identical reviews):
 {text}
 
 Format your response EXACTLY with these markdown headers:
@@ -407,19 +400,49 @@ Format your response EXACTLY with these markdown headers:
 (2-3 actionable bullet points)
 """
 
-    def generate():
-        return client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-        )
+# Part of every stored summary key (summary_store): editing the prompt, the
+# packing budget or the model retires old summaries
+SUMMARY_PROMPT_VERSION = hashlib.sha256(
+    f"gemini-2.5-flash\n{SUMMARY_PROMPT_TOKENS}\n{SUMMARY_PROMPT}".encode()
+).hexdigest()[:12]
+
+
+def _review_text(reviews: list) -> str:
+    # Near-duplicates collapsed, long texts truncated, packed to the token budget across ratings
+    return pack_reviews(reviews, SUMMARY_PROMPT_TOKENS).lines()
 
+
+@single_flight()   # identical concurrent requests share one Gemini call
+async def generate_summary(question: str, reviews: list) -> str:
+    """
+    One Gemini summarization call; raises on timeout / API errors and on an
+    empty response, so callers never show or store a missing summary (see
+    summarize_reviews).
+    """
+    text = _review_text(reviews)
+
+    if not text.strip():
+        return "No review text available for analysis."
+
+    response = await gateway.generate_content(
+        model='gemini-2.5-flash',
+        contents=SUMMARY_PROMPT.format(question=question, text=text),
+        timeout=20.0
+    )
+    if not response.text:   # blocked by a safety filter or cut off before any text
+        raise RuntimeError("Gemini returned no summary text")
+    return response.text
+
+
+def summary_error_message(e: Exception) -> str:
+    if _rate_limited(e):
+        return "Summarization is temporarily unavailable due to rate limits."
+    return f"Error during summarization: {str(e)}"
+
+
+async def summarize_reviews(question: str, reviews: list) -> str:
+    """Direct LLM summarization of reviews (no tool-calling). Used by analytics/insights."""
     try:
-        response = await asyncio.wait_for(
-            asyncio.to_thread(generate),
-            timeout=20.0
-        )
-        return response.text
+        return await generate_summary(question, reviews)
     except Exception as e:
-        if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-            return "Summarization is temporarily unavailable due to rate limits."
-        return f"Error during summarization: {str(e)}"
\ No newline at end of file
+        return summary_error_message(e)
@@ -0,0 +1,175 @@
+"""
+map_reduce_summary.py — Summaries over every review in a scope
+
+generate_summary sees the 25 sampled reviews only. summarize_all reads all of
+them instead:
+
+  1. Chunk   reviews are read in _id (insertion) order and packed into chunks
+             of about SUMMARY_CHUNK_TOKENS estimated tokens. New reviews land
+             in the last chunk, so earlier chunks keep their exact content.
+  2. Map     every chunk is condensed into theme notes with counts, at most
+             SUMMARY_MAP_CONCURRENCY Gemini calls at a time.
+  3. Reduce  notes are merged REDUCE_FAN_IN at a time, level by level, until
+             one set is left; a last call answers the question in the usual
+             Summary / Key Complaints / Highlights / Recommendations format.
+
+Map and merge prompts do not depend on the question, and every call's output
+is stored in `summary_chunks` under a hash of its prompt and input. Re-running
+after new reviews arrive only pays for the changed chunk and the merges above
+it. Wall clock is roughly (chunks / concurrency) + log_fanin(chunks) calls.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from datetime import datetime
+
+from app.services.analytics_service import iter_reviews
+from app.services.gemini_gateway import gateway
+from app.utils.prompt_packing import estimate_tokens
+from app.utils.singleflight import single_flight
+
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+MAX_REVIEWS = int(os.getenv("SUMMARY_MAX_REVIEWS", "20000"))
+REDUCE_FAN_IN = 8
+
+MAP_PROMPT = """You are condensing one batch of customer reviews for a product analyst.
+From the {n} reviews below (star rating in brackets), list as terse bullet points:
+Complaints: recurring problems, each with the number of reviews that mention it
+Praise: recurring positives, each with the number of reviews that mention it
+Notable: rare but serious issues (safety, defects, counterfeit, fraud)
+
+Reviews:
+{body}
+"""
+
+MERGE_PROMPT = """Merge these notes, each taken from a separate batch of reviews of the same scope,
+into one set of notes in the same Complaints / Praise / Notable format.
+Add up the counts of themes that mean the same thing, keep the 10 most frequent
+themes per section, and keep every Notable item.
+
+{body}
+"""
+
+FINAL_PROMPT = """You are an expert ecommerce product analyst.
+The notes below condense all {n} customer reviews (theme counts in parentheses).
+Using them, answer: "{question}"
+
+Notes:
+{body}
+
+Format your response EXACTLY with these markdown headers:
+### Summary
+(Brief 2-3 sentence overview)
+### Key Complaints
+(3-5 bullet points)
+### Positive Highlights
+(3-5 bullet points)
+### Recommendations
+(2-3 actionable bullet points)
+"""
+
+
+def _review_line(review: dict) -> str:
+    text = " ".join((review.get("review_text") or "").split())
+    return f"[{review.get('rating', '?')}★] {text}" if text else ""
+
+
+def chunk_reviews(reviews: list, budget: int = CHUNK_TOKENS) -> list:
+    """Pack review lines, in order, into chunks of at most `budget` estimated tokens."""
+    chunks, current, used = [], [], 0
+    for review in reviews:
+        line = _review_line(review)
+        if not line:
+            continue
+        line = line[:budget * 4]
+        cost = estimate_tokens(line)
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _key(prompt: str) -> str:
+    return hashlib.sha256(json.dumps(["gemini-2.5-flash", prompt]).encode()).hexdigest()
+
+
+class _Run:
+    """One summarize_all call: cached Gemini calls under a shared worker limit."""
+
+    def __init__(self, db, concurrency: int):
+        self.db = db
+        self.limit = asyncio.Semaphore(concurrency)
+        self.calls = 0
+        self.cache_hits = 0
+
+    async def generate(self, kind: str, prompt: str) -> str:
+        key = _key(prompt)
+        doc = await self.db.summary_chunks.find_one({"_id": key}, {"text": 1})
+        if doc:
+            self.cache_hits += 1
+            return doc["text"]
+
+        async with self.limit:
+            response = await gateway.generate_content(model='gemini-2.5-flash', contents=prompt, timeout=30.0)
+        self.calls += 1
+        text = response.text or ""
+        if text:
+            await self.db.summary_chunks.update_one(
+                {"_id": key},
+                {"$set": {"kind": kind, "text": text, "created_at": datetime.utcnow()}},
+                upsert=True
+            )
+        return text
+
+    async def map(self, chunk: list) -> str:
+        return await self.generate("map", MAP_PROMPT.format(n=len(chunk), body="\n".join(chunk)))
+
+    async def reduce(self, notes: list) -> list:
+        """Merge notes REDUCE_FAN_IN at a time until one is left."""
+        while len(notes) > 1:
+            groups = [notes[i:i + REDUCE_FAN_IN] for i in range(0, len(notes), REDUCE_FAN_IN)]
+            notes = await asyncio.gather(*(self.merge(group) for group in groups))
+        return notes
+
+    async def merge(self, notes: list) -> str:
+        if len(notes) == 1:
+            return notes[0]
+        body = "\n\n".join(f"--- Batch {i + 1} ---\n{n}" for i, n in enumerate(notes))
+        return await self.generate("merge", MERGE_PROMPT.format(body=body))
+
+
+@single_flight()
+async def summarize_all(db, question: str, user_id, role, category=None, product_id=None,
+                        concurrency: int = MAP_CONCURRENCY) -> dict:
+    """
+    Map-reduce summary over every scoped review (up to SUMMARY_MAX_REVIEWS).
+    Returns {summary, reviews, chunks, calls, cache_hits}; raises on Gemini errors.
+    """
+    reviews = [r async for r in iter_reviews(
+        db, user_id, role, category, product_id, fields=["rating", "review_text"],
+        limit=MAX_REVIEWS, batch_size=1000
+    )]
+    chunks = chunk_reviews(reviews)
+    if not chunks:
+        return {"summary": "No review text available for analysis.", "reviews": len(reviews),
+                "chunks": 0, "calls": 0, "cache_hits": 0}
+
+    run = _Run(db, concurrency)
+    notes = await asyncio.gather(*(run.map(chunk) for chunk in chunks))
+    (merged,) = await run.reduce(list(notes))
+    summary = await run.generate("final", FINAL_PROMPT.format(n=len(reviews), question=question, body=merged))
+
+    return {
+        "summary": summary,
+        "reviews": len(reviews),
+        "chunks": len(chunks),
+        "calls": run.calls,
+        "cache_hits": run.cache_hits,
+    }
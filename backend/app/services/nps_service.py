@@ -1,14 +1,136 @@
+"""
+nps_service.py — Net Promoter Score arithmetic
+
+Every NPS figure is computed from an NPSAccumulator: review counts per star
+bucket (1..5). Promoters are the 4 and 5 star buckets, detractors the 1 and 2
+star buckets. Accumulators merge by adding counts, so the NPS of any union of
+products, categories or months is the merge of its parts' accumulators, and
+the product_stats / bucket histograms load straight into one.
+
+A rating r falls in bucket floor(r + 0.5) clamped to 1..5, i.e. bucket b
+holds [b - 0.5, b + 0.5). star_bucket / star_buckets / star_bucket_bounds
+here, and stats_service.star_bucket_expr in Mongo, are the only definitions.
+
+    acc = NPSAccumulator.from_histogram(row["histogram"])
+    acc.merge(NPSAccumulator.from_ratings(ratings))
+    acc.score   # -> int, 0 when empty
+"""
+
+import math
+
+import numpy as np
+
+STAR_KEYS = ("1", "2", "3", "4", "5")
+
+
+def star_bucket(rating) -> int:
+    """Map a (possibly float) star rating onto its 1..5 bucket (round half up)."""
+    return min(5, max(1, math.floor(float(rating) + 0.5)))
+
+
+def star_buckets(ratings) -> np.ndarray:
+    """star_bucket over an array of ratings."""
+    return np.clip(np.floor(np.asarray(ratings, dtype=np.float64) + 0.5), 1, 5).astype(np.int64)
+
+
+def star_bucket_bounds(bucket) -> tuple:
+    """(low, high) rating range of a bucket, low inclusive, high exclusive; None = unbounded."""
+    b = int(bucket)
+    return (b - 0.5 if b > 1 else None, b + 0.5 if b < 5 else None)
+
+
+class NPSAccumulator:
+    __slots__ = ("counts",)
+
+    def __init__(self, counts=None):
+        self.counts = [int(c) for c in counts] if counts is not None else [0] * 5
+
+    # ─── Building ─────────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_histogram(cls, histogram: dict, prefix: str = ""):
+        """From {"1": n, ..., "5": n} (or e.g. prefix="rating_" for rating_1..rating_5)."""
+        return cls(histogram.get(f"{prefix}{k}", 0) or 0 for k in STAR_KEYS)
+
+    @classmethod
+    def from_ratings(cls, ratings):
+        return cls().add_many(ratings)
+
+    def add(self, rating, n: int = 1):
+        self.counts[star_bucket(rating) - 1] += n
+        return self
+
+    def add_many(self, ratings):
+        """Vectorized bulk update from any sequence / array of ratings."""
+        r = np.asarray(ratings, dtype=np.float64).ravel()
+        if r.size:
+            idx = star_buckets(r) - 1
+            for i, n in enumerate(np.bincount(idx, minlength=5)):
+                self.counts[i] += int(n)
+        return self
+
+    def merge(self, other: "NPSAccumulator"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        return self
+
+    def unmerge(self, other: "NPSAccumulator"):
+        """Take out counts merged earlier (e.g. a month leaving a window)."""
+        if any(n > have for n, have in zip(other.counts, self.counts)):
+            raise ValueError(f"cannot unmerge {other!r} from {self!r}")
+        for i, n in enumerate(other.counts):
+            self.counts[i] -= n
+        return self
+
+    @classmethod
+    def combine(cls, parts):
+        acc = cls()
+        for part in parts:
+            acc.merge(part)
+        return acc
+
+    def __add__(self, other):
+        return NPSAccumulator(self.counts).merge(other)
+
+    def __sub__(self, other):
+        return NPSAccumulator(self.counts).unmerge(other)
+
+    def __eq__(self, other):
+        return isinstance(other, NPSAccumulator) and self.counts == other.counts
+
+    def __repr__(self):
+        return f"NPSAccumulator({self.counts})"
+
+    # ─── Reading ──────────────────────────────────────────────────────────────
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def promoters(self) -> int:
+        return self.counts[3] + self.counts[4]
+
+    @property
+    def detractors(self) -> int:
+        return self.counts[0] + self.counts[1]
+
+    @property
+    def score(self) -> int:
+        """NPS = %promoters - %detractors, rounded; 0 for an empty accumulator."""
+        total = self.total
+        if total == 0:
+            return 0
+        return round(((self.promoters - self.detractors) / total) * 100)
+
+    def histogram(self) -> dict:
+        return dict(zip(STAR_KEYS, self.counts))
+
+
 def calculate_nps(reviews):
     """
     Calculate NPS from a list of review dicts.
     NPS = (% promoters) - (% detractors)
-    Promoters: rating >= 4, Detractors: rating <= 2
+    Promoters: 4-5 star buckets (rating >= 3.5), Detractors: 1-2 (rating < 2.5)
     """
-    promoters = sum(1 for r in reviews if r.get("rating", 0) >= 4)
-    detractors = sum(1 for r in reviews if r.get("rating", 0) <= 2)
-    total = len(reviews)
-
-    if total == 0:
-        return 0
-
-    return round(((promoters / total) * 100) - ((detractors / total) * 100))
\ No newline at end of file
+    return NPSAccumulator.from_ratings([r.get("rating", 0) for r in reviews]).score
@@ -0,0 +1,71 @@
+"""
+pipeline_builder.py — Shared aggregation pipeline construction for analytics
+
+Every analytics query is assembled here so that:
+  1. role-scope and filter predicates always form the leading $match
+     (so they can use the category / product_id indexes), and
+  2. any $lookup comes after that $match and uses a sub-pipeline that
+     projects only the fields the caller reads.
+
+    build_pipeline(
+        match=scope_match(role, allowed_cats, category="Electronics"),
+        joins=[lookup("products", "product_id", "id", "product", fields=["name"])],
+        stages=[{"$group": ...}]
+    )
+"""
+
+
+def scope_match(role, allowed_cats, category=None, product_id=None, product_ids=None, extra=None) -> dict:
+    """
+    Build the leading $match document: the caller's role scope plus filters.
+    Analysts are limited to `allowed_cats`; admins see every category.
+    """
+    match = dict(extra or {})
+
+    if product_id is not None:
+        match["product_id"] = product_id
+    elif product_ids is not None:
+        match["product_id"] = {"$in": list(product_ids)}
+
+    conditions = []
+    if role != "admin":
+        conditions.append({"category": {"$in": list(allowed_cats)}})
+    if category:
+        conditions.append({"category": category})
+
+    if len(conditions) == 1:
+        match.update(conditions[0])
+    elif conditions:
+        match["$and"] = conditions
+
+    return match
+
+
+def lookup(from_collection: str, local_field: str, foreign_field: str, as_field: str,
+           fields=None, pipeline=None) -> dict:
+    """
+    $lookup with a sub-pipeline. `pipeline` stages run inside the joined
+    collection; `fields` (if given) is appended as a projection so only those
+    fields are carried back into the outer document.
+    """
+    sub = list(pipeline or [])
+    if fields:
+        sub.append({"$project": {"_id": 0, **{f: 1 for f in fields}}})
+
+    return {"$lookup": {
+        "from": from_collection,
+        "localField": local_field,
+        "foreignField": foreign_field,
+        "pipeline": sub,
+        "as": as_field
+    }}
+
+
+def build_pipeline(match=None, joins=(), stages=()) -> list:
+    """Assemble stages in scope-first order: $match, then joins, then the rest."""
+    pipeline = []
+    if match:
+        pipeline.append({"$match": match})
+    pipeline.extend(joins)
+    pipeline.extend(stages)
+    return pipeline
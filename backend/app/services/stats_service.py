@@ -0,0 +1,250 @@
+"""
+stats_service.py — Incrementally maintained per-product review rollups
+
+Every analytics read that only needs counts goes through the `product_stats`
+collection instead of re-joining products to the full reviews collection.
+One document per product:
+
+    {
+      product_id, name, category,
+      review_count, rating_sum,
+      histogram: {"1": n, "2": n, "3": n, "4": n, "5": n},
+      promoters, detractors, happy, unhappy
+    }
+
+Reviews with a BSON `review_date` are also folded into monthly buckets with
+the same counters:
+
+    review_buckets    one doc per (product_id, month), carries category
+    category_buckets  one doc per (category, month)
+
+so a 12-month category trend reads 12 small documents.
+
+Ingest paths call `init_product_stats` when a product is created,
+`record_review` after each review insert, and `bump_data_version` once the
+batch is written. `rebuild_product_stats` / `rebuild_review_buckets`
+recompute everything from scratch (see rebuild_stats.py).
+"""
+
+from datetime import datetime
+
+from app.services.pipeline_builder import build_pipeline, lookup
+from app.services.columnar_engine import engine
+from app.services.nps_service import star_bucket
+from app.utils.cache import VersionCounter
+
+RATING_KEYS = ["1", "2", "3", "4", "5"]
+
+# Bumped whenever review data changes; result caches keyed on it drop stale entries
+data_version = VersionCounter("review_data")
+
+
+async def bump_data_version(db) -> int:
+    """Call once after an ingest batch (not per review) to invalidate result caches."""
+    return await data_version.bump(db)
+
+
+def star_bucket_expr(field: str = "$rating") -> dict:
+    """nps_service.star_bucket as an aggregation expression; null when the rating is missing."""
+    return {"$cond": [
+        {"$gt": [field, None]},
+        {"$min": [5, {"$max": [1, {"$floor": {"$add": [field, 0.5]}}]}]},
+        None
+    ]}
+
+
+def empty_stats() -> dict:
+    return {
+        "review_count": 0,
+        "rating_sum": 0,
+        "histogram": {k: 0 for k in RATING_KEYS},
+        "promoters": 0,
+        "detractors": 0,
+        "happy": 0,
+        "unhappy": 0,
+    }
+
+
+def review_increments(rating) -> dict:
+    """The `$inc` document that folds one review into a product_stats row."""
+    rating = float(rating)
+    bucket = star_bucket(rating)
+    return {
+        "review_count": 1,
+        "rating_sum": rating,
+        f"histogram.{bucket}": 1,
+        "promoters": 1 if bucket >= 4 else 0,
+        "detractors": 1 if bucket <= 2 else 0,
+        "happy": 1 if bucket >= 4 else 0,
+        "unhappy": 1 if bucket <= 3 else 0,
+    }
+
+
+async def init_product_stats(db, product: dict):
+    """Create the zeroed rollup row for a freshly inserted product."""
+    await db.product_stats.update_one(
+        {"product_id": product["id"]},
+        {
+            "$set": {"name": product.get("name", ""), "category": product.get("category")},
+            "$setOnInsert": empty_stats(),
+        },
+        upsert=True
+    )
+
+
+def month_start(dt: datetime) -> datetime:
+    return datetime(dt.year, dt.month, 1)
+
+
+async def record_review(db, product: dict, review: dict):
+    """Fold a newly ingested review into its product's rollup row and monthly buckets."""
+    inc = review_increments(review["rating"])
+    category = product.get("category")
+
+    await db.product_stats.update_one(
+        {"product_id": product["id"]},
+        {
+            "$set": {"name": product.get("name", ""), "category": category},
+            "$inc": inc,
+        },
+        upsert=True
+    )
+
+    review_date = review.get("review_date")
+    if isinstance(review_date, datetime):
+        month = month_start(review_date)
+        await db.review_buckets.update_one(
+            {"product_id": product["id"], "month": month},
+            {"$set": {"category": category}, "$inc": inc},
+            upsert=True
+        )
+        await db.category_buckets.update_one(
+            {"category": category, "month": month},
+            {"$inc": inc},
+            upsert=True
+        )
+
+    # Keep this worker's columnar copy current without waiting for a version sync
+    engine.append(product, review)
+
+
+def _count_if(cond):
+    return {"$sum": {"$cond": [cond, 1, 0]}}
+
+
+def rating_accumulators() -> dict:
+    """$group accumulators over raw reviews, matching review_increments()."""
+    bucket = star_bucket_expr()
+    return {
+        "review_count": {"$sum": 1},
+        "rating_sum": {"$sum": "$rating"},
+        **{f"r{k}": _count_if({"$eq": [bucket, int(k)]}) for k in RATING_KEYS},
+        "promoters": _count_if({"$in": [bucket, [4, 5]]}),
+        "detractors": _count_if({"$in": [bucket, [1, 2]]}),
+        "unhappy": _count_if({"$in": [bucket, [1, 2, 3]]}),
+    }
+
+
+def rollup_fields(prefix: str = "$") -> dict:
+    """$project spec turning rating_accumulators() output into the rollup shape."""
+    return {
+        "review_count": {"$ifNull": [f"{prefix}review_count", 0]},
+        "rating_sum": {"$ifNull": [f"{prefix}rating_sum", 0]},
+        "histogram": {k: {"$ifNull": [f"{prefix}r{k}", 0]} for k in RATING_KEYS},
+        "promoters": {"$ifNull": [f"{prefix}promoters", 0]},
+        "detractors": {"$ifNull": [f"{prefix}detractors", 0]},
+        "happy": {"$ifNull": [f"{prefix}promoters", 0]},
+        "unhappy": {"$ifNull": [f"{prefix}unhappy", 0]},
+    }
+
+
+def rollup_sums() -> dict:
+    """$group accumulators that add rollup-shaped documents together."""
+    return {
+        "review_count": {"$sum": "$review_count"},
+        "rating_sum": {"$sum": "$rating_sum"},
+        **{f"r{k}": {"$sum": f"$histogram.{k}"} for k in RATING_KEYS},
+        "promoters": {"$sum": "$promoters"},
+        "detractors": {"$sum": "$detractors"},
+        "unhappy": {"$sum": "$unhappy"},
+    }
+
+
+async def rebuild_product_stats(db):
+    """
+    Recompute product_stats for every product from the raw reviews.
+    Products without reviews get a zeroed row so lookups by id still resolve.
+    """
+    pipeline = build_pipeline(
+        joins=[lookup("reviews", "id", "product_id", "agg", pipeline=[
+            {"$group": {"_id": None, **rating_accumulators()}}
+        ])],
+        stages=[
+            {"$unwind": {"path": "$agg", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "_id": 0,
+                "product_id": "$id",
+                "name": 1,
+                "category": 1,
+                **rollup_fields("$agg.")
+            }},
+            {"$out": "product_stats"}
+        ]
+    )
+
+    cursor = db.products.aggregate(pipeline)
+    await cursor.to_list(length=None)
+    await bump_data_version(db)
+    return await db.product_stats.count_documents({})
+
+
+async def rebuild_category_buckets(db, categories=None):
+    """
+    Recompute category_buckets from review_buckets, either entirely or only
+    for the given categories (e.g. both sides of a product reassignment).
+    """
+    match = {"category": {"$in": list(categories)}} if categories is not None else {}
+    await db.category_buckets.delete_many(match)
+
+    pipeline = build_pipeline(
+        match=match,
+        stages=[
+            {"$group": {"_id": {"category": "$category", "month": "$month"}, **rollup_sums()}},
+            {"$project": {"_id": 0, "category": "$_id.category", "month": "$_id.month", **rollup_fields()}},
+            {"$merge": {"into": "category_buckets", "on": ["category", "month"], "whenMatched": "replace"}}
+        ]
+    )
+    cursor = db.review_buckets.aggregate(pipeline)
+    await cursor.to_list(length=None)
+
+
+async def rebuild_review_buckets(db):
+    """Recompute both monthly bucket collections from dated reviews."""
+    pipeline = build_pipeline(
+        match={"review_date": {"$type": "date"}},
+        stages=[
+            {"$group": {
+                "_id": {
+                    "product_id": "$product_id",
+                    "month": {"$dateTrunc": {"date": "$review_date", "unit": "month"}}
+                },
+                "category": {"$first": "$category"},
+                **rating_accumulators()
+            }},
+            {"$project": {
+                "_id": 0,
+                "product_id": "$_id.product_id",
+                "month": "$_id.month",
+                "category": 1,
+                **rollup_fields()
+            }},
+            {"$out": "review_buckets"}
+        ]
+    )
+    cursor = db.reviews.aggregate(pipeline)
+    await cursor.to_list(length=None)
+
+    await db.category_buckets.create_index([("category", 1), ("month", 1)], unique=True)
+    await rebuild_category_buckets(db)
+    await bump_data_version(db)
+    return await db.review_buckets.count_documents({})
@@ -0,0 +1,168 @@
+"""
+summary_store.py — Content-addressed review summaries
+
+A summary depends only on the question and the exact reviews sent to Gemini,
+so it is stored in `review_summaries` under
+
+    _id = sha256(scope, review-set hash, question template, prompt version)
+
+scope      "product:<id>" / "category:<name>" / "all"
+review-set sha256 over the (rating, text) of the sampled reviews
+template   a name for the standard prompts, else a hash of the normalized question
+prompt     llm_service.SUMMARY_PROMPT_VERSION (model + summarization prompt)
+
+When reviews, the prompt or the model change, the key changes, so a stored
+summary is never stale. Every hit stamps last_used; summaries nobody has
+asked for in 30 days age out through a TTL index on that field.
+
+Every request also bumps a counter in `summary_views`. With
+SUMMARY_REFRESH=1 a background worker wakes every SUMMARY_REFRESH_INTERVAL
+seconds and, once the review data version has moved, regenerates summaries
+for the SUMMARY_REFRESH_TOP most-viewed (scope, question) pairs, so the next
+request for them is answered from the store.
+"""
+
+import json
+import asyncio
+import hashlib
+from datetime import datetime
+
+from app.services.stats_service import data_version
+from app.services.analytics_service import get_review_sample
+from app.services.llm_service import generate_summary, summary_error_message, SUMMARY_PROMPT_VERSION
+
+SAMPLE_SIZE = 25
+
+# Fixed prompts used by the UI; other questions are keyed by their own hash
+TEMPLATES = {
+    "insights": "Please provide 3-4 bullet points summarizing the main themes, complaints, and highlights from these reviews.",
+    "summarize": "Summarize these reviews.",
+}
+_TEMPLATE_BY_TEXT = {" ".join(q.lower().split()): name for name, q in TEMPLATES.items()}
+
+
+def _sha(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def scope_key(category=None, product_id=None) -> str:
+    if product_id is not None:
+        return f"product:{int(product_id)}"
+    if category:
+        return f"category:{category}"
+    return "all"
+
+
+def template_key(question: str) -> str:
+    normalized = " ".join((question or "").lower().split())
+    return _TEMPLATE_BY_TEXT.get(normalized) or f"q:{_sha(normalized)[:16]}"
+
+
+def review_set_hash(reviews: list) -> str:
+    return _sha(sorted((r.get("rating"), r.get("review_text") or r.get("text") or "") for r in reviews))
+
+
+def summary_key(scope: str, reviews: list, question: str) -> str:
+    return _sha([scope, review_set_hash(reviews), template_key(question), SUMMARY_PROMPT_VERSION])
+
+
+async def _record_view(db, scope: str, category, product_id, question: str, stratified: bool):
+    await db.summary_views.update_one(
+        {"_id": _sha([scope, template_key(question), stratified])},
+        {
+            "$inc": {"views": 1},
+            "$set": {
+                "scope": scope, "category": category, "product_id": product_id,
+                "question": question, "stratified": stratified,
+                "last_viewed": datetime.utcnow()
+            }
+        },
+        upsert=True
+    )
+
+
+async def _store(db, key: str, scope: str, question: str, reviews: list, summary: str):
+    now = datetime.utcnow()
+    await db.review_summaries.update_one(
+        {"_id": key},
+        {"$set": {
+            "scope": scope,
+            "template": template_key(question),
+            "review_hash": review_set_hash(reviews),
+            "summary": summary,
+            "prompt_version": SUMMARY_PROMPT_VERSION,
+            "created_at": now,
+            "last_used": now
+        }},
+        upsert=True
+    )
+
+
+async def get_summary(db, question: str, reviews: list, category=None, product_id=None, stratified=False) -> str:
+    """
+    Stored summary for this question over exactly these reviews, generating
+    (and storing) it with Gemini only on a miss.
+    """
+    scope = scope_key(category, product_id)
+    key = summary_key(scope, reviews, question)
+    await _record_view(db, scope, category, product_id, question, stratified)
+
+    doc = await db.review_summaries.find_one_and_update(
+        {"_id": key}, {"$set": {"last_used": datetime.utcnow()}}, projection={"summary": 1}
+    )
+    if doc:
+        return doc["summary"]
+
+    try:
+        summary = await generate_summary(question, reviews)
+    except Exception as e:
+        return summary_error_message(e)
+
+    if summary:
+        await _store(db, key, scope, question, reviews, summary)
+    return summary
+
+
+# ─── Background Refresh ───────────────────────────────────────────────────────
+
+async def refresh_popular(db, top_n: int = 20) -> int:
+    """Pre-generate missing summaries for the most-viewed (scope, question) pairs."""
+    cursor = db.summary_views.find({}).sort("views", -1).limit(top_n)
+    generated = 0
+    async for view in cursor:
+        reviews, _ = await get_review_sample(
+            db, None, "admin", view.get("category"), view.get("product_id"),
+            k=SAMPLE_SIZE, stratified=view.get("stratified", False)
+        )
+        if not reviews:
+            continue
+        key = summary_key(view["scope"], reviews, view["question"])
+        if await db.review_summaries.find_one({"_id": key}, {"_id": 1}):
+            continue
+        try:
+            summary = await generate_summary(view["question"], reviews)
+        except Exception as e:
+            print(f"Summary refresh for {view['scope']} failed: {e}")
+            continue
+        await _store(db, key, view["scope"], view["question"], reviews, summary)
+        generated += 1
+    return generated
+
+
+async def refresh_worker(db, interval: float, top_n: int):
+    """Run refresh_popular whenever the review data version has moved."""
+    seen = None
+    while True:
+        try:
+            version = await data_version.current(db)
+            if version != seen:
+                generated = await refresh_popular(db, top_n)
+                seen = version
+                if generated:
+                    print(f"Summary refresh: generated {generated} summaries")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Summary refresh failed: {e}")
+        await asyncio.sleep(interval)
+
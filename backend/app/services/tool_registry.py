@@ -0,0 +1,234 @@
+"""
+tool_registry.py — Chat tools: declaration, handler, deadline and cache in one place
+
+Each tool is registered once with its Gemini FunctionDeclaration:
+
+    @registry.tool(types.FunctionDeclaration(...), timeout=10.0, cache_ttl=60.0)
+    async def _nps(db, user_id, role, args, date_from, date_to):
+        return result, chart_data_or_None
+
+ToolRegistry.dispatch(name, args, db, user_id, role) then
+  - validates / coerces args against the declared schema (required fields,
+    types — Gemini sends ints as 3.0 —, array length, unknown keys dropped),
+  - parses the optional date_from / date_to window,
+  - serves a cached (result, chart) if the tool has a cache_ttl; the key is
+    tool name + category scope fingerprint + normalized args, and the whole
+    cache is dropped when the review data version moves,
+  - runs the handler under its deadline; a timeout or bad argument comes back
+    as {"error": ...} so Gemini can still answer, other exceptions propagate.
+
+Per tool it counts calls, cache hits, timeouts, invalid args, errors and keeps
+a latency histogram of executed (not cached) calls; see stats().
+"""
+
+import copy
+import json
+import time
+import asyncio
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+
+from google.genai import types
+
+from app.services.analytics_service import get_allowed_categories, scope_fingerprint, parse_window
+from app.services.stats_service import data_version
+from app.utils.cache import TTLCache, MISSING
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls land in "+inf"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# ─── Latency histogram ────────────────────────────────────────────────────────
+
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (max_ms for the last one)."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def stats(self) -> dict:
+        labels = [f"<={b}" for b in self.bounds] + ["+inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.total_ms / self.count, 1) if self.count else 0,
+            "max": round(self.max_ms, 1),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+# ─── Argument validation ──────────────────────────────────────────────────────
+
+def _type_name(schema) -> str:
+    return getattr(schema.type, "value", schema.type) or ""
+
+
+def _coerce(name: str, schema, value):
+    kind = _type_name(schema)
+    if kind == "STRING":
+        if not isinstance(value, str):
+            raise ValueError(f"'{name}' must be a string")
+        return value.strip()
+    if kind == "INTEGER":
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"'{name}' must be an integer")
+        return value
+    if kind == "NUMBER":
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"'{name}' must be a number")
+        return value
+    if kind == "BOOLEAN":
+        if not isinstance(value, bool):
+            raise ValueError(f"'{name}' must be true or false")
+        return value
+    if kind == "ARRAY":
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"'{name}' must be a list")
+        low, high = schema.min_items, schema.max_items
+        if (low is not None and len(value) < int(low)) or (high is not None and len(value) > int(high)):
+            raise ValueError(f"'{name}' needs {low or 0} to {high or 'any number of'} items, got {len(value)}")
+        return [_coerce(name, schema.items, v) for v in value] if schema.items else list(value)
+    if kind == "OBJECT":
+        return validate_args(schema, value, prefix=f"{name}.")
+    return value
+
+
+def validate_args(schema, args, prefix: str = "") -> dict:
+    """Args checked and coerced against an OBJECT schema; unknown keys are dropped."""
+    if not isinstance(args, dict):
+        raise ValueError(f"'{prefix.rstrip('.') or 'args'}' must be an object")
+    properties = schema.properties or {}
+    clean = {}
+    for key, value in args.items():
+        if key in properties and value is not None:
+            clean[key] = _coerce(prefix + key, properties[key], value)
+    for key in schema.required or []:
+        if clean.get(key) in (None, "", []):
+            raise ValueError(f"'{prefix + key}' is required")
+    return clean
+
+
+# ─── Registry ─────────────────────────────────────────────────────────────────
+
+@dataclass
+class ToolSpec:
+    declaration: types.FunctionDeclaration
+    handler: object                       # async (db, user_id, role, args, date_from, date_to) -> (result, chart)
+    timeout: float
+    cache_ttl: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    counts: Counter = field(default_factory=Counter)
+
+    @property
+    def name(self) -> str:
+        return self.declaration.name
+
+    def stats(self) -> dict:
+        return {"timeout_s": self.timeout, "cache_ttl": self.cache_ttl, **self.counts,
+                "latency_ms": self.latency.stats()}
+
+
+class ToolRegistry:
+    def __init__(self, cache_size: int = 512):
+        self.specs = {}
+        self.cache = TTLCache(maxsize=cache_size, ttl=60.0)
+        self.unknown = 0
+
+    def tool(self, declaration: types.FunctionDeclaration, timeout: float = 10.0, cache_ttl: float = 0.0):
+        """Decorator registering `handler` as the implementation of `declaration`."""
+        def register(handler):
+            self.specs[declaration.name] = ToolSpec(declaration, handler, timeout, cache_ttl)
+            return handler
+        return register
+
+    def tools(self) -> list:
+        """The declarations in registration order, as passed to Gemini."""
+        return [types.Tool(function_declarations=[spec.declaration for spec in self.specs.values()])]
+
+    @property
+    def names(self) -> list:
+        return list(self.specs)
+
+    async def dispatch(self, name: str, args: dict, db, user_id, role) -> tuple[dict, dict | None]:
+        """Run one tool call; returns (result_dict, chart_data_or_None)."""
+        spec = self.specs.get(name)
+        if spec is None:
+            self.unknown += 1
+            return {"error": f"Unknown tool: {name}"}, None
+        spec.counts["calls"] += 1
+
+        try:
+            args = validate_args(spec.declaration.parameters, args or {})
+        except ValueError as e:
+            spec.counts["invalid_args"] += 1
+            return {"error": str(e)}, None
+        try:
+            date_from, date_to = parse_window(args.get("date_from"), args.get("date_to"))
+        except ValueError:
+            spec.counts["invalid_args"] += 1
+            return {"error": "Invalid date range; dates must be YYYY-MM-DD"}, None
+
+        key = version = None
+        if spec.cache_ttl > 0:
+            version = await data_version.current(db)
+            self.cache.sync_version(version)
+            allowed_cats = await get_allowed_categories(db, user_id) if role != "admin" else []
+            key = json.dumps([name, scope_fingerprint(role, allowed_cats), args], sort_keys=True, default=str)
+            cached = self.cache.get(key)
+            if cached is not MISSING:
+                spec.counts["cache_hits"] += 1
+                return copy.deepcopy(cached)
+
+        started = time.perf_counter()
+        try:
+            result, chart = await asyncio.wait_for(
+                spec.handler(db, user_id, role, args, date_from, date_to), spec.timeout
+            )
+        except asyncio.TimeoutError:
+            spec.counts["timeouts"] += 1
+            return {"error": f"{name} timed out after {spec.timeout:g}s"}, None
+        except Exception:
+            spec.counts["errors"] += 1
+            raise
+        finally:
+            spec.latency.observe((time.perf_counter() - started) * 1000)
+
+        if "error" in result:
+            spec.counts["error_results"] += 1
+        elif key is not None and self.cache.version == version:
+            self.cache.set(key, copy.deepcopy((result, chart)), ttl=spec.cache_ttl)
+        return result, chart
+
+    def stats(self) -> dict:
+        return {
+            "tools": {name: spec.stats() for name, spec in self.specs.items()},
+            "unknown_tool_calls": self.unknown,
+            "cache": self.cache.stats(),
+        }
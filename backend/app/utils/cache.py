@@ -0,0 +1,101 @@
+"""
+cache.py — Small in-process caching primitives shared by the services.
+
+TTLCache       LRU-bounded dict whose entries expire after `ttl` seconds,
+               with hit / miss / eviction counters.
+VersionCounter A named integer kept in the `cache_versions` collection.
+               Writers bump it; every worker polls it (at most once per
+               `check_interval` seconds) and drops its cache when it moves,
+               so invalidations reach all processes, not just the local one.
+"""
+
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()   # key -> (expires_at, value)
+
+    def get(self, key, default=MISSING):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return MISSING if entry is None else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def sync_version(self, version):
+        """Drop every entry if the shared version moved since the last call."""
+        if version != self.version:
+            self._data.clear()
+            self.version = version
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "version": self.version,
+        }
+
+
+class VersionCounter:
+    def __init__(self, name: str, check_interval: float = 2.0):
+        self.name = name
+        self.check_interval = check_interval
+        self._value = 0
+        self._checked_at = float("-inf")
+
+    async def current(self, db) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            doc = await db.cache_versions.find_one({"_id": self.name})
+            self._value = doc["version"] if doc else 0
+            self._checked_at = now
+        return self._value
+
+    async def bump(self, db) -> int:
+        doc = await db.cache_versions.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=True
+        )
+        self._value = doc["version"]
+        self._checked_at = time.monotonic()
+        return self._value
@@ -0,0 +1,240 @@
+"""
+prompt_packing.py — Fit review text and tool results into a token budget
+
+pack_reviews      drops near-duplicate reviews (MinHash over character
+                  5-shingles, LSH banding, estimated Jaccard >= 0.8) keeping
+                  the most helpful copy and a ×n count, truncates long texts
+                  at a word boundary, then fills the budget round-robin across
+                  star ratings so every rating stays represented.
+compact_result    the same for a tool result sent back to Gemini: review lists
+                  are packed, long strings truncated, floats rounded, and the
+                  longest lists trimmed until the JSON fits.
+
+Both return their tokens in / out (and tokens_saved) for the call and add them
+to running totals per kind; see packing_stats().
+"""
+
+import re
+import json
+import hashlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+
+SHINGLE = 5
+NUM_PERM = 64
+BANDS = 16                      # 16 bands x 4 rows: candidates from ~0.5 similarity
+DUPLICATE_THRESHOLD = 0.8
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+_stats = defaultdict(Counter)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def packing_stats() -> dict:
+    return {
+        kind: {**c, "tokens_saved": c["tokens_in"] - c["tokens_out"]}
+        for kind, c in _stats.items()
+    }
+
+
+def _record(kind: str, tokens_in: int, tokens_out: int, duplicates: int = 0, truncated: int = 0):
+    c = _stats[kind]
+    c["calls"] += 1
+    c["tokens_in"] += tokens_in
+    c["tokens_out"] += tokens_out
+    c["duplicates"] += duplicates
+    c["truncated"] += truncated
+
+
+# ─── Near-duplicate detection ─────────────────────────────────────────────────
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def minhash(text: str) -> np.ndarray:
+    norm = _normalize(text)
+    shingles = {norm[i:i + SHINGLE] for i in range(max(1, len(norm) - SHINGLE + 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") % _PRIME for s in shingles],
+        dtype=np.uint64
+    )
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def duplicate_groups(texts: list, threshold: float = DUPLICATE_THRESHOLD) -> list:
+    """Group indexes of near-identical texts; each group is sorted, first index first."""
+    signatures = [minhash(t) for t in texts]
+    rows = NUM_PERM // BANDS
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets = defaultdict(list)
+    for i, sig in enumerate(signatures):
+        for b in range(BANDS):
+            buckets[(b, sig[b * rows:(b + 1) * rows].tobytes())].append(i)
+
+    for members in buckets.values():
+        for j in members[1:]:
+            i = members[0]
+            if find(i) != find(j) and np.mean(signatures[i] == signatures[j]) >= threshold:
+                parent[find(j)] = find(i)
+
+    groups = defaultdict(list)
+    for i in range(len(texts)):
+        groups[find(i)].append(i)
+    return sorted(groups.values())
+
+
+# ─── Reviews ──────────────────────────────────────────────────────────────────
+
+@dataclass
+class PackedReviews:
+    reviews: list          # [{"rating", "text", "count"}] in prompt order
+    duplicates: int
+    truncated: int
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def lines(self) -> str:
+        return "\n".join(review_line(r) for r in self.reviews)
+
+
+def review_line(review: dict) -> str:
+    count = f" ×{review['count']}" if review.get("count", 1) > 1 else ""
+    return f"[{review.get('rating', '?')}★{count}] {review['text']}"
+
+
+def truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+def pack_reviews(reviews: list, budget: int = 3000, max_chars: int = 1200, kind: str = "reviews") -> PackedReviews:
+    texts, items = [], []
+    for r in reviews:
+        text = " ".join((r.get("review_text") or r.get("text") or "").split())
+        if text:
+            texts.append(text)
+            items.append(r)
+    tokens_in = sum(estimate_tokens(t) for t in texts)
+
+    # Keep the most helpful copy of each near-duplicate group, remembering how many there were
+    kept = []
+    for group in duplicate_groups(texts):
+        best = max(group, key=lambda i: items[i].get("helpful_votes", 0) or 0)
+        kept.append((items[best], texts[best], len(group)))
+
+    # Round-robin over star ratings, most helpful first within each, until the budget is used
+    by_rating = defaultdict(list)
+    for item, text, count in kept:
+        by_rating[item.get("rating")].append((item, text, count))
+    queues = [
+        sorted(q, key=lambda e: e[0].get("helpful_votes", 0) or 0, reverse=True)
+        for _, q in sorted(by_rating.items(), key=lambda kv: -(kv[0] or 0))
+    ]
+
+    packed, used, truncated = [], 0, 0
+    while any(queues):
+        for q in queues:
+            if not q:
+                continue
+            item, text, count = q.pop(0)
+            short = truncate(text, max_chars)
+            entry = {"rating": item.get("rating"), "text": short, "count": count}
+            cost = estimate_tokens(review_line(entry))
+            if used + cost > budget:
+                continue
+            truncated += short != text
+            packed.append(entry)
+            used += cost
+
+    result = PackedReviews(packed, len(texts) - len(kept), truncated, tokens_in, used)
+    _record(kind, tokens_in, used, result.duplicates, truncated)
+    return result
+
+
+# ─── Tool results ─────────────────────────────────────────────────────────────
+
+def _tokens(value) -> int:
+    return estimate_tokens(json.dumps(value, default=str))
+
+
+def _shrink(value, max_chars: int, review_budget: int):
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, str):
+        return truncate(value, max_chars)
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_chars, review_budget) for k, v in value.items()}
+    if isinstance(value, list):
+        if value and all(isinstance(v, dict) and ("review_text" in v or "text" in v) for v in value):
+            return pack_reviews(value, review_budget, max_chars, kind="tool_reviews").reviews
+        return [_shrink(v, max_chars, review_budget) for v in value]
+    return value
+
+
+def _longest_list(value, path=()):
+    """(length, path) of the longest list anywhere inside `value`."""
+    best = (len(value), path) if isinstance(value, list) else (0, path)
+    children = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    for k, v in children:
+        best = max(best, _longest_list(v, path + (k,)), key=lambda b: b[0])
+    return best
+
+
+@dataclass
+class CompactResult:
+    value: object          # the compacted copy, as sent to Gemini
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+def compact_result(result, budget: int = 4000, max_chars: int = 600) -> CompactResult:
+    """A copy of a tool result that fits `budget` tokens as JSON (best effort)."""
+    tokens_in = _tokens(result)
+    compact = _shrink(result, max_chars, review_budget=budget // 2)
+
+    while _tokens(compact) > budget:
+        length, path = _longest_list(compact)
+        if length <= 3:
+            break
+        parent = compact
+        for k in path[:-1]:
+            parent = parent[k]
+        lst = parent[path[-1]] if path else compact
+        keep = length // 2
+        trimmed = lst[:keep] + [f"... {length - keep} more omitted"]
+        if path:
+            parent[path[-1]] = trimmed
+        else:
+            compact = trimmed
+
+    packed = CompactResult(compact, tokens_in, _tokens(compact))
+    _record("tool_result", tokens_in, packed.tokens_out)
+    return packed
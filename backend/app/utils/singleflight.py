@@ -0,0 +1,112 @@
+"""
+singleflight.py — Coalesce identical in-flight async calls
+
+SingleFlight.do(key, fn, ...) starts fn once per key; callers that arrive
+while it runs await the same task instead of repeating the DB / LLM work.
+
+  - errors reach every waiter (the task's exception is re-raised to each),
+  - a cancelled waiter only detaches; the shared task is cancelled once the
+    last waiter is gone, so abandoned work does not keep running,
+  - the key is forgotten as soon as the task finishes or is abandoned:
+    this coalesces, it does not cache.
+
+@single_flight() wraps an async function. The default key is the function
+name plus its bound arguments (minus `db`), JSON-normalized; pass `key=` to
+key on something coarser, e.g. a scope fingerprint. Results are deep-copied
+per waiter unless copy_result=False, because callers often mutate them.
+"""
+
+import copy
+import json
+import asyncio
+import inspect
+import functools
+from dataclasses import dataclass
+
+_flights = []
+
+
+@dataclass
+class _Call:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self.started = 0
+        self.shared = 0
+        self.cancelled = 0
+        _flights.append(self)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key, fn, *args, **kwargs):
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            self.started += 1
+
+            def _forget(_, key=key, call=call):
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+            call.task.add_done_callback(_forget)
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Last waiter left (cancelled): nobody wants the result any more.
+                # Forget the key now, not in the done callback, so a caller
+                # arriving while the task unwinds starts fresh work instead of
+                # joining a cancelled task.
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+                self.cancelled += 1
+
+    def stats(self) -> dict:
+        return {"started": self.started, "shared": self.shared, "cancelled": self.cancelled,
+                "inflight": self.inflight}
+
+
+def _default_key(fn):
+    signature = inspect.signature(fn)
+
+    def key(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        bound.arguments.pop("db", None)
+        return json.dumps(bound.arguments, sort_keys=True, default=str)
+
+    return key
+
+
+def single_flight(key=None, copy_result: bool = True):
+    """Decorator: concurrent calls with the same key share one execution."""
+    def decorate(fn):
+        flight = SingleFlight(fn.__qualname__)
+        make_key = key or _default_key(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            result = await flight.do(make_key(*args, **kwargs), fn, *args, **kwargs)
+            return copy.deepcopy(result) if copy_result else result
+
+        wrapper.flight = flight
+        return wrapper
+    return decorate
+
+
+def single_flight_stats() -> dict:
+    return {f.name: f.stats() for f in _flights}
@@ -0,0 +1,231 @@
+"""
+bench_chat.py — Offline latency benchmark of /chat/ask, end to end
+
+Runs the real FastAPI app in-process against
+  - fake_gemini_server.py on a free local port (latency / 429 rate configurable),
+  - a local mongod (DATABASE_URL, default mongodb://localhost:27017), using a
+    separate `insightlens_bench` database seeded with synthetic reviews.
+
+At each concurrency level it sends --requests queries per tool, phrased so the
+fake server calls each of the six tools, and reports p50 / p95 / p99 of step 1
+(tool selection), the DB tool and step 2 (answer / summary) from the response
+`timings`, plus end to end.
+
+The intent router and answer cache are off so every request pays for both
+Gemini steps; --router / --cache turn them back on.
+
+Usage:
+    mongod --dbpath /tmp/bench-db &        # any local mongod
+    cd backend
+    python bench_chat.py --concurrency 1,8,32 --requests 50 --latency-ms 300 --error-rate 0.05
+    python bench_chat.py --reseed          # rebuild the synthetic dataset first
+"""
+import os, sys, time, random, socket, asyncio, argparse, threading
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+parser.add_argument("--requests", type=int, default=30, help="requests per tool per level")
+parser.add_argument("--latency-ms", type=int, default=300, help="fake Gemini latency per call")
+parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of Gemini calls answered 429")
+parser.add_argument("--rpm", type=float, default=100_000, help="gateway token bucket (GEMINI_RPM)")
+parser.add_argument("--gemini-concurrency", type=int, default=64, help="GEMINI_MAX_CONCURRENCY")
+parser.add_argument("--mongo-url", default=os.getenv("DATABASE_URL", "mongodb://localhost:27017"))
+parser.add_argument("--db-name", default="insightlens_bench")
+parser.add_argument("--products", type=int, default=20, help="products per category when seeding")
+parser.add_argument("--reviews", type=int, default=200, help="reviews per product when seeding")
+parser.add_argument("--reseed", action="store_true")
+parser.add_argument("--router", action="store_true", help="keep the local intent router on")
+parser.add_argument("--cache", action="store_true", help="keep the step-2 answer cache on")
+parser.add_argument("--seed", type=int, default=7)
+args = parser.parse_args()
+
+# The app reads these at import time
+os.environ.update(
+    GEMINI_API_KEY="fake",
+    GEMINI_RPM=str(args.rpm),
+    GEMINI_MAX_CONCURRENCY=str(args.gemini_concurrency),
+    INTENT_ROUTER="1" if args.router else "0",
+)
+if not args.cache:
+    os.environ["ANSWER_CACHE_TTL"] = "0"
+
+import httpx
+import uvicorn
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from fake_gemini_server import create_app as create_fake_gemini
+
+CATEGORIES = ["Electronics", "Books", "Toys", "Kitchen", "Garden", "Sports"]
+WORDS = ("great quality cheap broke battery fast slow love hate returned works perfectly "
+         "stopped working after week size fits small large color faded arrived damaged").split()
+STEPS = ("step1_ms", "tool_ms", "step2_ms", "total_ms")
+
+
+# ─── Fake Gemini ──────────────────────────────────────────────────────────────
+
+def start_fake_gemini() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = create_fake_gemini(latency_ms=args.latency_ms, error_rate=args.error_rate, fail_code=429)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+# ─── Synthetic dataset ────────────────────────────────────────────────────────
+
+async def seed(db, rng):
+    from setup_db import create_indexes
+    from app.services.stats_service import rebuild_product_stats, rebuild_review_buckets
+
+    for name in ("products", "reviews", "product_stats", "review_buckets", "category_buckets",
+                 "review_summaries", "summary_views", "summary_chunks", "conversations"):
+        await db[name].drop()
+
+    products, reviews = [], []
+    start = datetime(2023, 1, 1)
+    for c, category in enumerate(CATEGORIES):
+        for i in range(args.products):
+            pid = c * args.products + i + 1
+            products.append({"id": pid, "name": f"{category} item {i + 1}", "category": category})
+            bias = rng.uniform(-1.5, 1.0)
+            for _ in range(args.reviews):
+                rating = float(min(5, max(1, round(rng.gauss(4 + bias, 1.2)))))
+                reviews.append({
+                    "product_id": pid,
+                    "category": category,
+                    "rating": rating,
+                    "review_text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 60))),
+                    "review_date": start + timedelta(days=rng.randint(0, 700)),
+                    "helpful_votes": int(rng.expovariate(0.3)),
+                    "sentiment": "happy" if rating >= 4 else "unhappy",
+                })
+
+    await db.products.insert_many(products)
+    for i in range(0, len(reviews), 10_000):
+        await db.reviews.insert_many(reviews[i:i + 10_000])
+    await create_indexes(db)
+    await rebuild_product_stats(db)
+    await rebuild_review_buckets(db)
+    print(f"Seeded {len(products)} products, {len(reviews)} reviews into {args.db_name}")
+
+
+# ─── Workload ─────────────────────────────────────────────────────────────────
+
+def make_query(tool: str, rng, product_ids: list) -> str:
+    """Phrasings fake_gemini_server routes to `tool`."""
+    category = rng.choice(CATEGORIES)
+    pid = rng.choice(product_ids)
+    return {
+        "get_nps": f"What is the NPS for {category}",
+        "get_best_worst_products": f"Which are the best products in {category}",
+        "get_trend": f"Show the trend for {category}",
+        "get_product_sentiment": f"How do customers feel about product {pid}",
+        "compare_products": f"compare product {pid} and {rng.choice(product_ids)}",
+        "summarize_product_reviews": f"summarize reviews of product {pid}",
+    }[tool]
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+async def run_level(client, level: int, rng, product_ids: list) -> dict:
+    from app.services.llm_service import TOOLS, RATE_LIMIT_ANSWER, FORMAT_RATE_LIMIT_ANSWER
+
+    tools = [f.name for f in TOOLS[0].function_declarations]
+    work = [(tool, make_query(tool, rng, product_ids)) for tool in tools for _ in range(args.requests)]
+    rng.shuffle(work)
+
+    samples = {tool: {step: [] for step in STEPS} for tool in tools}
+    errors, rate_limited = [], 0
+    queue = asyncio.Queue()
+    for item in work:
+        queue.put_nowait(item)
+
+    async def worker():
+        nonlocal rate_limited
+        while not queue.empty():
+            tool, query = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                r = await client.post("/chat/ask", json={"query": query})
+                body = r.json()
+            except Exception as e:
+                errors.append(f"{tool}: {e}")
+                continue
+            total = (time.perf_counter() - started) * 1000
+            if r.status_code != 200 or body.get("tool_used") != tool:
+                if body.get("answer") in (RATE_LIMIT_ANSWER, FORMAT_RATE_LIMIT_ANSWER):
+                    rate_limited += 1
+                else:
+                    errors.append(f"{tool}: HTTP {r.status_code} {str(body)[:120]}")
+                continue
+            if body.get("answer") == FORMAT_RATE_LIMIT_ANSWER:
+                rate_limited += 1
+            timings = body.get("timings", {})
+            for step in STEPS[:-1]:
+                samples[tool][step].append(timings.get(step, 0.0))
+            samples[tool]["total_ms"].append(total)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(level)))
+    return {"samples": samples, "errors": errors, "rate_limited": rate_limited,
+            "elapsed": time.perf_counter() - started, "requests": len(work)}
+
+
+def report(level: int, result: dict):
+    elapsed, n = result["elapsed"], result["requests"]
+    print(f"\n=== concurrency {level}: {n} requests in {elapsed:.1f}s ({n / elapsed:.1f} req/s), "
+          f"{len(result['errors'])} errors, {result['rate_limited']} rate-limited ===")
+    header = f"{'tool':<27}" + "".join(f"{s.replace('_ms', ''):>21}" for s in STEPS)
+    print(header)
+    print(f"{'':<27}" + f"{'p50 / p95 / p99 ms':>21}" * len(STEPS))
+    for tool, steps in result["samples"].items():
+        cells = "".join(
+            f"{percentile(v, 50):>7.0f}{percentile(v, 95):>7.0f}{percentile(v, 99):>7.0f}"
+            for v in (steps[s] for s in STEPS)
+        )
+        print(f"{tool:<27}{cells}")
+    for e in result["errors"][:5]:
+        print(f"  ! {e}")
+
+
+async def main():
+    rng = random.Random(args.seed)
+    base_url = start_fake_gemini()
+    os.environ["GEMINI_BASE_URL"] = base_url
+
+    from app.main import app
+    from app.database import get_db
+    from app.utils.dependencies import get_current_user
+
+    db = AsyncIOMotorClient(args.mongo_url, serverSelectionTimeoutMS=3000)[args.db_name]
+    try:
+        await db.command("ping")
+    except Exception as e:
+        sys.exit(f"Cannot reach MongoDB at {args.mongo_url}: {e}")
+    if args.reseed or await db.reviews.estimated_document_count() == 0:
+        await seed(db, rng)
+    product_ids = await db.products.distinct("id")
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "bench", "role": "admin"}
+
+    print(f"Fake Gemini at {base_url}: {args.latency_ms} ms per call, {args.error_rate:.0%} 429s")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for level in [int(c) for c in args.concurrency.split(",")]:
+            await db.review_summaries.delete_many({})
+            report(level, await run_level(client, level, rng, product_ids))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
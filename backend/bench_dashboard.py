@@ -0,0 +1,238 @@
+"""
+bench_dashboard.py — Compare the dashboard before and after the product_stats
+rollup + $facet rewrite.
+
+Variants (admin scope):
+  legacy         the original three aggregations over products, each joining
+                 every review with $lookup + $unwind (the baseline code)
+  3 x aggregate  the three sections as separate aggregations over product_stats
+  1 x $facet     the single $facet aggregation used by get_dashboard_stats
+
+Reports median wall time, server execution time and documents examined
+(from explain "executionStats") for each variant, checks the two rollup
+variants return identical section data, and checks the full
+get_dashboard_stats response equals the legacy response (on integer ratings;
+the legacy code put fractional ratings in no histogram bucket). Run from
+backend/ against a seeded DB with product_stats built.
+
+Usage:
+    cd backend
+    python bench_dashboard.py [runs]
+"""
+import asyncio, sys, time, statistics
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database import get_db
+from app.services.analytics_service import _dashboard_facets, _compute_dashboard_stats, get_dashboard_stats
+from app.services.pipeline_builder import scope_match
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def _sum_key(node, key):
+    """Sum every occurrence of `key` in a nested explain document."""
+    total = 0
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key and isinstance(v, (int, float)):
+                total += v
+            else:
+                total += _sum_key(v, key)
+    elif isinstance(node, list):
+        for item in node:
+            total += _sum_key(item, key)
+    return total
+
+
+def _max_key(node, key):
+    best = 0
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key and isinstance(v, (int, float)):
+                best = max(best, v)
+            else:
+                best = max(best, _max_key(v, key))
+    elif isinstance(node, list):
+        for item in node:
+            best = max(best, _max_key(item, key))
+    return best
+
+
+async def explain(db, pipeline, collection="product_stats"):
+    plan = await db.command({
+        "explain": {"aggregate": collection, "pipeline": pipeline, "cursor": {}},
+        "verbosity": "executionStats"
+    })
+    server_ms = _max_key(plan, "executionTimeMillis") or _max_key(plan, "executionTimeMillisEstimate")
+    return server_ms, _sum_key(plan, "totalDocsExamined")
+
+
+# ─── Legacy: products × reviews joins (as before the rollup) ─────────────────
+
+def legacy_pipelines() -> dict:
+    joined = [
+        {"$lookup": {"from": "reviews", "localField": "id", "foreignField": "product_id", "as": "reviews"}},
+        {"$unwind": {"path": "$reviews", "preserveNullAndEmptyArrays": False}},
+        {"$project": {
+            "id": 1, "name": 1, "category": 1,
+            "rating": "$reviews.rating",
+            "is_promoter": {"$cond": [{"$gte": ["$reviews.rating", 4]}, 1, 0]},
+            "is_detractor": {"$cond": [{"$lte": ["$reviews.rating", 2]}, 1, 0]},
+        }}
+    ]
+    return {
+        "categories": joined + [
+            {"$group": {"_id": "$category", "total_reviews": {"$sum": 1}, "avg_rating": {"$avg": "$rating"},
+                        "promoters": {"$sum": "$is_promoter"}, "detractors": {"$sum": "$is_detractor"}}},
+            {"$sort": {"total_reviews": -1}},
+            {"$limit": 5}
+        ],
+        "products": joined + [
+            {"$group": {"_id": "$id", "name": {"$first": "$name"}, "category": {"$first": "$category"},
+                        "total_reviews": {"$sum": 1}, "avg_rating": {"$avg": "$rating"},
+                        "promoters": {"$sum": "$is_promoter"}, "detractors": {"$sum": "$is_detractor"}}},
+            {"$match": {"total_reviews": {"$gte": 5}}}
+        ],
+        "kpis": joined + [
+            {"$group": {
+                "_id": None,
+                "total_reviews": {"$sum": 1},
+                "promoters": {"$sum": "$is_promoter"},
+                "detractors": {"$sum": "$is_detractor"},
+                "happy": {"$sum": {"$cond": [{"$gte": ["$rating", 4]}, 1, 0]}},
+                "unhappy": {"$sum": {"$cond": [{"$lte": ["$rating", 3]}, 1, 0]}},
+                **{f"rating_{k}": {"$sum": {"$cond": [{"$eq": ["$rating", k]}, 1, 0]}} for k in range(1, 6)}
+            }}
+        ],
+    }
+
+
+def _legacy_nps(stat) -> int:
+    total = stat["total_reviews"]
+    return round((stat["promoters"] - stat["detractors"]) / total * 100) if total > 0 else 0
+
+
+async def run_legacy(db):
+    """The admin dashboard exactly as the pre-rollup get_dashboard_stats built it."""
+    rows = {}
+    for name, pipeline in legacy_pipelines().items():
+        rows[name] = await db.products.aggregate(pipeline).to_list(length=None)
+
+    categories = [
+        {"category": c["_id"], "nps": _legacy_nps(c), "avg_rating": round(c["avg_rating"], 1) if c["avg_rating"] else 0}
+        for c in rows["categories"]
+    ]
+    products = [
+        {"name": p["name"][:30] + '...' if len(p["name"]) > 30 else p["name"], "category": p["category"],
+         "nps": _legacy_nps(p), "rating": round(p["avg_rating"], 1) if p["avg_rating"] else 0}
+        for p in rows["products"]
+    ]
+    products.sort(key=lambda x: x["nps"], reverse=True)
+    top, bad = products[:5], sorted(products[-5:], key=lambda x: x["nps"])
+
+    kpis = {"nps": 0, "total_reviews": 0, "happy_pct": 0, "worst_product": "N/A"}
+    satisfaction = {"happy": 0, "unhappy": 0}
+    distribution = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+    for stat in rows["kpis"]:
+        total = stat["total_reviews"]
+        if total > 0:
+            kpis.update(total_reviews=total, nps=_legacy_nps(stat), happy_pct=round(stat["happy"] / total * 100))
+        satisfaction = {"happy": stat["happy"], "unhappy": stat["unhappy"]}
+        distribution = {str(k): stat[f"rating_{k}"] for k in range(1, 6)}
+    if bad:
+        kpis["worst_product"] = bad[0]["name"]
+
+    return {"category_performance": categories, "top_products": top, "bad_products": bad,
+            "kpis": kpis, "satisfaction": satisfaction, "rating_distribution": distribution}
+
+
+def _response_diff(legacy: dict, current: dict) -> list:
+    """Sections that differ; product lists compare as nps sequences + sets, since ties may order differently."""
+    diff = []
+    for key in legacy:
+        a, b = legacy[key], current.get(key)
+        if key in ("top_products", "bad_products"):
+            same = [p["nps"] for p in a] == [p["nps"] for p in b] and sorted(map(repr, a)) == sorted(map(repr, b))
+        else:
+            same = a == b
+        if not same:
+            diff.append(key)
+    return diff
+
+
+# ─── Rollup variants ──────────────────────────────────────────────────────────
+
+async def run_separate(db, match, facets):
+    out = {}
+    for name, stages in facets.items():
+        cursor = db.product_stats.aggregate([{"$match": match}] + stages)
+        out[name] = await cursor.to_list(length=None)
+    return out
+
+
+async def run_facet(db, match, facets):
+    cursor = db.product_stats.aggregate([{"$match": match}, {"$facet": facets}])
+    result = await cursor.to_list(length=1)
+    return result[0]
+
+
+async def timed(fn, *args):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _canonical(sections):
+    return {k: sorted(map(repr, v)) for k, v in sections.items()}
+
+
+async def main():
+    db = await get_db()
+    match = scope_match("admin", [], extra={"review_count": {"$gt": 0}})
+    facets = _dashboard_facets()
+
+    separate = await run_separate(db, match, facets)
+    combined = await run_facet(db, match, facets)
+    same = _canonical(separate) == _canonical(combined)
+
+    sep_server, sep_docs = 0, 0
+    for stages in facets.values():
+        ms, docs = await explain(db, [{"$match": match}] + stages)
+        sep_server += ms
+        sep_docs += docs
+    facet_server, facet_docs = await explain(db, [{"$match": match}, {"$facet": facets}])
+
+    legacy_server, legacy_docs = 0, 0
+    for pipeline in legacy_pipelines().values():
+        ms, docs = await explain(db, pipeline, collection="products")
+        legacy_server += ms
+        legacy_docs += docs
+
+    legacy = await run_legacy(db)
+    current = await get_dashboard_stats(db, user_id=None, role="admin")
+    diff = _response_diff(legacy, current)
+
+    legacy_wall = await timed(run_legacy, db)
+    sep_wall = await timed(run_separate, db, match, facets)
+    facet_wall = await timed(run_facet, db, match, facets)
+    full_wall = await timed(_compute_dashboard_stats, db, "admin", [])
+
+    print(f"Runs per variant: {RUNS}")
+    print(f"{'variant':<16}{'wall ms (p50)':>16}{'server ms':>12}{'docs examined':>16}")
+    print(f"{'legacy joins':<16}{legacy_wall:>16.1f}{legacy_server:>12}{legacy_docs:>16}")
+    print(f"{'3 x aggregate':<16}{sep_wall:>16.1f}{sep_server:>12}{sep_docs:>16}")
+    print(f"{'1 x $facet':<16}{facet_wall:>16.1f}{facet_server:>12}{facet_docs:>16}")
+    print(f"\nget_dashboard_stats (uncached, incl. formatting): {full_wall:.1f} ms p50")
+    if legacy_server and legacy_docs:
+        print(f"$facet vs legacy: {facet_server / legacy_server:.1%} of server time, "
+              f"{facet_docs / legacy_docs:.1%} of documents examined")
+    print(f"\nRollup section results identical: {'yes' if same else 'NO'}")
+    print(f"Full response identical to legacy: {'yes' if not diff else 'NO — differs in ' + ', '.join(diff)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
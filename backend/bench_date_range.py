@@ -0,0 +1,153 @@
+"""
+bench_date_range.py — 30-day window vs. full history on a synthetic dataset.
+
+Seeds a separate database (default `insightlens_bench`) with synthetic
+products and reviews spread over three years, creates the production
+indexes, then times the windowed analytics functions over:
+
+    - the last 30 days
+    - the full history, through the same windowed (raw reviews) path
+    - the full history, through the product_stats rollup (no window)
+
+and reports median wall time plus documents examined from explain().
+
+Usage:
+    cd backend
+    python bench_date_range.py [reviews] [runs]     # default 200000 reviews, 10 runs
+    BENCH_DB=my_bench python bench_date_range.py --reuse
+"""
+import asyncio, os, random, sys, time, statistics
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import database
+from app.services import analytics_service as svc
+from app.services.stats_service import rebuild_product_stats, rebuild_review_buckets
+
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+N_REVIEWS = int(args[0]) if len(args) > 0 else 200_000
+RUNS = int(args[1]) if len(args) > 1 else 10
+REUSE = "--reuse" in sys.argv
+BENCH_DB = os.getenv("BENCH_DB", "insightlens_bench")
+
+N_PRODUCTS = 500
+CATEGORIES = ["Electronics", "Home & Kitchen", "Books", "Toys", "Sports", "Beauty", "Garden", "Automotive"]
+END = datetime(2026, 1, 1)
+START = END - timedelta(days=3 * 365)
+
+
+async def seed(db):
+    print(f"Seeding {N_REVIEWS} reviews across {N_PRODUCTS} products into '{BENCH_DB}'...")
+    for name in ["products", "reviews", "product_stats", "review_buckets", "category_buckets", "cache_versions"]:
+        await db[name].drop()
+
+    rng = random.Random(42)
+    products = [
+        {"id": i, "name": f"Synthetic Product {i}", "category": CATEGORIES[i % len(CATEGORIES)]}
+        for i in range(1, N_PRODUCTS + 1)
+    ]
+    await db.products.insert_many(products)
+
+    span = int((END - START).total_seconds())
+    batch = []
+    for _ in range(N_REVIEWS):
+        p = products[rng.randrange(N_PRODUCTS)]
+        rating = float(rng.choices([1, 2, 3, 4, 5], weights=[8, 6, 10, 30, 46])[0])
+        batch.append({
+            "product_id": p["id"],
+            "category": p["category"],
+            "review_text": "synthetic review",
+            "rating": rating,
+            "review_date": START + timedelta(seconds=rng.randrange(span)),
+            "sentiment": "happy" if rating >= 4 else "unhappy"
+        })
+        if len(batch) >= 10_000:
+            await db.reviews.insert_many(batch)
+            batch = []
+    if batch:
+        await db.reviews.insert_many(batch)
+
+    await db.products.create_index("id")
+    await db.products.create_index("category")
+    await db.reviews.create_index("product_id")
+    await db.reviews.create_index([("category", 1), ("product_id", 1), ("rating", 1)])
+    await db.reviews.create_index([("product_id", 1), ("review_date", 1)])
+    await db.reviews.create_index([("category", 1), ("review_date", 1)])
+    await db.product_stats.create_index("product_id", unique=True)
+    await db.product_stats.create_index("category")
+
+    await rebuild_product_stats(db)
+    await rebuild_review_buckets(db)
+
+
+def _sum_key(node, key):
+    total = 0
+    if isinstance(node, dict):
+        for k, v in node.items():
+            total += v if k == key and isinstance(v, (int, float)) else _sum_key(v, key)
+    elif isinstance(node, list):
+        for item in node:
+            total += _sum_key(item, key)
+    return total
+
+
+async def docs_examined(db, coll, pipeline):
+    plan = await db.command({
+        "explain": {"aggregate": coll.name, "pipeline": pipeline, "cursor": {}},
+        "verbosity": "executionStats"
+    })
+    return _sum_key(plan, "totalDocsExamined")
+
+
+async def timed(fn):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main():
+    await database.get_db()
+    db = database.client[BENCH_DB]
+    if not REUSE:
+        await seed(db)
+
+    category = CATEGORIES[0]
+    product_ids = [1, 2, 3, 4, 5]
+    windows = {
+        "30 days": (END - timedelta(days=30), END),
+        "full (reviews)": (START, END + timedelta(days=1)),
+        "full (rollup)": (None, None),
+    }
+
+    cases = {
+        "dashboard (admin)": (
+            lambda f, t: svc._compute_dashboard_stats(db, "admin", [], f, t),
+            lambda f, t: svc._rollup_pipeline(db, {}, f, t, rows={"review_count": {"$gt": 0}},
+                                              stages=[{"$facet": svc._dashboard_facets()}], names=True)
+        ),
+        f"category NPS ({category})": (
+            lambda f, t: svc.get_nps_for_category(db, category, "bench", "admin", f, t),
+            lambda f, t: svc._rollup_pipeline(db, {"category": category}, f, t, rows={"review_count": {"$gt": 0}})
+        ),
+        "compare 5 products": (
+            lambda f, t: svc.compare_products(db, product_ids, "bench", "admin", f, t),
+            lambda f, t: svc._rollup_pipeline(db, {"product_id": {"$in": product_ids}}, f, t, names=True)
+        ),
+    }
+
+    print(f"\nRuns per case: {RUNS}")
+    print(f"{'query':<28}{'window':<18}{'wall ms (p50)':>15}{'docs examined':>16}")
+    for label, (call, plan) in cases.items():
+        for wlabel, (f, t) in windows.items():
+            wall = await timed(lambda: call(f, t))
+            coll, pipeline = plan(f, t)
+            docs = await docs_examined(db, coll, pipeline)
+            print(f"{label:<28}{wlabel:<18}{wall:>15.1f}{docs:>16}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+check_engine_parity.py — Compare the columnar engine against the Mongo path.
+
+Loads the columnar engine from the seeded DB, then runs the dashboard,
+category NPS, product comparison and best/worst queries through both
+backends (admin and one analyst-style scope, with and without a date
+window) and reports any differences plus median wall time per backend.
+
+Usage:
+    cd backend
+    python check_engine_parity.py [runs]
+"""
+import asyncio, sys, time, statistics
+from datetime import timedelta
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database import get_db
+from app.services import analytics_service as svc
+from app.services.columnar_engine import engine
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+
+def _canonical(value):
+    """Order-insensitive form: ties in NPS / review totals may sort differently per backend."""
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return sorted((_canonical(v) for v in value), key=repr)
+    return value
+
+
+async def timed(fn):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+async def main():
+    db = await get_db()
+    categories = sorted(await db.products.distinct("category"))
+    category = categories[0] if categories else "Electronics"
+    product_ids = [p["id"] async for p in db.products.find({}, {"_id": 0, "id": 1}).limit(5)]
+
+    start = time.perf_counter()
+    await engine.load(db)
+    print(f"Engine loaded in {(time.perf_counter() - start) * 1000:.0f} ms: {engine.stats()}")
+
+    latest = await db.reviews.find_one({"review_date": {"$type": "date"}}, sort=[("review_date", -1)])
+    windows = {"all time": (None, None)}
+    if latest:
+        end = latest["review_date"].date()
+        windows["last 90 days"] = svc.parse_window((end - timedelta(days=90)).isoformat(), end.isoformat())
+
+    scopes = {"admin": ("admin", []), "analyst": ("analyst", categories[:2])}
+    cases = {
+        "dashboard": lambda r, c, f, t: svc._compute_dashboard_stats(db, r, c, f, t),
+        "category NPS": lambda r, c, f, t: svc.get_nps_for_category(db, category, "parity", r, f, t),
+        "compare": lambda r, c, f, t: svc.compare_products(db, product_ids, "parity", r, f, t),
+        "best/worst": lambda r, c, f, t: svc.get_best_worst_products(db, category, "parity", r, f, t),
+    }
+
+    # Analyst scope is injected directly so no analyst_category rows are needed
+    fixed_scope = svc.get_allowed_categories
+    mismatches = 0
+    print(f"\n{'query':<14}{'scope':<10}{'window':<14}{'mongo ms':>10}{'engine ms':>11}  match")
+    for label, call in cases.items():
+        for scope, (role, cats) in scopes.items():
+            async def _scope(db_, user_id, cats=cats):
+                return cats
+            svc.get_allowed_categories = _scope
+            for wlabel, (f, t) in windows.items():
+                engine.enabled = False
+                mongo, mongo_ms = await timed(lambda: call(role, cats, f, t))
+                engine.enabled = True
+                columnar, engine_ms = await timed(lambda: call(role, cats, f, t))
+                same = _canonical(mongo) == _canonical(columnar)
+                mismatches += not same
+                print(f"{label:<14}{scope:<10}{wlabel:<14}{mongo_ms:>10.1f}{engine_ms:>11.1f}  {'yes' if same else 'NO'}")
+                if not same:
+                    print(f"    mongo:  {mongo}\n    engine: {columnar}")
+    svc.get_allowed_categories = fixed_scope
+
+    print(f"\n{'='*50}")
+    print("Parity: OK" if mismatches == 0 else f"Parity: {mismatches} mismatch(es)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
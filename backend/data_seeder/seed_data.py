@@ -1,6 +1,7 @@
 import pandas as pd
 import asyncio
 from app import database
+from app.services.stats_service import init_product_stats, record_review, bump_data_version
 
 async def seed():
     print("Connecting to MongoDB...")
@@ -10,6 +11,9 @@ async def seed():
     print("Cleaning old data...")
     await db.products.drop()
     await db.reviews.drop()
+    await db.product_stats.drop()
+    await db.review_buckets.drop()
+    await db.category_buckets.drop()
 
     df = pd.read_csv("amazon_clean.csv")
     
@@ -23,6 +27,9 @@ async def seed():
         category = str(row["category"])
         rating = float(row["rating"])
         review_text = str(row["review_text"])
+        # Store real BSON dates so monthly trend buckets can be maintained
+        review_date = pd.to_datetime(row.get("review_date"), errors="coerce", utc=True)
+        review_date = None if pd.isna(review_date) else review_date.to_pydatetime().replace(tzinfo=None)
         
         # Create product only once
         if product_str_id not in product_map:
@@ -32,17 +39,23 @@ async def seed():
                 "category": category
             }
             await db.products.insert_one(product_doc)
-            product_map[product_str_id] = current_product_idx
+            await init_product_stats(db, product_doc)
+            product_map[product_str_id] = product_doc
             current_product_idx += 1
             
+        product_doc = product_map[product_str_id]
         review_doc = {
-            "product_id": product_map[product_str_id],
+            "product_id": product_doc["id"],
+            "category": product_doc["category"],
             "review_text": review_text,
             "rating": rating,
+            "review_date": review_date,
             "sentiment": "happy" if rating >= 4 else "unhappy"
         }
         await db.reviews.insert_one(review_doc)
+        await record_review(db, product_doc, review_doc)
 
+    await bump_data_version(db)
     print("Database seeded successfully")
 
 if __name__ == "__main__":
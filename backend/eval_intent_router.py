@@ -0,0 +1,135 @@
+"""
+eval_intent_router.py — Offline accuracy / latency of the local intent router.
+
+Reads logged chat turns whose tool was chosen by Gemini, trains the router's
+classifier on the older 80% and replays the newer 20% through it, comparing
+against Gemini's choice:
+
+    coverage     share of queries the router answered without Gemini
+    tool acc.    routed queries where the router picked Gemini's tool
+    args acc.    routed queries where the arguments matched as well
+    latency      per-query routing time (p50 / p99)
+
+Reported for rules only and for rules + classifier at several confidence
+thresholds, so ROUTER_MIN_CONFIDENCE can be chosen from data. A fixed set of
+PHRASINGS (single questions in several tools' words, compound questions the
+router must leave to Gemini) is replayed through the rules first.
+
+Usage:
+    cd backend
+    python eval_intent_router.py [max_turns]
+"""
+import asyncio, sys, time, statistics
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database import get_db
+from app.services.intent_router import IntentRouter, NaiveBayes, TOOL_NAMES
+
+MAX_TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+THRESHOLDS = [0.8, 0.9, 0.95, 0.99]
+
+# (query with {cat} for a real category, expected tool or None for "ask Gemini")
+PHRASINGS = [
+    ("NPS for {cat}", "get_nps"),
+    ("trend of {cat} nps", "get_trend"),
+    ("NPS trend for {cat}", "get_trend"),
+    ("monthly net promoter score of {cat}", "get_trend"),
+    ("which products have the best NPS in {cat}", "get_best_worst_products"),
+    ("show the NPS and the trend for {cat}", None),
+    ("NPS for {cat}; best products too", None),
+    ("{cat} sentiment vs nps", None),
+]
+
+
+def _norm_args(tool, args):
+    """Compare only the arguments the router fills in (dates are Gemini-only)."""
+    args = args or {}
+    if tool == "compare_products":
+        return sorted(int(i) for i in args.get("product_ids") or [])
+    if tool in ("get_product_sentiment", "summarize_product_reviews"):
+        return int(args["product_id"]) if args.get("product_id") is not None else None
+    return args.get("category")
+
+
+def evaluate(router, turns):
+    routed = correct_tool = correct_args = 0
+    sources = {}
+    latencies = []
+    for t in turns:
+        start = time.perf_counter()
+        r = router.classify(t["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        if r is None:
+            continue
+        routed += 1
+        sources[r.source] = sources.get(r.source, 0) + 1
+        if r.tool == t["tool_used"]:
+            correct_tool += 1
+            if _norm_args(r.tool, r.args) == _norm_args(t["tool_used"], t.get("tool_args")):
+                correct_args += 1
+    n = len(turns) or 1
+    latencies.sort()
+    return {
+        "coverage": routed / n,
+        "tool_acc": correct_tool / routed if routed else 0,
+        "args_acc": correct_args / routed if routed else 0,
+        "sources": sources,
+        "p50_ms": statistics.median(latencies) if latencies else 0,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] if latencies else 0,
+    }
+
+
+def check_phrasings(router, category):
+    misses = []
+    for template, tool in PHRASINGS:
+        query = template.format(cat=category)
+        r = router.classify(query)
+        if (r.tool if r else None) != tool or (r and r.args.get("category") != category):
+            misses.append(f"{query!r}: expected {tool}, got {r.tool if r else None}")
+    print(f"Known phrasings ({category}): {len(PHRASINGS) - len(misses)}/{len(PHRASINGS)} routed as expected")
+    for miss in misses:
+        print(f"  miss  {miss}")
+
+
+async def main():
+    db = await get_db()
+    categories = await db.products.distinct("category")
+    if categories:
+        phrasing_router = IntentRouter()
+        phrasing_router.set_vocabulary(categories, await db.products.distinct("id"))
+        check_phrasings(phrasing_router, sorted(c for c in categories if c)[0])
+
+    cursor = db.conversations.find(
+        {"tool_used": {"$in": list(TOOL_NAMES)}, "routed_by": {"$ne": "local"}},
+        {"_id": 0, "query": 1, "tool_used": 1, "tool_args": 1, "timestamp": 1}
+    ).sort("timestamp", 1).limit(MAX_TURNS)
+    turns = await cursor.to_list(length=MAX_TURNS)
+    if len(turns) < 10:
+        print(f"Only {len(turns)} Gemini-routed turns logged; need at least 10 to evaluate.")
+        return
+
+    split = int(len(turns) * 0.8)
+    train, test = turns[:split], turns[split:]
+    print(f"Turns: {len(turns)} (train {len(train)}, test {len(test)})")
+
+    router = IntentRouter()
+    router.set_vocabulary(categories, await db.products.distinct("id"))
+
+    print(f"\n{'variant':<26}{'coverage':>10}{'tool acc':>10}{'args acc':>10}{'p50 ms':>9}{'p99 ms':>9}  sources")
+
+    def show(label, m):
+        print(f"{label:<26}{m['coverage']:>10.1%}{m['tool_acc']:>10.1%}{m['args_acc']:>10.1%}"
+              f"{m['p50_ms']:>9.3f}{m['p99_ms']:>9.3f}  {m['sources']}")
+
+    router.model = NaiveBayes()   # untrained: rules only
+    show("rules only", evaluate(router, test))
+
+    router.train([t["query"] for t in train], [t["tool_used"] for t in train])
+    for threshold in THRESHOLDS:
+        router.min_confidence = threshold
+        show(f"rules + NB (p >= {threshold})", evaluate(router, test))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
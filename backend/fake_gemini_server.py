@@ -0,0 +1,172 @@
+"""
+fake_gemini_server.py — Local stand-in for the Gemini REST API.
+
+Speaks enough of the generativelanguage v1beta protocol for the google-genai
+SDK (point it here with GEMINI_BASE_URL=http://127.0.0.1:<port>):
+
+    POST /v1beta/models/<model>:generateContent
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+
+Requests that declare tools get function calls back, picked from the query
+text (one call per ";"-separated clause); other requests get a short text
+answer, streamed word by word on the SSE endpoint.
+
+Fault injection and counters, for gateway tests and benchmarks:
+
+    POST /_fake/config  {"latency_ms", "fail_next", "fail_code", "error_rate", "chunk_delay_ms",
+                         "drop_stream_after"}
+
+drop_stream_after=n cuts the next text stream off after n chunks (the
+connection closes mid-answer), then resets to 0.
+    GET  /_fake/stats   {"requests", "in_flight", "max_in_flight", "failures"}
+    POST /_fake/reset
+
+Usage:
+    cd backend
+    python fake_gemini_server.py [port]      # default 8765
+"""
+import re, sys, json, random, asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULTS = {"latency_ms": 50, "fail_next": 0, "fail_code": 429, "error_rate": 0.0, "chunk_delay_ms": 10,
+            "drop_stream_after": 0}
+
+
+def _last_user_text(body: dict) -> str:
+    for content in reversed(body.get("contents", [])):
+        for part in content.get("parts", []):
+            if part.get("text"):
+                return part["text"]
+    return ""
+
+
+def _function_responses(body: dict) -> list:
+    return [part["functionResponse"] for content in body.get("contents", [])
+            for part in content.get("parts", []) if part.get("functionResponse")]
+
+
+def _pick_call(clause: str, declared: set) -> dict:
+    """Rough keyword routing so each tool can be exercised from a query."""
+    text = clause.lower()
+    ids = [int(n) for n in re.findall(r"\d+", text)]
+    m = re.search(r"\b(?:for|in|of)\s+([a-z0-9&' ]+?)\s*(?:\(|\?|$)", text)
+    category = m.group(1).strip().title() if m else "Electronics"
+    if "compare" in text and len(ids) >= 2:
+        name, args = "compare_products", {"product_ids": ids[:5]}
+    elif ("summar" in text or "review" in text) and ids:
+        name, args = "summarize_product_reviews", {"product_id": ids[0], "question": clause.strip()}
+    elif ids:
+        name, args = "get_product_sentiment", {"product_id": ids[0]}
+    elif "trend" in text:
+        name, args = "get_trend", {"category": category}
+    elif "best" in text or "worst" in text:
+        name, args = "get_best_worst_products", {"category": category}
+    else:
+        name, args = "get_nps", {"category": category}
+    if declared and name not in declared:
+        name = sorted(declared)[0]
+    return {"functionCall": {"name": name, "args": args}}
+
+
+def _answer_text(body: dict) -> str:
+    responses = _function_responses(body)
+    if responses:
+        names = ", ".join(r.get("name", "?") for r in responses)
+        return f"Here is what the data shows from {names}: " + json.dumps(
+            [r.get("response", {}) for r in responses], default=str)[:400]
+    return f"Fake answer to: {_last_user_text(body)[:200]}"
+
+
+def _candidate(parts: list, finish: bool = True) -> dict:
+    cand = {"content": {"role": "model", "parts": parts}, "index": 0}
+    if finish:
+        cand["finishReason"] = "STOP"
+    return {"candidates": [cand], "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 10, "totalTokenCount": 20}}
+
+
+def create_app(**config) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+    app.state.config = {**DEFAULTS, **config}
+    app.state.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "failures": 0}
+
+    async def _enter():
+        cfg, stats = app.state.config, app.state.stats
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        await asyncio.sleep(cfg["latency_ms"] / 1000)
+        if cfg["fail_next"] > 0 or random.random() < cfg["error_rate"]:
+            cfg["fail_next"] = max(0, cfg["fail_next"] - 1)
+            stats["failures"] += 1
+            code = cfg["fail_code"]
+            status = {429: "RESOURCE_EXHAUSTED", 503: "UNAVAILABLE", 500: "INTERNAL"}.get(code, "UNKNOWN")
+            return JSONResponse({"error": {"code": code, "message": f"fake {status}", "status": status}}, status_code=code)
+        return None
+
+    def _leave():
+        app.state.stats["in_flight"] -= 1
+
+    def _parts(body: dict) -> list:
+        declared = {f["name"] for tool in body.get("tools", []) for f in tool.get("functionDeclarations", [])}
+        if declared and not _function_responses(body):
+            clauses = [c for c in _last_user_text(body).split(";") if c.strip()] or [""]
+            return [_pick_call(c, declared) for c in clauses]
+        return [{"text": _answer_text(body)}]
+
+    @app.post("/{version}/models/{model_action}")
+    async def models(version: str, model_action: str, request: Request):
+        body = await request.json()
+        error = await _enter()
+        if error is not None:
+            _leave()
+            return error
+
+        if model_action.endswith(":streamGenerateContent"):
+            parts = _parts(body)
+
+            async def events():
+                try:
+                    if "text" not in parts[0]:
+                        yield f"data: {json.dumps(_candidate(parts))}\r\n\r\n"
+                        return
+                    words = parts[0]["text"].split(" ")
+                    drop_after, app.state.config["drop_stream_after"] = app.state.config["drop_stream_after"], 0
+                    for i, word in enumerate(words):
+                        if drop_after and i == drop_after:
+                            raise ConnectionResetError("fake stream dropped")
+                        chunk = word if i == 0 else " " + word
+                        yield f"data: {json.dumps(_candidate([{'text': chunk}], finish=i == len(words) - 1))}\r\n\r\n"
+                        await asyncio.sleep(app.state.config["chunk_delay_ms"] / 1000)
+                finally:
+                    _leave()
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        try:
+            return _candidate(_parts(body))
+        finally:
+            _leave()
+
+    @app.post("/_fake/config")
+    async def set_config(request: Request):
+        app.state.config.update(await request.json())
+        return app.state.config
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return app.state.stats
+
+    @app.post("/_fake/reset")
+    async def reset():
+        app.state.config = {**DEFAULTS}
+        app.state.stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "failures": 0}
+        return {"ok": True}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
@@ -0,0 +1,17 @@
+import asyncio
+from app import database
+from app.services.catalog_service import backfill_review_categories
+
+async def migrate():
+    print("Connecting to MongoDB...")
+    await database.get_db()
+
+    db = database.client.insightlens
+
+    print("Backfilling category onto reviews...")
+    modified = await backfill_review_categories(db)
+
+    print(f"Updated {modified} reviews.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,124 @@
+"""
+migrate_review_dates.py — Give existing reviews BSON review dates
+
+Monthly trend buckets only count reviews with a BSON `review_date`. Two
+kinds of older data lack one:
+
+  1. string dates under `review_date` or `date`: converted in place;
+  2. no date at all: the original seed_data.py never stored one. Those are
+     backfilled from the seed CSV's review_date column. The seed numbered
+     products by first appearance in the CSV and inserted reviews in file
+     order, so each dateless review is paired with the next unused CSV row
+     with the same (product, rating, text), in _id order. Products whose
+     name no longer matches the CSV (seeded from another file) are skipped.
+
+Reviews still without a date afterwards (the CSV has none for some rows,
+uploads made after seeding) are reported; if the counts look wrong,
+re-seed with data_seeder/seed_data.py, which stores dates, instead.
+Monthly buckets are rebuilt at the end. Restart workers running
+ANALYTICS_ENGINE=columnar so the engine reloads the new dates.
+
+Usage:
+    cd backend
+    python migrate_review_dates.py [path/to/amazon_clean.csv]
+"""
+import sys
+import csv
+import asyncio
+from collections import defaultdict, deque
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app import database
+from app.services.stats_service import rebuild_review_buckets
+
+CSV_PATH = sys.argv[1] if len(sys.argv) > 1 else "amazon_clean.csv"
+MISSING_DATE = {"$or": [{"review_date": {"$exists": False}}, {"review_date": None}]}
+
+
+def _parse_date(value: str):
+    """CSV dates look like 2015-08-08T00:00:00.000Z; stored naive UTC like the seed does."""
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _review_key(product_id: int, rating, text: str):
+    # pandas read an empty review_text cell as NaN, which the seed stored as "nan"
+    return product_id, float(rating), text or "nan"
+
+
+def load_csv_dates(path: str):
+    """({product_id: name}, {(product_id, rating, text): deque of dates in file order})."""
+    names, ids = {}, {}
+    dates = defaultdict(deque)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["product_id"] not in ids:
+                ids[row["product_id"]] = len(ids) + 1
+                names[ids[row["product_id"]]] = row["product_name"]
+            key = _review_key(ids[row["product_id"]], row["rating"], row["review_text"])
+            dates[key].append(_parse_date(row.get("review_date") or ""))
+    return names, dates
+
+
+async def backfill_from_csv(db, path: str) -> int:
+    names, dates = load_csv_dates(path)
+    mismatched = set()
+    async for p in db.products.find({"id": {"$in": list(names)}}, {"_id": 0, "id": 1, "name": 1}):
+        if p.get("name") != names[p["id"]]:
+            mismatched.add(p["id"])
+    if mismatched:
+        print(f"Skipping {len(mismatched)} products whose names differ from {path}.")
+
+    updates = []
+    cursor = db.reviews.find(MISSING_DATE, {"product_id": 1, "rating": 1, "review_text": 1}).sort("_id", 1)
+    async for r in cursor:
+        if r.get("product_id") in mismatched or r.get("rating") is None:
+            continue
+        queue = dates.get(_review_key(r.get("product_id"), r["rating"], r.get("review_text") or ""))
+        if not queue:
+            continue
+        review_date = queue.popleft()
+        if review_date is not None:
+            updates.append(UpdateOne({"_id": r["_id"]}, {"$set": {"review_date": review_date}}))
+
+    if not updates:
+        return 0
+    result = await db.reviews.bulk_write(updates, ordered=False)
+    return result.modified_count
+
+
+async def migrate():
+    print("Connecting to MongoDB...")
+    await database.get_db()
+
+    db = database.client.insightlens
+
+    # Older seeds stored dates (if at all) as strings under `date` or `review_date`
+    print("Converting string review dates to BSON dates...")
+    result = await db.reviews.update_many(
+        {"$or": [
+            {"review_date": {"$type": "string"}},
+            {"review_date": {"$exists": False}, "date": {"$type": "string"}}
+        ]},
+        [{"$set": {"review_date": {"$dateFromString": {
+            "dateString": {"$ifNull": ["$review_date", "$date"]},
+            "onError": None,
+            "onNull": None
+        }}}}]
+    )
+    print(f"Converted {result.modified_count} reviews.")
+
+    print(f"Backfilling missing review dates from {CSV_PATH}...")
+    print(f"Backfilled {await backfill_from_csv(db, CSV_PATH)} reviews.")
+    print(f"{await db.reviews.count_documents(MISSING_DATE)} reviews still have no date.")
+
+    print("Rebuilding monthly review buckets...")
+    buckets = await rebuild_review_buckets(db)
+    print(f"Rebuilt {buckets} product-month buckets.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
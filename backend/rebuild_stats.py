@@ -0,0 +1,22 @@
+import asyncio
+from app import database
+from app.services.stats_service import rebuild_product_stats, rebuild_review_buckets
+
+async def rebuild():
+    print("Connecting to MongoDB...")
+    await database.get_db()
+
+    db = database.client.insightlens
+
+    print("Rebuilding product_stats from reviews...")
+    count = await rebuild_product_stats(db)
+
+    print(f"Rebuilt stats for {count} products.")
+
+    print("Rebuilding monthly review buckets...")
+    buckets = await rebuild_review_buckets(db)
+
+    print(f"Rebuilt {buckets} product-month buckets.")
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -8,14 +8,53 @@ async def setup():
     db = database.client.insightlens
     
     print("Creating indexes...")
+    await create_indexes(db)
+    
+    print("Indexes created successfully.")
+
+
+async def create_indexes(db):
     # Ensure emails are unique
     await db.users.create_index("email", unique=True)
     
     # Optional: indexes for performance on lookups
     await db.reviews.create_index("product_id")
+    # Reviews carry a denormalized category for join-free role scoping
+    await db.reviews.create_index([("category", 1), ("product_id", 1), ("rating", 1)])
+    # Time-windowed analytics read only their slice of reviews
+    await db.reviews.create_index([("product_id", 1), ("review_date", 1)])
+    await db.reviews.create_index([("category", 1), ("review_date", 1)])
+    # Keyset pagination of /analytics/reviews: filter and sort served by one index
+    await db.reviews.create_index([("category", 1), ("_id", 1)])
+    await db.reviews.create_index([("product_id", 1), ("_id", 1)])
+    # Summarization samples: most helpful first, overall or per star rating
+    await db.reviews.create_index([("product_id", 1), ("helpful_votes", -1)])
+    await db.reviews.create_index([("product_id", 1), ("rating", 1), ("helpful_votes", -1)])
+    await db.reviews.create_index([("category", 1), ("helpful_votes", -1)])
+    await db.reviews.create_index([("category", 1), ("rating", 1), ("helpful_votes", -1)])
     await db.products.create_index("category")
-    
-    print("Indexes created successfully.")
+
+    # Per-product rollups read by the dashboard / NPS queries
+    await db.product_stats.create_index("product_id", unique=True)
+    await db.product_stats.create_index("category")
+
+    # Monthly trend buckets, kept up to date at ingest
+    await db.review_buckets.create_index([("product_id", 1), ("month", 1)], unique=True)
+    await db.review_buckets.create_index([("category", 1), ("month", 1)])
+    await db.category_buckets.create_index([("category", 1), ("month", 1)], unique=True)
+
+    # Stored review summaries: content-addressed, expire 30 days after their last hit
+    # (older setups put the TTL on created_at, which expired hot summaries too)
+    if "created_at_1" in await db.review_summaries.index_information():
+        await db.review_summaries.drop_index("created_at_1")
+        await db.review_summaries.update_many(
+            {"last_used": {"$exists": False}}, [{"$set": {"last_used": "$created_at"}}]
+        )
+    await db.review_summaries.create_index("last_used", expireAfterSeconds=30 * 24 * 3600)
+    await db.summary_views.create_index([("views", -1)])
+    # Map-reduce chunk / merge notes (map_reduce_summary), keyed by content hash
+    await db.summary_chunks.create_index("created_at", expireAfterSeconds=30 * 24 * 3600)
+
 
 if __name__ == "__main__":
     asyncio.run(setup())
\ No newline at end of file
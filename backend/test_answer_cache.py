@@ -0,0 +1,118 @@
+"""
+test_answer_cache.py — Checks app/services/answer_cache.py (no DB needed)
+
+  - answer_key normalizes Gemini's args (3.0 == 3, key order, padding,
+    None values) and the question (case, spacing, trailing "?") but changes
+    with the question, tool, result or prompt version,
+  - two different questions answered from the same tool result miss each
+    other's entry through the chat pipeline's key,
+  - entries expire after their TTL, in memory and on disk,
+  - answers round-trip through the SQLite file: a fresh cache (a restart,
+    another worker) reads them back, and no connection is left open.
+
+Usage:
+    cd backend
+    python test_answer_cache.py
+"""
+import os
+import gc
+import time
+import asyncio
+import sqlite3
+import tempfile
+import warnings
+from contextlib import closing
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from app.services.answer_cache import AnswerCache, answer_key
+from app.services.llm_service import _answer_cache_key
+
+RESULT = {"category": "Books", "nps": 42.0, "total": 120}
+QUESTION = "What is the NPS for Books?"
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    key = answer_key(QUESTION, "get_nps", {"category": "Books", "product_id": 3}, RESULT, "v1")
+
+    print("\n=== Key normalization ===")
+    ok &= check("float ints, key order, padding and None args ignored",
+                answer_key(QUESTION, "get_nps", {"product_id": 3.0, "category": " Books ", "date_from": None}, RESULT, "v1") == key)
+    ok &= check("lists normalized element-wise",
+                answer_key(QUESTION, "compare_products", {"product_ids": [3.0, 12.0]}, RESULT, "v1")
+                == answer_key(QUESTION, "compare_products", {"product_ids": [3, 12]}, RESULT, "v1"))
+    ok &= check("list order still matters",
+                answer_key(QUESTION, "compare_products", {"product_ids": [12, 3]}, RESULT, "v1")
+                != answer_key(QUESTION, "compare_products", {"product_ids": [3, 12]}, RESULT, "v1"))
+    ok &= check("different tool", answer_key(QUESTION, "get_trend", {"category": "Books", "product_id": 3}, RESULT, "v1") != key)
+    ok &= check("different result", answer_key(QUESTION, "get_nps", {"category": "Books", "product_id": 3},
+                                               {**RESULT, "nps": 41.0}, "v1") != key)
+    ok &= check("different prompt version", answer_key(QUESTION, "get_nps", {"category": "Books", "product_id": 3}, RESULT, "v2") != key)
+    ok &= check("question case, spacing and trailing \"?\" ignored",
+                answer_key("  what is the  NPS for books ", "get_nps", {"category": "Books", "product_id": 3}, RESULT, "v1") == key)
+    ok &= check("different question", answer_key("How many detractors does Books have?", "get_nps",
+                                                 {"category": "Books", "product_id": 3}, RESULT, "v1") != key)
+
+    print("\n=== Questions sharing a tool result ===")
+    shared = AnswerCache()
+    nps_key = _answer_cache_key(QUESTION, "get_nps", {"category": "Books"}, [RESULT])
+    detractors_key = _answer_cache_key("How many detractors does Books have?", "get_nps", {"category": "Books"}, [RESULT])
+    await shared.set(nps_key, "Books has an NPS of 42.")
+    ok &= check("same question hits", await shared.get(_answer_cache_key("what is the nps for books", "get_nps",
+                                                                         {"category": "Books"}, [RESULT])) is not None)
+    ok &= check("another question over the same result misses", await shared.get(detractors_key) is None)
+    await shared.set(detractors_key, "Books has 18 detractors.")
+    ok &= check("each question keeps its own answer",
+                await shared.get(nps_key) == "Books has an NPS of 42." and await shared.get(detractors_key) == "Books has 18 detractors.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "answers.sqlite")
+
+        print("\n=== TTL expiry ===")
+        memory_only = AnswerCache(ttl=0.05)
+        await memory_only.set(key, "cached answer")
+        ok &= check("fresh entry served", await memory_only.get(key) == "cached answer")
+        await asyncio.sleep(0.1)
+        ok &= check("expired entry dropped from memory", await memory_only.get(key) is None)
+
+        short = AnswerCache(ttl=0.05, path=path)
+        await short.set(key, "cached answer")
+        await asyncio.sleep(0.1)
+        ok &= check("expired row not served from disk", await AnswerCache(path=path).get(key) is None)
+        with closing(sqlite3.connect(path)) as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        ok &= check("expired row deleted on read", rows == 0)
+
+        print("\n=== SQLite round trip ===")
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ResourceWarning)
+            writer = AnswerCache(path=path)
+            await writer.set(key, "### Summary\nNPS of 42 is good.")
+            reader = AnswerCache(path=path)
+            answer = await reader.get(key)
+            ok &= check("a fresh cache reads the stored answer", answer == "### Summary\nNPS of 42 is good.")
+            ok &= check("disk hit counted and promoted to memory",
+                        reader.disk_hits == 1 and await reader.get(key) == answer and reader.disk_hits == 1)
+            ok &= check("unknown key misses", await reader.get("missing") is None)
+            del writer, reader
+            gc.collect()
+        ok &= check("no connection left unclosed",
+                    not [w for w in caught if issubclass(w.category, ResourceWarning)])
+
+        started = time.time()
+        with closing(sqlite3.connect(path)) as conn:
+            used_at = conn.execute("SELECT used_at FROM answers WHERE key = ?", (key,)).fetchone()[0]
+        ok &= check("read stamps used_at", used_at <= started and started - used_at < 5)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,136 @@
+"""
+test_audit_sink.py — Checks app/services/audit_sink.py (fake collections, no DB needed)
+
+  - without a running sink write() inserts directly,
+  - queued documents go out with insert_many in batch_size batches, or
+    after flush_interval when fewer are waiting, grouped by collection,
+  - a full queue counts overflow (dropped without a spill file),
+  - overflow and failed inserts are spilled and replayed on the next start,
+  - stop() flushes everything still queued.
+
+Usage:
+    cd backend
+    python test_audit_sink.py
+"""
+import os
+import asyncio
+import tempfile
+
+from app.services.audit_sink import WriteBehindSink
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    async def insert_one(self, doc):
+        self.db.docs.setdefault(self.name, []).append(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0.005)
+        if self.db.fail:
+            raise ConnectionError("mongod unreachable")
+        self.db.batches.append((self.name, len(docs)))
+        self.db.docs.setdefault(self.name, []).extend(docs)
+
+
+class FakeDB:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.docs = {}
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+
+    print("\n=== Direct writes ===")
+    db = FakeDB()
+    sink = WriteBehindSink(maxsize=100, batch_size=20, flush_interval=0.2)
+    await sink.write(db, "conversations", {"q": "direct"})
+    ok &= check("not started: inserted at once", db.docs == {"conversations": [{"q": "direct"}]} and sink.counts["direct"] == 1)
+
+    print("\n=== Batch flush ===")
+    db = FakeDB()
+    await sink.start(db)
+    for i in range(45):
+        await sink.write(db, "conversations", {"i": i})
+    ok &= check("write() only queues", db.batches == [] and sink.stats()["queue_depth"] == 45)
+    await asyncio.sleep(0.05)
+    ok &= check("full batches flushed at batch_size", db.batches == [("conversations", 20), ("conversations", 20)])
+    await asyncio.sleep(0.3)
+    ok &= check("remainder flushed after flush_interval", db.batches[2:] == [("conversations", 5)])
+    ok &= check("order kept", [d["i"] for d in db.docs["conversations"]] == list(range(45)))
+
+    await sink.write(db, "conversations", {"i": 45})
+    await sink.write(db, "reports", {"r": 1})
+    await asyncio.sleep(0.3)
+    ok &= check("one insert_many per collection", sorted(db.batches[3:]) == [("conversations", 1), ("reports", 1)])
+
+    print("\n=== Shutdown ===")
+    for i in range(7):
+        await sink.write(db, "conversations", {"late": i})
+    await sink.stop()
+    ok &= check("stop() flushes what is still queued",
+                [d["late"] for d in db.docs["conversations"] if "late" in d] == list(range(7)) and not sink.running)
+    ok &= check("every queued document written", sink.counts["written"] == sink.counts["queued"] == 54)
+
+    print("\n=== Overflow ===")
+    db = FakeDB()
+    small = WriteBehindSink(maxsize=5, batch_size=5, flush_interval=0.2)
+    await small.start(db)
+    for i in range(12):
+        await small.write(db, "conversations", {"i": i})
+    await small.stop()
+    ok &= check("overflow counted and dropped without a spill file",
+                small.counts["overflow"] == small.counts["dropped"] == 7 and len(db.docs["conversations"]) == 5)
+
+    print("\n=== Spill / replay ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        spill = os.path.join(tmp, "audit.jsonl")
+
+        db = FakeDB()
+        spilling = WriteBehindSink(maxsize=5, batch_size=5, flush_interval=0.2, spill_path=spill)
+        await spilling.start(db)
+        for i in range(12):
+            await spilling.write(db, "conversations", {"i": i})
+        await spilling.stop()
+        with open(spill) as f:
+            lines = sum(1 for _ in f)
+        ok &= check("overflow spilled to the file", spilling.counts["spilled"] == 7 and lines == 7)
+
+        down = FakeDB(fail=True)
+        failing = WriteBehindSink(batch_size=5, flush_interval=0.05, spill_path=spill)
+        await failing.start(down)
+        await failing.write(down, "reports", {"r": "kept"})
+        await failing.stop()
+        with open(spill) as f:
+            lines = sum(1 for _ in f)
+        ok &= check("failed inserts, replay while down included, go back to the spill",
+                    failing.counts["failed"] == failing.counts["spilled"] == 8 and lines == 8)
+
+        db = FakeDB()
+        replay = WriteBehindSink(batch_size=5, spill_path=spill)
+        await replay.start(db)
+        await replay.stop()
+        ok &= check("spill replayed on start", replay.counts["replayed"] == 8
+                    and sorted(d["i"] for d in db.docs["conversations"]) == list(range(5, 12))
+                    and db.docs["reports"] == [{"r": "kept"}])
+        ok &= check("spill file removed after replay",
+                    not os.path.exists(spill) and not os.path.exists(spill + ".replay"))
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,172 @@
+"""
+test_chat_stream.py — Checks the /chat/stream SSE endpoint against fake_gemini_server.py
+
+Starts the fake Gemini server in a background thread, points the gateway at
+it (GEMINI_BASE_URL) and calls the chat router in-process with a fake user
+and an empty in-memory DB (no API key, network or MongoDB needed):
+
+  - events arrive in order: tool, result, token chunk by chunk, done,
+  - the tokens add up to the done answer, and the turn is logged once,
+  - a Gemini error before anything was streamed ends the stream with a
+    single `error` event and nothing is logged,
+  - a Gemini stream cut off mid-answer sends an `error` event after the
+    tokens it got, then `done` with the partial answer.
+
+Usage:
+    cd backend
+    python test_chat_stream.py
+"""
+import os, json, time, socket, asyncio, threading
+import httpx
+import uvicorn
+
+from fake_gemini_server import create_app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# The gateway reads these at import time: Gemini is the fake, every question goes
+# to it (no local router), and answers are not cached between runs
+PORT = _free_port()
+os.environ.update(
+    GEMINI_API_KEY="fake",
+    GEMINI_BASE_URL=f"http://127.0.0.1:{PORT}",
+    INTENT_ROUTER="0",
+    ANSWER_CACHE_TTL="0",
+    ANSWER_CACHE_DB="",
+)
+
+from fastapi import FastAPI
+
+from app.database import get_db
+from app.routes import chat
+from app.utils.dependencies import get_current_user
+
+USER = {"user_id": "admin-1", "role": "admin"}
+
+
+class _Cursor:
+    async def to_list(self, length=None):
+        return []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class _Collection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def aggregate(self, pipeline):
+        return _Cursor()
+
+    def find(self, query=None, projection=None):
+        return _Cursor()
+
+    async def find_one(self, query=None, projection=None):
+        return None
+
+    async def insert_one(self, doc):
+        self.db.inserted.append((self.name, doc))
+
+
+class EmptyDB:
+    def __init__(self):
+        self.inserted = []
+
+    def __getitem__(self, name):
+        return _Collection(self, name)
+
+    __getattr__ = __getitem__
+
+
+def _start_server(port):
+    server = uvicorn.Server(uvicorn.Config(create_app(chunk_delay_ms=0), host="127.0.0.1", port=port,
+                                           log_level="critical"))   # a dropped stream logs a traceback
+    threading.Thread(target=server.run, daemon=True).start()
+    for _ in range(100):
+        if server.started:
+            break
+        time.sleep(0.05)
+    return server
+
+
+async def stream(client, query) -> list:
+    """[(event, data)] in the order the endpoint sent them."""
+    events, event = [], None
+    async with client.stream("POST", "/chat/stream", json={"query": query}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    db = EmptyDB()
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_db] = lambda: db
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client, \
+            httpx.AsyncClient(base_url=os.environ["GEMINI_BASE_URL"]) as fake:
+
+        print("\n=== Event order ===")
+        events = await stream(client, "What is the NPS for Electronics?")
+        names = [e for e, _ in events]
+        tokens = [d["text"] for e, d in events if e == "token"]
+        done = events[-1][1] if events else {}
+        ok &= check(f"tool, result, token x{len(tokens)}, done",
+                    names[:2] == ["tool", "result"] and names[-1] == "done"
+                    and set(names[2:-1]) == {"token"} and len(tokens) > 1)
+        ok &= check("tool event names the tool Gemini picked",
+                    events[0][1]["tool_used"] == "get_nps" and events[0][1]["tool_args"] == {"category": "Electronics"})
+        ok &= check("result event carries the tool result before any token",
+                    events[1][1]["tool_result"]["category"] == "Electronics")
+        ok &= check("tokens add up to the done answer",
+                    "".join(tokens) == done.get("answer") and "get_nps" in done.get("answer", ""))
+        ok &= check("turn logged once when done", [n for n, _ in db.inserted] == ["conversations"])
+
+        print("\n=== Error event ===")
+        db.inserted.clear()
+        await fake.post("/_fake/config", json={"fail_next": 1, "fail_code": 400})
+        events = await stream(client, "What is the NPS for Books?")
+        ok &= check("a failed Gemini call ends the stream with one error event",
+                    [e for e, _ in events] == ["error"] and events[0][1]["message"])
+        ok &= check("failed turn not logged", db.inserted == [])
+
+        await fake.post("/_fake/config", json={"drop_stream_after": 3})
+        events = await stream(client, "What is the NPS for Toys?")
+        names = [e for e, _ in events]
+        tokens = [d["text"] for e, d in events if e == "token"]
+        ok &= check("stream cut off mid-answer: tool, result, 3 tokens, error, done",
+                    names == ["tool", "result", "token", "token", "token", "error", "done"])
+        ok &= check("done carries the partial answer", events[-1][1]["answer"] == "".join(tokens))
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    server = _start_server(PORT)
+    ok = asyncio.run(main())
+    server.should_exit = True
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,305 @@
+"""
+test_engine_parity.py — Columnar engine vs. the Mongo pipelines, offline
+
+Builds a small in-memory dataset (four categories, a product without
+reviews, fractional ratings, undated reviews), folds it into product_stats
+through the real ingest path (init_product_stats / record_review), loads the
+columnar engine from it, and runs the dashboard, category NPS, compare and
+best/worst queries through both backends for the admin and an analyst scope,
+with and without a date window. The Mongo side executes the exact pipelines
+analytics_service builds on a tiny interpreter of the stages and operators
+they use; check_engine_parity.py does the same against a live DB.
+
+Usage:
+    cd backend
+    python test_engine_parity.py
+"""
+import copy
+import random
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.services import analytics_service as svc
+from app.services.columnar_engine import engine
+from app.services.stats_service import init_product_stats, record_review
+
+CATEGORIES = ["Electronics", "Books", "Toys", "Home & Kitchen"]
+ANALYST_CATS = ["Books", "Toys"]
+RATINGS = [1, 1.5, 2, 2.5, 3, 3.4, 3.5, 4, 4.5, 5]
+START = datetime(2024, 1, 1)
+
+
+# ─── Aggregation interpreter ──────────────────────────────────────────────────
+
+def get_path(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, list):   # "$joined.field" over an array: the array of field values
+            doc = [d[part] for d in doc if isinstance(d, dict) and part in d]
+        elif isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return None
+    return doc
+
+
+def evaluate(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return get_path(doc, expr[1:])
+    if isinstance(expr, list):
+        return [evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        return {k: evaluate(v, doc) for k, v in expr.items()}
+    (op, args), = expr.items()
+    values = evaluate(args, doc)
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    if op == "$gt":   # BSON order: any number > null
+        a, b = values
+        return a is not None and (b is None or a > b)
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$in":
+        return values[0] in values[1]
+    if op in ("$min", "$max"):
+        present = [v for v in values if v is not None]
+        return (min if op == "$min" else max)(present) if present else None
+    if op == "$floor":
+        return None if values is None else float(int(values // 1))
+    if op == "$add":
+        return None if None in values else sum(values)
+    if op == "$ifNull":
+        return values[0] if values[0] is not None else values[1]
+    if op == "$first":
+        return values[0] if values else None
+    raise NotImplementedError(op)
+
+
+def matches(doc, query) -> bool:
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(matches(doc, q) for q in cond):
+                return False
+            continue
+        value = get_path(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                ok = {
+                    "$in": lambda: value in arg,
+                    "$gt": lambda: value is not None and value > arg,
+                    "$gte": lambda: value is not None and value >= arg,
+                    "$lt": lambda: value is not None and value < arg,
+                    "$type": lambda: arg == "date" and isinstance(value, datetime),
+                }[op]()
+                if not ok:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        groups.setdefault(repr(key), (key, []))[1].append(doc)
+    out = []
+    for key, members in groups.values():
+        row = {"_id": key}
+        for field, acc in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = acc.items()
+            values = [evaluate(expr, d) for d in members]
+            if op == "$sum":
+                row[field] = sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+            elif op == "$first":
+                row[field] = values[0]
+            else:
+                raise NotImplementedError(op)
+        out.append(row)
+    return out
+
+
+def _project(doc, spec):
+    out = {} if spec.get("_id", 1) == 0 or "_id" not in doc else {"_id": doc["_id"]}
+    for field, value in spec.items():
+        if field == "_id":
+            continue
+        if value == 1:
+            if field in doc:
+                out[field] = doc[field]
+        else:
+            out[field] = evaluate(value, doc)
+    return out
+
+
+def run_pipeline(db, docs, pipeline):
+    docs = [copy.deepcopy(d) for d in docs]
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [d for d in docs if matches(d, spec)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$project":
+            docs = [_project(d, spec) for d in docs]
+        elif name == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda d: get_path(d, field), reverse=direction < 0)
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$facet":
+            docs = [{k: run_pipeline(db, docs, sub) for k, sub in spec.items()}]
+        elif name == "$lookup":
+            foreign = db[spec["from"]].docs
+            for d in docs:
+                joined = [f for f in foreign if f.get(spec["foreignField"]) == get_path(d, spec["localField"])]
+                d[spec["as"]] = run_pipeline(db, joined, spec["pipeline"])
+        else:
+            raise NotImplementedError(name)
+    return docs
+
+
+# ─── In-memory DB ─────────────────────────────────────────────────────────────
+
+class Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self, length=None):
+        return self.rows if length is None else self.rows[:length]
+
+    def __aiter__(self):
+        self._it = iter(self.rows)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class Collection:
+    def __init__(self, db):
+        self.db = db
+        self.docs = []
+
+    def aggregate(self, pipeline):
+        return Cursor(run_pipeline(self.db, self.docs, pipeline))
+
+    def find(self, query=None, projection=None):
+        return Cursor([copy.deepcopy(d) for d in self.docs if matches(d, query or {})])
+
+    async def find_one(self, query=None, projection=None):
+        found = [d for d in self.docs if matches(d, query or {})]
+        return copy.deepcopy(found[0]) if found else None
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = copy.deepcopy(query)
+            self.docs.append(doc)
+            for field, value in update.get("$setOnInsert", {}).items():
+                doc[field] = copy.deepcopy(value)
+        for field, value in update.get("$set", {}).items():
+            doc[field] = value
+        for path, n in update.get("$inc", {}).items():
+            *parents, last = path.split(".")
+            target = doc
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[last] = target.get(last, 0) + n
+
+
+class FakeDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, Collection(self))
+
+    __getattr__ = __getitem__
+
+
+async def seed(db) -> list:
+    """Ingest the dataset through the same calls as the upload path; returns product ids."""
+    rng = random.Random(9)
+    ids = []
+    for i in range(24):
+        product = {"id": 100 + i, "name": f"Product {i} " + "x" * (i % 4 * 10), "category": CATEGORIES[i % 4]}
+        await db.products.insert_one(dict(product))
+        await init_product_stats(db, product)
+        ids.append(product["id"])
+        count = 0 if i == 5 else 2 if i == 6 else rng.randint(3, 30)
+        for _ in range(count):
+            review = {
+                "_id": ObjectId(),
+                "product_id": product["id"],
+                "category": product["category"],
+                "rating": rng.choice(RATINGS),
+                "review_date": None if rng.random() < 0.1 else START + timedelta(days=rng.randint(0, 360)),
+            }
+            await db.reviews.insert_one(review)
+            await record_review(db, product, review)
+    return ids
+
+
+# ─── Parity ───────────────────────────────────────────────────────────────────
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    db = FakeDB()
+    ids = await seed(db)
+    await engine.load(db)
+    print(f"\nEngine: {engine.stats()}")
+
+    scopes = {"admin": ("admin", []), "analyst": ("analyst", ANALYST_CATS)}
+    windows = {
+        "all time": (None, None),
+        "Q2": svc.parse_window("2024-04-01", "2024-06-30"),
+        "from Nov": svc.parse_window("2024-11-01", None),
+    }
+    cases = {
+        "dashboard": lambda r, c, f, t: svc._compute_dashboard_stats(db, r, c, f, t),
+        "category NPS": lambda r, c, f, t: svc._category_nps(db, r, c, "Books", f, t),
+        "compare": lambda r, c, f, t: svc._compare_products(db, r, c, [ids[0], ids[1], ids[5], ids[6], 999], f, t),
+        "best/worst": lambda r, c, f, t: svc._best_worst_products(db, r, c, "Toys", f, t),
+    }
+
+    enabled = engine.enabled
+    try:
+        for label, call in cases.items():
+            print(f"\n=== {label} ===")
+            for scope, (role, cats) in scopes.items():
+                for wlabel, (f, t) in windows.items():
+                    engine.enabled = False
+                    mongo = await call(role, cats, f, t)
+                    engine.enabled = True
+                    columnar = await call(role, cats, f, t)
+                    ok &= check(f"{scope:<8} {wlabel}", mongo == columnar)
+                    if mongo != columnar:
+                        print(f"        mongo:  {mongo}\n        engine: {columnar}")
+    finally:
+        engine.enabled = enabled
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
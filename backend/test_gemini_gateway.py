@@ -0,0 +1,157 @@
+"""
+test_gemini_gateway.py — Checks GeminiGateway against fake_gemini_server.py
+
+Starts the fake Gemini server in a background thread (no API key or network
+needed) and asserts that the gateway:
+
+  - returns text and function-call responses through the async client,
+  - streams text chunk by chunk,
+  - retries 429s with backoff and succeeds once the fault clears,
+  - never has more than max_concurrency calls in flight,
+  - spaces calls according to the token bucket, but under the default
+    config (60 rpm, burst = rpm) lets a burst of calls start together,
+  - gives up with TimeoutError when the deadline cannot be met.
+
+Usage:
+    cd backend
+    python test_gemini_gateway.py
+"""
+import os, time, socket, asyncio, threading
+import httpx
+import uvicorn
+from google import genai
+from google.genai import types
+
+from fake_gemini_server import create_app
+
+os.environ.setdefault("GEMINI_API_KEY", "fake")   # the module-level gateway needs one; unused here
+from app.services.gemini_gateway import GeminiGateway
+
+MODEL = "gemini-2.5-flash"
+
+
+def _start_server():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    for _ in range(100):
+        if server.started:
+            break
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _gateway(base_url, **kwargs):
+    client = genai.Client(api_key="x", http_options=types.HttpOptions(base_url=base_url))
+    return GeminiGateway(client, **kwargs)
+
+
+async def _fake(base_url, path, body=None):
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        if body is None and path.endswith("stats"):
+            return (await http.get(path)).json()
+        return (await http.post(path, json=body or {})).json()
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main(base_url):
+    ok = True
+
+    print("\n=== Responses ===")
+    gw = _gateway(base_url, rpm=6000)
+    r = await gw.generate_content(model=MODEL, contents="hello there")
+    ok &= check("text response", r.text and "hello there" in r.text)
+
+    tool = types.Tool(function_declarations=[types.FunctionDeclaration(
+        name="get_nps", description="NPS",
+        parameters=types.Schema(type="OBJECT", properties={"category": types.Schema(type="STRING")})
+    )])
+    r = await gw.generate_content(model=MODEL, contents="NPS for Books",
+                                  config=types.GenerateContentConfig(tools=[tool]))
+    call = r.candidates[0].content.parts[0].function_call
+    ok &= check("function call when tools are declared", call and call.name == "get_nps")
+
+    chunks = [c.text async for c in gw.generate_content_stream(model=MODEL, contents="stream these words please")]
+    ok &= check(f"stream yields {len(chunks)} chunks", len(chunks) > 1 and "stream these words" in "".join(chunks))
+
+    print("\n=== Retries ===")
+    await _fake(base_url, "/_fake/reset")
+    await _fake(base_url, "/_fake/config", {"fail_next": 2, "fail_code": 429})
+    gw = _gateway(base_url, rpm=6000, base_delay=0.05)
+    r = await gw.generate_content(model=MODEL, contents="retry me")
+    ok &= check("succeeds after two 429s", "retry me" in r.text)
+    ok &= check("two retries counted", gw.stats()["retries"] == 2)
+
+    await _fake(base_url, "/_fake/config", {"fail_next": 10, "fail_code": 503})
+    gw = _gateway(base_url, rpm=6000, base_delay=0.05, max_retries=1)
+    try:
+        await gw.generate_content(model=MODEL, contents="x")
+        ok &= check("persistent 503 is raised", False)
+    except genai.errors.APIError as e:
+        ok &= check("persistent 503 is raised", e.code == 503 and gw.stats()["failures"] == 1)
+
+    await _fake(base_url, "/_fake/config", {"fail_next": 1, "fail_code": 429})
+    gw = _gateway(base_url, rpm=6000, base_delay=0.05)
+    chunks = [c.text async for c in gw.generate_content_stream(model=MODEL, contents="retry stream")]
+    ok &= check("stream retried before first chunk", "retry stream" in "".join(chunks) and gw.stats()["retries"] == 1)
+
+    print("\n=== Concurrency cap ===")
+    await _fake(base_url, "/_fake/reset")
+    await _fake(base_url, "/_fake/config", {"latency_ms": 100})
+    gw = _gateway(base_url, rpm=60_000, burst=100, max_concurrency=3)
+    await asyncio.gather(*(gw.generate_content(model=MODEL, contents=f"q{i}") for i in range(12)))
+    stats = await _fake(base_url, "/_fake/stats")
+    ok &= check(f"max in flight {stats['max_in_flight']} <= 3", 1 <= stats["max_in_flight"] <= 3)
+    ok &= check("all requests served", stats["requests"] == 12)
+
+    print("\n=== Token bucket ===")
+    await _fake(base_url, "/_fake/reset")
+    await _fake(base_url, "/_fake/config", {"latency_ms": 0})
+    gw = _gateway(base_url, rpm=600, burst=1)     # 10 / s
+    start = time.monotonic()
+    await asyncio.gather(*(gw.generate_content(model=MODEL, contents=f"q{i}") for i in range(6)))
+    elapsed = time.monotonic() - start
+    ok &= check(f"6 calls at 10/s took {elapsed:.2f}s (>= 0.45s)", elapsed >= 0.45)
+
+    await _fake(base_url, "/_fake/reset")
+    gw = _gateway(base_url)                       # defaults: 60 rpm, burst = rpm
+    start = time.monotonic()
+    await asyncio.gather(*(gw.generate_content(model=MODEL, contents=f"q{i}") for i in range(8)))
+    elapsed = time.monotonic() - start
+    ok &= check(f"8 concurrent calls at the default 60 rpm took {elapsed:.2f}s (< 1s, not one per second)",
+                elapsed < 1.0 and gw.stats()["wait_ms_p95"] < 500)
+
+    print("\n=== Deadline ===")
+    await _fake(base_url, "/_fake/config", {"latency_ms": 1000})
+    gw = _gateway(base_url, rpm=6000)
+    start = time.monotonic()
+    try:
+        await gw.generate_content(model=MODEL, contents="slow", timeout=0.3)
+        ok &= check("slow call times out", False)
+    except (TimeoutError, asyncio.TimeoutError):
+        ok &= check("slow call times out", time.monotonic() - start < 0.8)
+
+    gw = _gateway(base_url, rpm=6, burst=1)       # one token per 10 s
+    await _fake(base_url, "/_fake/config", {"latency_ms": 0})
+    await gw.generate_content(model=MODEL, contents="first")
+    try:
+        await gw.generate_content(model=MODEL, contents="second", timeout=1.0)
+        ok &= check("no rate slot before deadline", False)
+    except (TimeoutError, asyncio.TimeoutError):
+        ok &= check("no rate slot before deadline", gw.stats()["timeouts"] == 1)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    server, base_url = _start_server()
+    ok = asyncio.run(main(base_url))
+    server.should_exit = True
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,135 @@
+"""
+test_intent_router.py — Checks app/services/intent_router.py (no DB needed)
+
+  - rules route plainly worded queries with their arguments,
+  - extraction finds categories (longest alias, no overlaps) and product ids,
+  - one question worded with several tools' keywords routes to the first
+    tool in RULES order,
+  - the router abstains on time periods, missing arguments, compound
+    questions and low classifier confidence,
+  - the naive Bayes classifier learns phrasing from labelled queries,
+  - route() serves the current model while a background refresh runs.
+
+Usage:
+    cd backend
+    python test_intent_router.py
+"""
+import asyncio
+
+from app.services.intent_router import IntentRouter, NaiveBayes, PERIOD
+
+CATEGORIES = ["Electronics", "Home & Kitchen", "Kitchen", "Books", "Toys", "Amazon Devices,mazon.co.uk"]
+PRODUCTS = [3, 7, 12, 40, 50, 60]
+
+
+def make_router(**kwargs) -> IntentRouter:
+    router = IntentRouter(**kwargs)
+    router.set_vocabulary(CATEGORIES, PRODUCTS)
+    return router
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+def routes_to(router, query, tool, args, context_product_id=None) -> bool:
+    r = router.classify(query, context_product_id)
+    return r is not None and r.tool == tool and r.args == args and r.source == "rules"
+
+
+async def main():
+    ok = True
+    router = make_router()
+
+    print("\n=== Rules ===")
+    ok &= check("NPS for a category", routes_to(router, "What is the NPS for Books?", "get_nps", {"category": "Books"}))
+    ok &= check("best / worst", routes_to(router, "best products in Toys", "get_best_worst_products", {"category": "Toys"}))
+    ok &= check("trend", routes_to(router, "show the trend for Electronics", "get_trend", {"category": "Electronics"}))
+    ok &= check("sentiment from context product",
+                routes_to(router, "are customers happy?", "get_product_sentiment", {"product_id": 7}, context_product_id=7))
+    ok &= check("compare two products",
+                routes_to(router, "compare products 3 and 12", "compare_products", {"product_ids": [3, 12]}))
+    ok &= check("summary keeps the query as the question",
+                routes_to(router, "summarize reviews of product #40", "summarize_product_reviews",
+                          {"product_id": 40, "question": "summarize reviews of product #40"}))
+
+    print("\n=== Several tools' keywords, one question ===")
+    for query in ("trend of electronics nps", "NPS trend for Electronics", "show the NPS trend for Electronics",
+                  "monthly net promoter score of electronics"):
+        ok &= check(f"{query!r} -> get_trend",
+                    routes_to(router, query, "get_trend", {"category": "Electronics"}))
+    ok &= check("best NPS in Toys -> get_best_worst_products",
+                routes_to(router, "which products have the best NPS in Toys", "get_best_worst_products",
+                          {"category": "Toys"}))
+    ok &= check("compare sentiment of two products -> compare_products",
+                routes_to(router, "compare sentiment of products 3 and 7", "compare_products", {"product_ids": [3, 7]}))
+    ok &= check("\"&\" inside a category name is not a clause break",
+                routes_to(router, "NPS trend for Home & Kitchen", "get_trend", {"category": "Home & Kitchen"}))
+
+    print("\n=== Extraction ===")
+    found = router.extract("nps for home & kitchen")
+    ok &= check("longest alias wins, no overlapping match", found["categories"] == ["Home & Kitchen"])
+    ok &= check("scraped name matched by its leading part",
+                router.extract("nps for amazon devices")["category"] == "Amazon Devices,mazon.co.uk")
+    ok &= check("product lists, unknown ids dropped",
+                router.extract("compare items 3, 7 & 99")["products"] == [3, 7])
+    ok &= check("explicit products override context", router.extract("product 12", context_product_id=3)["products"] == [12])
+
+    print("\n=== Abstention ===")
+    ok &= check("time period", router.classify("NPS for Books in the last 30 days") is None)
+    ok &= check("month name \"May\"", router.classify("NPS for Electronics this May") is None)
+    ok &= check("verb \"may\" is not a period", not PERIOD.search("this may be off, nps for books"))
+    ok &= check("keyword without its argument", router.classify("what is the NPS?") is None)
+    ok &= check("two categories", router.classify("Is the NPS for Books higher than Toys?") is None)
+    ok &= check("two tools joined by \"and\"", router.classify("show the NPS and the trend for Electronics") is None)
+    ok &= check("two tools joined by \";\"", router.classify("NPS for Books; best products too") is None)
+    ok &= check("two tools joined by \"vs\"", router.classify("Electronics sentiment vs nps") is None)
+    ok &= check("\"and\" after a product list still joins clauses",
+                router.classify("compare products 3 and 7 and summarize them") is None)
+    ok &= check("more products than a comparison allows",
+                router.classify("compare products 3, 7, 12, 40, 50 and 60") is None)
+    ok &= check("several products outside a comparison", router.classify("sentiment of product 3 and 7") is None)
+    ok &= check("no rule, no model", router.classify("tell me something interesting about Books") is None)
+
+    print("\n=== Classifier ===")
+    model = NaiveBayes().fit(["how loyal are buyers", "are buyers loyal", "what is going on lately"],
+                             ["get_nps", "get_nps", "get_trend"])
+    probs = model.predict_proba("loyal buyers")
+    ok &= check("posterior favours the matching class", max(probs, key=probs.get) == "get_nps")
+    ok &= check("posteriors sum to 1", abs(sum(probs.values()) - 1) < 1e-9)
+
+    queries = [f"how loyal are the buyers of {c}" for c in ("books", "toys", "electronics")] * 10
+    queries += [f"what happened to {c} lately" for c in ("books", "toys", "electronics")] * 10
+    router.train(queries, ["get_nps"] * 30 + ["get_trend"] * 30)
+    r = router.classify("how loyal are the buyers of Home & Kitchen")
+    ok &= check("category masked: phrasing generalizes to an unseen category",
+                r is not None and r.tool == "get_nps" and r.args == {"category": "Home & Kitchen"}
+                and r.source == "classifier")
+    strict = make_router(min_confidence=1.01)
+    strict.train(queries, ["get_nps"] * 30 + ["get_trend"] * 30)
+    ok &= check("below min_confidence abstains", strict.classify("how loyal are the buyers of Books") is None)
+
+    print("\n=== Background refresh ===")
+    release = asyncio.Event()
+
+    class Products:
+        async def distinct(self, field):
+            await release.wait()
+            return CATEGORIES if field == "category" else PRODUCTS
+
+    class DB:
+        products = Products()
+
+    live = make_router()
+    route = await asyncio.wait_for(live.route(DB(), "NPS for Books"), 1)
+    ok &= check("route() answers while the refresh is still loading",
+                route is not None and route.tool == "get_nps" and live.stats()["refreshing"])
+    live._refreshing.cancel()
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,148 @@
+"""
+test_map_reduce_summary.py — Checks app/services/map_reduce_summary.py (stubbed Gemini, no DB needed)
+
+  - chunk_reviews keeps review order, skips empty texts, stays within the
+    token budget, and new reviews only change the last chunk,
+  - every map, merge and final call goes through the gateway, with at most
+    `concurrency` map calls in flight,
+  - the reduce step merges REDUCE_FAN_IN notes at a time, level by level,
+    until the final prompt holds every chunk's notes and the question,
+  - a re-run is served from summary_chunks, and after one new review only
+    the last chunk, the merges above it and the final answer are regenerated.
+
+Usage:
+    cd backend
+    python test_map_reduce_summary.py
+"""
+import os
+import re
+import asyncio
+from types import SimpleNamespace
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+os.environ["SUMMARY_CHUNK_TOKENS"] = "200"   # small chunks: a dozen from 120 reviews
+
+from app.services import map_reduce_summary as mrs
+from app.services.map_reduce_summary import chunk_reviews, summarize_all, REDUCE_FAN_IN
+from app.utils.prompt_packing import estimate_tokens
+
+QUESTION = "What do customers complain about?"
+
+
+def review(i, text=None):
+    return {"rating": i % 5 + 1, "review_text": text if text is not None else
+            f"Review {i}: the battery lasts about {i} hours and the case feels cheap but sturdy."}
+
+
+class FakeGateway:
+    """Answers like Gemini would, traceably: map notes name their reviews, merges keep every note."""
+
+    def __init__(self):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_content(self, *, model, contents, config=None, timeout=15.0):
+        self.prompts.append(contents)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if contents.startswith("You are condensing"):
+            ids = re.findall(r"Review (\d+):", contents)
+            return SimpleNamespace(text=f"notes from reviews {ids[0]}-{ids[-1]}")
+        if contents.startswith("Merge these notes"):
+            return SimpleNamespace(text="\n".join(re.findall(r"notes from reviews \d+-\d+", contents)))
+        return SimpleNamespace(text="### Summary\n" + contents)
+
+    def kinds(self, start=0) -> dict:
+        counts = {"map": 0, "merge": 0, "final": 0}
+        for prompt in self.prompts[start:]:
+            kind = "map" if prompt.startswith("You are condensing") else \
+                   "merge" if prompt.startswith("Merge these notes") else "final"
+            counts[kind] += 1
+        return counts
+
+
+class FakeChunks:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = dict(update["$set"])
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    reviews = [review(i) for i in range(120)] + [review(999, "   ")]
+
+    print("\n=== Chunking ===")
+    chunks = chunk_reviews(reviews)
+    lines = [line for chunk in chunks for line in chunk]
+    ok &= check(f"{len(chunks)} chunks, order kept, empty text skipped",
+                len(chunks) > REDUCE_FAN_IN and lines == [mrs._review_line(r) for r in reviews[:120]])
+    ok &= check("each chunk within the token budget",
+                all(sum(estimate_tokens(line) for line in chunk) <= mrs.CHUNK_TOKENS for chunk in chunks))
+    grown = chunk_reviews(reviews + [review(120)])
+    ok &= check("a new review only changes the last chunk", grown[:-1] == chunks[:-1] and grown[-1] != chunks[-1])
+
+    print("\n=== Map / reduce ===")
+    stored = []
+
+    async def fake_iter_reviews(db, user_id, role, category=None, product_id=None, **kwargs):
+        for r in stored:
+            yield r
+
+    gw = FakeGateway()
+    original = mrs.gateway, mrs.iter_reviews
+    mrs.gateway, mrs.iter_reviews = gw, fake_iter_reviews
+    try:
+        db = SimpleNamespace(summary_chunks=FakeChunks())
+        stored[:] = reviews
+        out = await summarize_all(db, QUESTION, "admin-1", "admin", product_id=3, concurrency=3)
+        kinds = gw.kinds()
+        merges = -(-len(chunks) // REDUCE_FAN_IN) + 1   # first level, then one merge of those
+        ok &= check("one map call per chunk through the gateway", kinds["map"] == len(chunks) == out["chunks"])
+        ok &= check(f"map concurrency capped ({gw.max_in_flight} <= 3)", gw.max_in_flight <= 3)
+        ok &= check(f"notes merged {REDUCE_FAN_IN} at a time, level by level",
+                    kinds["merge"] == merges
+                    and all(len(re.findall(r"--- Batch \d+ ---", p)) <= REDUCE_FAN_IN
+                            for p in gw.prompts if p.startswith("Merge these notes")))
+        final = gw.prompts[-1]
+        notes = [f"notes from reviews {chunk[0].split()[2][:-1]}-{chunk[-1].split()[2][:-1]}" for chunk in chunks]
+        ok &= check("final prompt combines every chunk's notes and asks the question",
+                    kinds["final"] == 1 and "\n".join(notes) in final
+                    and QUESTION in final and out["summary"].startswith("### Summary"))
+        ok &= check("result counts", out["reviews"] == 121 and out["calls"] == len(gw.prompts) and out["cache_hits"] == 0)
+
+        print("\n=== Stored calls ===")
+        before = len(gw.prompts)
+        again = await summarize_all(db, QUESTION, "admin-1", "admin", product_id=3, concurrency=3)
+        ok &= check("re-run served from summary_chunks",
+                    len(gw.prompts) == before and again["calls"] == 0 and again["summary"] == out["summary"])
+
+        stored.append(review(120))
+        before = len(gw.prompts)
+        grown_out = await summarize_all(db, QUESTION, "admin-1", "admin", product_id=3, concurrency=3)
+        ok &= check("one new review: last chunk, the merges above it and the final call",
+                    gw.kinds(before) == {"map": 1, "merge": 2, "final": 1}
+                    and grown_out["cache_hits"] == len(chunks) - 1 + merges - 2)
+    finally:
+        mrs.gateway, mrs.iter_reviews = original
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
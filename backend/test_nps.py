@@ -0,0 +1,114 @@
+"""
+test_nps.py — Checks app/services/nps_service.py (no DB needed)
+
+  - fractional ratings land in the same star bucket everywhere: star_bucket,
+    the vectorized star_buckets, star_bucket_bounds (sample ranges), the
+    review_increments written on ingest and the Mongo star_bucket_expr
+    (evaluated here by a tiny interpreter of the operators it uses),
+  - NPS / promoters / detractors of fractional ratings,
+  - merge, unmerge and combine of accumulators.
+
+Usage:
+    cd backend
+    python test_nps.py
+"""
+import numpy as np
+
+from app.services.nps_service import (
+    NPSAccumulator, star_bucket, star_buckets, star_bucket_bounds, calculate_nps
+)
+from app.services.stats_service import review_increments, star_bucket_expr
+
+GRID = [round(x, 2) for x in np.arange(0.0, 6.01, 0.05)]
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+def evaluate(expr, doc):
+    """Just enough of the aggregation language for star_bucket_expr()."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    values = [evaluate(a, doc) for a in args] if isinstance(args, list) else evaluate(args, doc)
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    if op == "$gt":   # BSON order: any number > null
+        a, b = values
+        return a is not None and (b is None or a > b)
+    if op in ("$min", "$max"):
+        present = [v for v in values if v is not None]
+        return (min if op == "$min" else max)(present) if present else None
+    if op == "$floor":
+        return None if values is None else float(np.floor(values))
+    if op == "$add":
+        return None if None in values else sum(values)
+    raise NotImplementedError(op)
+
+
+def in_bounds(rating, bucket) -> bool:
+    low, high = star_bucket_bounds(bucket)
+    return (low is None or rating >= low) and (high is None or rating < high)
+
+
+def main():
+    ok = True
+
+    print("\n=== Star buckets ===")
+    ok &= check("half ratings round up (1.5 -> 2, 2.5 -> 3, 3.5 -> 4, 4.5 -> 5)",
+                [star_bucket(r) for r in (1.5, 2.5, 3.5, 4.5)] == [2, 3, 4, 5])
+    ok &= check("just below half rounds down (3.49 -> 3)", star_bucket(3.49) == 3)
+    ok &= check("clamped to 1..5", star_bucket(0) == 1 and star_bucket(7) == 5)
+    ok &= check("vectorized buckets match", list(star_buckets(GRID)) == [star_bucket(r) for r in GRID])
+    ok &= check("each rating is inside exactly its bucket's bounds",
+                all(in_bounds(r, star_bucket(r)) and sum(in_bounds(r, b) for b in range(1, 6)) == 1 for r in GRID))
+    expr = star_bucket_expr()
+    ok &= check("Mongo bucket expression matches", all(evaluate(expr, {"rating": r}) == star_bucket(r) for r in GRID))
+    ok &= check("Mongo bucket of a missing rating is null", evaluate(expr, {}) is None)
+    ok &= check("ingest increments agree with the accumulator",
+                all(
+                    inc[f"histogram.{star_bucket(r)}"] == 1
+                    and inc["promoters"] == NPSAccumulator().add(r).promoters
+                    and inc["detractors"] == NPSAccumulator().add(r).detractors
+                    and inc["happy"] + inc["unhappy"] == 1
+                    for r in GRID for inc in [review_increments(r)]
+                ))
+
+    print("\n=== Fractional ratings ===")
+    acc = NPSAccumulator.from_ratings([4.5, 3.5, 3.4, 2.5, 2.4, 1.0])
+    ok &= check("histogram", acc.histogram() == {"1": 1, "2": 1, "3": 2, "4": 1, "5": 1})
+    ok &= check("promoters / detractors", acc.promoters == 2 and acc.detractors == 2 and acc.score == 0)
+    ok &= check("add() and add_many() agree",
+                NPSAccumulator().add_many([4.5, 3.5, 2.5]) == NPSAccumulator().add(4.5).add(3.5).add(2.5))
+    ok &= check("calculate_nps on review dicts",
+                calculate_nps([{"rating": 4.6}, {"rating": 3.5}, {"rating": 1.2}, {"rating": 3.0}]) == 25)
+    ok &= check("empty accumulator scores 0", NPSAccumulator().score == 0)
+
+    print("\n=== Merge / unmerge ===")
+    jan = NPSAccumulator.from_ratings([5, 5, 4.5, 1])
+    feb = NPSAccumulator.from_ratings([2, 2.4, 3, 4])
+    mar = NPSAccumulator.from_ratings([5, 3.5])
+    window = NPSAccumulator.combine([jan, feb, mar])
+    ok &= check("merge equals accumulating every rating",
+                window == NPSAccumulator.from_ratings([5, 5, 4.5, 1, 2, 2.4, 3, 4, 5, 3.5]))
+    ok &= check("+ leaves operands unchanged", jan + feb == NPSAccumulator.combine([jan, feb]) and jan.total == 4)
+    ok &= check("unmerge slides the window", window.unmerge(jan) == feb + mar)
+    ok &= check("- is unmerge on a copy", (feb + mar) - mar == feb and mar.total == 2)
+    try:
+        NPSAccumulator.from_ratings([5]).unmerge(NPSAccumulator.from_ratings([1]))
+        refused = False
+    except ValueError:
+        refused = True
+    ok &= check("unmerging counts that were never merged is refused", refused)
+    ok &= check("from_histogram round trip", NPSAccumulator.from_histogram(window.histogram()) == window)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,267 @@
+"""
+test_pipelines.py — Checks that analytics pipelines are built scope-first.
+
+Part 1 (no DB needed): runs every analytics function against a recording
+stand-in for the database and asserts that the generated pipelines start
+with the role-scope / filter $match, and that any $lookup comes after it
+and projects only the fields it needs.
+
+Part 2 (live DB): runs explain() on the scoped pipelines and asserts the
+leading $match is answered by an index scan (IXSCAN), not a COLLSCAN.
+
+Usage:
+    cd backend
+    python test_pipelines.py            # both parts
+    python test_pipelines.py --offline  # part 1 only
+"""
+import asyncio, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.services import analytics_service as svc
+from app.services.pipeline_builder import scope_match, build_pipeline, lookup
+
+ANALYST_ID = "analyst-1"
+ANALYST_CATS = ["Electronics", "Home & Kitchen"]
+WINDOW = svc.parse_window("2017-01-01", "2017-01-31")
+
+
+# ─── Recording DB stand-in ────────────────────────────────────────────────────
+
+class _Cursor:
+    def __init__(self, rows):
+        self._rows = list(rows)
+
+    async def to_list(self, length=None):
+        return self._rows
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def __aiter__(self):
+        self._it = iter(self._rows)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Collection:
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def aggregate(self, pipeline):
+        self.log.append((self.name, pipeline))
+        return _Cursor([])
+
+    async def find_one(self, query=None, projection=None):
+        return None
+
+    def find(self, query=None, projection=None):
+        if self.name == "analyst_category":
+            return _Cursor([{"user_id": ANALYST_ID, "category": c} for c in ANALYST_CATS])
+        # Logged as its equivalent $match so the same stage checks apply
+        self.log.append((self.name, [{"$match": query or {}}]))
+        return _Cursor([])
+
+
+class RecordingDB:
+    def __init__(self):
+        self.log = []
+
+    def __getattr__(self, name):
+        return _Collection(name, self.log)
+
+
+# ─── Part 1: stage order ──────────────────────────────────────────────────────
+
+def check_order(coll, pipeline, expect_scope):
+    assert pipeline, f"{coll}: empty pipeline"
+    first = pipeline[0]
+    assert "$match" in first, f"{coll}: first stage is {list(first)[0]}, expected $match"
+    if expect_scope:
+        assert "category" in repr(first["$match"]), f"{coll}: scope filter missing from leading $match"
+
+    seen_match = False
+    for stage in pipeline:
+        if "$match" in stage:
+            seen_match = True
+        if "$lookup" in stage:
+            assert seen_match, f"{coll}: $lookup before $match"
+            sub = stage["$lookup"].get("pipeline")
+            assert sub is not None, f"{coll}: $lookup without sub-pipeline"
+
+
+CASES = [
+    ("get_product_reviews", lambda db, role: svc.get_product_reviews(db, 1, ANALYST_ID, role)),
+    ("get_product_nps", lambda db, role: svc.get_product_nps(db, 1, ANALYST_ID, role)),
+    ("sentiment_counts", lambda db, role: svc.sentiment_counts(db, 1, ANALYST_ID, role)),
+    ("get_dashboard_stats", lambda db, role: svc.get_dashboard_stats(db, ANALYST_ID, role)),
+    ("get_filtered_reviews", lambda db, role: svc.get_filtered_reviews(db, ANALYST_ID, role, "Electronics")),
+    ("get_analytics_data", lambda db, role: svc.get_analytics_data(db, ANALYST_ID, role, "Electronics")),
+    ("get_nps_for_category", lambda db, role: svc.get_nps_for_category(db, "Electronics", ANALYST_ID, role)),
+    ("get_trend_over_time", lambda db, role: svc.get_trend_over_time(db, "Electronics", ANALYST_ID, role)),
+    ("compare_products", lambda db, role: svc.compare_products(db, [1, 2], ANALYST_ID, role)),
+    ("get_best_worst_products", lambda db, role: svc.get_best_worst_products(db, "Electronics", ANALYST_ID, role)),
+    ("get_dashboard_stats [window]", lambda db, role: svc.get_dashboard_stats(db, ANALYST_ID, role, *WINDOW)),
+    ("compare_products [window]", lambda db, role: svc.compare_products(db, [1, 2], ANALYST_ID, role, *WINDOW)),
+    ("get_review_sample [stratified]", lambda db, role: svc.get_review_sample(
+        db, ANALYST_ID, role, product_id=1, stratified=True)),
+    ("get_reviews_page [cursor]", lambda db, role: svc.get_reviews_page(
+        db, ANALYST_ID, role, "Electronics", after=svc.parse_review_cursor("0" * 24))),
+    ("get_trend_over_time [window]", lambda db, role: svc.get_trend_over_time(db, "Electronics", ANALYST_ID, role, *WINDOW)),
+]
+
+
+async def run_offline():
+    results = []
+    for name, call in CASES:
+        db = RecordingDB()
+        try:
+            await call(db, "analyst")
+            assert db.log, "no aggregation issued"
+            for coll, pipeline in db.log:
+                check_order(coll, pipeline, expect_scope=True)
+            print(f"  ✅ {name}: {len(db.log)} pipeline(s), scope-first")
+            results.append(True)
+        except Exception as e:
+            print(f"  ❌ {name}: {e}")
+            results.append(False)
+
+    # Builder contract: joins after $match, sub-pipeline projection of requested fields only
+    try:
+        p = build_pipeline(
+            match=scope_match("analyst", ANALYST_CATS, category="Electronics"),
+            joins=[lookup("products", "product_id", "id", "product", fields=["name"])],
+            stages=[{"$limit": 1}]
+        )
+        assert [list(s)[0] for s in p] == ["$match", "$lookup", "$limit"], p
+        assert p[1]["$lookup"]["pipeline"][-1] == {"$project": {"_id": 0, "name": 1}}, p[1]
+        assert p[0]["$match"] == {"$and": [{"category": {"$in": ANALYST_CATS}}, {"category": "Electronics"}]}, p[0]
+        assert scope_match("admin", [], extra={"review_count": {"$gt": 0}}) == {"review_count": {"$gt": 0}}
+        print("  ✅ pipeline_builder: $match → $lookup(projected) → stages")
+        results.append(True)
+    except AssertionError as e:
+        print(f"  ❌ pipeline_builder: {e}")
+        results.append(False)
+
+    # Batch "compare" enforces the same product limit, with the same error, as /compare
+    try:
+        db = RecordingDB()
+        ids = list(range(1, svc.MAX_COMPARE_PRODUCTS + 2))
+        out = await svc.run_analytics_batch(db, ANALYST_ID, "analyst", [{"metric": "compare", "product_ids": ids}])
+        assert out == {"compare": {"error": svc.COMPARE_LIMIT_ERROR}}, out
+        assert not db.log, "over-limit compare still queried the DB"
+        print(f"  ✅ batch compare: more than {svc.MAX_COMPARE_PRODUCTS} products rejected like /compare")
+        results.append(True)
+    except AssertionError as e:
+        print(f"  ❌ batch compare: {e}")
+        results.append(False)
+
+    # One batch, one scope: resolved once and used by every item, even if the
+    # analyst's categories change while the batch runs
+    lookups = []
+
+    async def reassigned_mid_batch(db, user_id):
+        lookups.append(user_id)
+        return list(ANALYST_CATS) if len(lookups) == 1 else ["Toys"]
+
+    original = svc.get_allowed_categories
+    svc.get_allowed_categories = reassigned_mid_batch
+    try:
+        db = RecordingDB()
+        out = await svc.run_analytics_batch(db, ANALYST_ID, "analyst", [
+            {"metric": "compare", "product_ids": [1, 99]},     # 99 sits outside the analyst's categories
+            {"metric": "sentiment", "product_id": 99},
+            {"metric": "category_nps", "category": "Toys"},
+            {"metric": "trend", "category": "Electronics"},
+        ])
+        scope = repr({"category": {"$in": ANALYST_CATS}})[1:-1]
+        assert lookups == [ANALYST_ID], f"scope looked up {len(lookups)} times"
+        assert db.log and all(scope in repr(p[0]["$match"]) for _, p in db.log), db.log
+        assert out["category_nps"].get("error", "").startswith("Access denied"), out["category_nps"]
+        assert out["compare"]["products"] == [] and out["sentiment"] == {"happy": 0, "unhappy": 0}, out
+        print("  ✅ batch scope: resolved once, out-of-scope product filtered by every item")
+        results.append(True)
+    except AssertionError as e:
+        print(f"  ❌ batch scope: {e}")
+        results.append(False)
+    finally:
+        svc.get_allowed_categories = original
+    return results
+
+
+# ─── Part 2: explain() index usage ────────────────────────────────────────────
+
+def _stages(node, out):
+    if isinstance(node, dict):
+        if "stage" in node:
+            out.append(node)
+        for v in node.values():
+            _stages(v, out)
+    elif isinstance(node, list):
+        for v in node:
+            _stages(v, out)
+    return out
+
+
+async def explain_uses_index(db, coll, pipeline):
+    plan = await db.command({
+        "explain": {"aggregate": coll, "pipeline": pipeline, "cursor": {}},
+        "verbosity": "queryPlanner"
+    })
+    stages = _stages(plan, [])
+    kinds = {s["stage"] for s in stages}
+    indexes = {s.get("indexName") for s in stages if s["stage"] == "IXSCAN"}
+    return "COLLSCAN" not in kinds and "IXSCAN" in kinds, indexes
+
+
+async def run_live():
+    from app.database import get_db
+    db = await get_db()
+    category = (await db.products.distinct("category") or ["Electronics"])[0]
+
+    results = []
+    checks = [
+        ("reviews", scope_match("analyst", [category], product_id=1)),
+        ("reviews", scope_match("analyst", [category], category)),
+        ("product_stats", scope_match("analyst", [category], category, extra={"review_count": {"$gt": 0}})),
+        ("product_stats", scope_match("analyst", [category], product_ids=[1, 2])),
+    ]
+    for coll, match in checks:
+        try:
+            ok, indexes = await explain_uses_index(db, coll, build_pipeline(match=match, stages=[{"$limit": 1}]))
+            assert ok, f"leading $match not index-backed (indexes: {indexes or 'none'})"
+            print(f"  ✅ {coll} {match} → IXSCAN {sorted(i for i in indexes if i)}")
+            results.append(True)
+        except Exception as e:
+            print(f"  ❌ {coll} {match}: {e}")
+            results.append(False)
+    return results
+
+
+async def main():
+    print("[1/2] Stage order (offline)")
+    results = await run_offline()
+
+    if "--offline" not in sys.argv:
+        print("\n[2/2] explain() index usage (live DB)")
+        results += await run_live()
+
+    passed = sum(1 for r in results if r)
+    print(f"\n{'='*50}")
+    print(f"Results: {passed}/{len(results)} passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
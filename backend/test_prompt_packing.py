@@ -0,0 +1,118 @@
+"""
+test_prompt_packing.py — Checks app/utils/prompt_packing.py (no DB needed)
+
+  - MinHash groups near-identical reviews and keeps distinct ones apart;
+    pack_reviews keeps the most helpful copy with a ×n count,
+  - packing stops at the token budget, keeps every star rating represented
+    and truncates long texts at a word boundary,
+  - compact_result fits a tool result into its budget without touching the
+    original and reports the tokens it saved, which step 4 of the chat
+    pipeline adds up into timings["tokens_saved"].
+
+Usage:
+    cd backend
+    python test_prompt_packing.py
+"""
+import os
+import copy
+import json
+import random
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from app.utils.prompt_packing import (
+    duplicate_groups, pack_reviews, compact_result, estimate_tokens, review_line, truncate
+)
+from app.services.llm_service import _step2_contents
+
+BATTERY = "The battery died after two weeks and the charger stopped working, very disappointed with this purchase."
+DISTINCT = [
+    "Arrived quickly, works exactly as described and the setup took five minutes.",
+    "Sound quality is muddy at high volume but fine for podcasts.",
+    "Great gift for my nephew, he plays with it every single day.",
+]
+WORDS = "battery screen price sturdy cheap broke love return fast slow gift loud quiet size color box".split()
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+def review(rating, text, helpful=0):
+    return {"rating": rating, "review_text": text, "helpful_votes": helpful}
+
+
+def main():
+    ok = True
+
+    print("\n=== MinHash dedup ===")
+    near = [BATTERY, BATTERY.upper(), BATTERY.replace("very", "really"), BATTERY + "!!"]
+    groups = duplicate_groups(near + DISTINCT)
+    ok &= check("near-identical texts share one group", [0, 1, 2, 3] in groups)
+    ok &= check("distinct texts stay apart", len(groups) == 1 + len(DISTINCT))
+
+    reviews = [review(1, t, helpful=h) for t, h in zip(near, (0, 7, 2, 1))] + [review(5, t) for t in DISTINCT]
+    packed = pack_reviews(reviews, budget=10_000)
+    battery = [r for r in packed.reviews if r["rating"] == 1]
+    ok &= check("duplicates counted", packed.duplicates == 3 and len(packed.reviews) == 1 + len(DISTINCT))
+    ok &= check("most helpful copy kept with its count",
+                len(battery) == 1 and battery[0]["text"] == BATTERY.upper() and battery[0]["count"] == 4)
+    ok &= check("count shown in the prompt line", review_line(battery[0]).startswith("[1★ ×4] "))
+    ok &= check("tokens_saved reported per call", packed.tokens_saved == packed.tokens_in - packed.tokens_out > 0)
+
+    print("\n=== Budget cut-off ===")
+    rng = random.Random(5)
+    many = [review(i % 5 + 1, f"Review {i}: " + " ".join(rng.choice(WORDS) for _ in range(12)), helpful=i)
+            for i in range(60)]
+    budget = 400
+    packed = pack_reviews(many, budget=budget)
+    used = sum(estimate_tokens(review_line(r)) for r in packed.reviews)
+    ok &= check("packed lines fit the budget", used == packed.tokens_out <= budget)
+    ok &= check("budget actually cut reviews", 0 < len(packed.reviews) < len(many))
+    ok &= check("every rating represented", {r["rating"] for r in packed.reviews} == {1, 2, 3, 4, 5})
+    ok &= check("most helpful first within a rating",
+                [r["text"].split(":")[0] for r in packed.reviews if r["rating"] == 5][:2] == ["Review 59", "Review 54"])
+    long_text = "lorem ipsum " * 200
+    cut = truncate(long_text.strip(), 100)
+    ok &= check("long text truncated at a word boundary",
+                len(cut) <= 102 and cut.endswith(" …") and cut[:-2].split()[-1] in ("lorem", "ipsum"))
+    ok &= check("truncations counted", pack_reviews([review(3, long_text)], max_chars=100).truncated == 1)
+    ok &= check("nothing fits a zero budget", pack_reviews(many, budget=0).reviews == [])
+
+    print("\n=== compact_result ===")
+    result = {
+        "category": "Electronics",
+        "nps": 42.123456,
+        "monthly": [{"month": f"2024-{m:02d}", "nps": m * 1.23456, "total": m * 10} for m in range(1, 13)] * 20,
+        "top_reviews": reviews,
+    }
+    original = copy.deepcopy(result)
+    packed = compact_result(result, budget=600)
+    value = packed.value
+    ok &= check("fits the budget", estimate_tokens(json.dumps(value)) <= 600)
+    ok &= check("original untouched", result == original)
+    ok &= check("floats rounded", value["nps"] == 42.12)
+    ok &= check("longest list trimmed with a marker",
+                len(value["monthly"]) < 240 and value["monthly"][-1].endswith("more omitted"))
+    ok &= check("review lists packed", len(value["top_reviews"]) == 1 + len(DISTINCT))
+    ok &= check("tokens_saved = tokens_in - tokens_out",
+                packed.tokens_saved == packed.tokens_in - packed.tokens_out > 0)
+    small = compact_result({"category": "Books", "nps": 50})
+    ok &= check("small result passes through, nothing saved",
+                small.value == {"category": "Books", "nps": 50} and small.tokens_saved == 0)
+
+    calls = [("get_trend", {"category": "Electronics"}), ("get_nps", {"category": "Books"})]
+    contents, saved = _step2_contents("trend and nps", calls, [result, {"category": "Books", "nps": 50}])
+    responses = [p.function_response.response["result"] for p in contents[2].parts]
+    ok &= check("step-4 contents carry the compacted results",
+                responses[1] == {"category": "Books", "nps": 50} and responses[0]["nps"] == 42.12)
+    ok &= check("step-4 savings are the sum over its results",
+                saved == compact_result(result, 2000).tokens_saved > 0)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,68 @@
+"""
+test_sampling.py — Checks the stratified sample split (no DB needed)
+
+_stratified_quotas(histogram, k) must
+  - hand out exactly min(k, total) slots, however skewed the histogram,
+  - never give a bucket more slots than it has reviews,
+  - give every non-empty bucket a slot when k allows.
+
+Usage:
+    cd backend
+    python test_sampling.py
+"""
+import random
+
+from app.services.analytics_service import _stratified_quotas
+
+CASES = [
+    ({"1": 1, "2": 100, "3": 1, "4": 0, "5": 1}, 40),
+    ({"1": 0, "2": 0, "3": 0, "4": 0, "5": 500}, 25),
+    ({"1": 3, "2": 2, "3": 1, "4": 1, "5": 1000}, 25),
+    ({"1": 30, "2": 1, "3": 1, "4": 1, "5": 1}, 25),
+    ({"1": 2, "2": 2, "3": 2, "4": 2, "5": 2}, 25),
+    ({"1": 1, "2": 1, "3": 1, "4": 1, "5": 1}, 3),
+    ({"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}, 25),
+]
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+def valid(histogram: dict, k: int) -> bool:
+    quotas = _stratified_quotas(histogram, k)
+    total = sum(histogram.values())
+    present = [b for b, n in histogram.items() if n > 0]
+    return (
+        sum(quotas.values()) == min(k, total)
+        and all(0 <= quotas[b] <= histogram[b] for b in histogram)
+        and (k < len(present) or all(quotas[b] >= 1 for b in present))
+    )
+
+
+def main():
+    ok = True
+
+    print("\n=== Skewed histograms ===")
+    for histogram, k in CASES:
+        ok &= check(f"k={k} {histogram}", valid(histogram, k))
+
+    print("\n=== Random histograms ===")
+    rng = random.Random(11)
+    failures = []
+    for _ in range(2000):
+        histogram = {b: rng.choice([0, 1, 2, 5, rng.randint(0, 5000)]) for b in "12345"}
+        k = rng.randint(1, 60)
+        if not valid(histogram, k):
+            failures.append((histogram, k))
+    ok &= check("2000 random histograms fill min(k, total) within bucket sizes", not failures)
+    for histogram, k in failures[:3]:
+        print(f"        k={k} {histogram} -> {_stratified_quotas(histogram, k)}")
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,129 @@
+"""
+test_singleflight.py — Checks app/utils/singleflight.py (no DB needed)
+
+  - concurrent identical calls run once; different arguments run separately,
+  - every waiter gets its own copy of the result,
+  - an error reaches every waiter,
+  - cancelling one waiter leaves the shared work running for the others,
+  - cancelling every waiter cancels the shared work, and a caller arriving
+    while it unwinds starts fresh work instead of joining it,
+  - analytics keys are per category scope, not per user,
+  - dashboard fills are shared per scope and data version only.
+
+Usage:
+    cd backend
+    python test_singleflight.py
+"""
+import asyncio
+
+from app.utils.singleflight import single_flight
+from app.services import analytics_service as svc
+from app.services.analytics_service import _scoped_single_flight
+
+runs = {"started": 0, "finished": 0}
+
+
+@single_flight()
+async def work(db, x, delay=0.1, fail=False):
+    runs["started"] += 1
+    await asyncio.sleep(delay)
+    if fail:
+        raise ValueError("boom")
+    runs["finished"] += 1
+    return {"x": x}
+
+
+@_scoped_single_flight
+async def scoped(db, role, allowed_cats, category, date_from=None):
+    await asyncio.sleep(0.1)
+    return {"category": category}
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+
+    print("\n=== Coalescing ===")
+    results = await asyncio.gather(*(work(object(), 1) for _ in range(20)), work(None, 2))
+    ok &= check("20 identical calls + 1 different ran twice", runs["started"] == 2)
+    ok &= check("db argument is not part of the key", work.flight.stats()["shared"] == 19)
+    ok &= check("waiters get equal but separate results", results[0] == results[1] and results[0] is not results[1])
+
+    print("\n=== Errors ===")
+    runs["started"] = 0
+    results = await asyncio.gather(*(work(None, 3, fail=True) for _ in range(5)), return_exceptions=True)
+    ok &= check("one run, error raised to all 5 waiters",
+                runs["started"] == 1 and all(isinstance(r, ValueError) for r in results))
+
+    print("\n=== Cancellation ===")
+    t1 = asyncio.create_task(work(None, 4, delay=0.3))
+    t2 = asyncio.create_task(work(None, 4, delay=0.3))
+    await asyncio.sleep(0.05)
+    t1.cancel()
+    ok &= check("other waiter still gets the result", await t2 == {"x": 4})
+
+    finished = runs["finished"]
+    t1 = asyncio.create_task(work(None, 5, delay=0.3))
+    t2 = asyncio.create_task(work(None, 5, delay=0.3))
+    await asyncio.sleep(0.05)
+    t1.cancel()
+    t2.cancel()
+    await asyncio.sleep(0.4)
+    ok &= check("work cancelled when every waiter left",
+                runs["finished"] == finished and work.flight.stats()["cancelled"] == 1)
+    ok &= check("key released afterwards", await work(None, 5, delay=0.01) == {"x": 5})
+
+    # The only waiter leaves and a new caller arrives before the task has unwound
+    t1 = asyncio.create_task(work(None, 6, delay=0.3))
+    await asyncio.sleep(0.05)
+    t1.cancel()
+    t2 = asyncio.create_task(work(None, 6, delay=0.3))
+    try:
+        late = await t2
+    except asyncio.CancelledError:
+        late = "cancelled"
+    ok &= check("caller arriving during cancellation starts fresh work", late == {"x": 6})
+
+    print("\n=== Scope keys ===")
+    await asyncio.gather(
+        scoped(None, "analyst", ["Books", "Toys"], "Books"),    # two analysts, same scope
+        scoped(None, "analyst", ["Toys", "Books"], "Books"),
+        scoped(None, "admin", [], "Books"),
+        scoped(None, "admin", [], "Books", None),              # defaults normalized
+        scoped(None, "analyst", ["Books"], "Books"),            # narrower scope: own run
+    )
+    ok &= check("same scope + args share one run, other scopes run separately",
+                scoped.flight.stats()["started"] == 3 and scoped.flight.stats()["shared"] == 2)
+
+    print("\n=== Dashboard fill ===")
+    computed = []
+
+    async def compute(db, role, allowed_cats, date_from=None, date_to=None):
+        computed.append(role)
+        run = len(computed)
+        await asyncio.sleep(0.1)
+        return {"run": run}
+
+    original = svc._compute_dashboard_stats
+    svc._compute_dashboard_stats = compute
+    try:
+        stale, fresh, shared = await asyncio.gather(
+            svc._fill_dashboard_cache(None, "admin", 1, "admin", []),
+            svc._fill_dashboard_cache(None, "admin", 2, "admin", []),   # an upload bumped the version
+            svc._fill_dashboard_cache(None, "admin", 2, "admin", []),
+        )
+    finally:
+        svc._compute_dashboard_stats = original
+    ok &= check("a newer data version does not join the older computation",
+                len(computed) == 2 and stale != fresh and fresh is shared)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,110 @@
+"""
+test_summary_store.py — Checks app/services/summary_store.py (fake DB and Gemini, no network)
+
+  - a miss asks Gemini once and stores the summary; the next request is
+    served from the store and stamps last_used,
+  - an empty Gemini response (text=None) is neither returned nor stored:
+    the caller gets the same message as summarize_reviews, and the next
+    request asks Gemini again,
+  - a failing call is reported the same way and not stored either.
+
+Usage:
+    cd backend
+    python test_summary_store.py
+"""
+import os
+import asyncio
+from types import SimpleNamespace
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from app.services import llm_service
+from app.services.summary_store import get_summary
+from app.services.llm_service import summarize_reviews
+
+REVIEWS = [
+    {"rating": 1, "review_text": "Stopped charging after a week."},
+    {"rating": 5, "review_text": "Great sound for the price."},
+]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one_and_update(self, query, update, projection=None):
+        doc = self.docs.get(query["_id"])
+        if doc is not None:
+            doc.update(update["$set"])
+        return doc
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {}).update(update.get("$set", {}))
+
+
+class FakeDB:
+    def __init__(self):
+        self.review_summaries = FakeCollection()
+        self.summary_views = FakeCollection()
+
+
+class FakeGateway:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    async def generate_content(self, **kwargs):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(text=reply)
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    original = llm_service.gateway
+    try:
+        print("\n=== Stored summaries ===")
+        db = FakeDB()
+        llm_service.gateway = FakeGateway("- Battery complaints\n- Sound praised")
+        first = await get_summary(db, "Summarize these reviews.", REVIEWS, product_id=3)
+        ok &= check("miss generates and stores", first.startswith("- Battery") and len(db.review_summaries.docs) == 1)
+        again = await get_summary(db, "Summarize these reviews.", REVIEWS, product_id=3)
+        ok &= check("hit served from the store", again == first and llm_service.gateway.calls == 1)
+        ok &= check("hit stamps last_used", "last_used" in next(iter(db.review_summaries.docs.values())))
+
+        print("\n=== Empty response ===")
+        db = FakeDB()
+        llm_service.gateway = FakeGateway(None)
+        expected = await summarize_reviews("Summarize these reviews.", REVIEWS)
+        llm_service.gateway = FakeGateway(None, "- Finally a summary")
+        empty = await get_summary(db, "Summarize these reviews.", REVIEWS, product_id=3)
+        ok &= check("text=None returns the summarize_reviews message, not None",
+                    isinstance(empty, str) and empty == expected and "summarization" in empty.lower())
+        ok &= check("nothing stored", db.review_summaries.docs == {})
+        retry = await get_summary(db, "Summarize these reviews.", REVIEWS, product_id=3)
+        ok &= check("next request asks Gemini again and stores the answer",
+                    retry == "- Finally a summary" and llm_service.gateway.calls == 2
+                    and len(db.review_summaries.docs) == 1)
+
+        print("\n=== Failed call ===")
+        db = FakeDB()
+        llm_service.gateway = FakeGateway(ConnectionError("connection reset"))
+        failed = await get_summary(db, "Summarize these reviews.", REVIEWS, product_id=3)
+        ok &= check("error reported, not stored",
+                    failed == "Error during summarization: connection reset" and db.review_summaries.docs == {})
+    finally:
+        llm_service.gateway = original
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,134 @@
+"""
+test_tool_registry.py — Checks app/services/tool_registry.py (no DB needed)
+
+  - the six chat tools are registered and offered to Gemini,
+  - args are validated / coerced against the declared schema,
+  - a handler past its deadline returns an error instead of hanging,
+  - results are cached per scope + args and dropped when the data version moves,
+  - calls, errors and latencies are counted per tool.
+
+Usage:
+    cd backend
+    python test_tool_registry.py
+"""
+import os
+import asyncio
+
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+from google.genai import types
+
+from app.services.chat_tools import registry as chat_registry
+from app.services.llm_service import TOOLS
+from app.services.tool_registry import ToolRegistry, validate_args
+from app.services.stats_service import data_version
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    async def find_one(self, query):
+        return next((d for d in self.docs if d["_id"] == query["_id"]), None)
+
+    def find(self, query):
+        rows = [d for d in self.docs if d.get("user_id") == query.get("user_id")]
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return rows
+        return Cursor()
+
+
+class FakeDB:
+    def __init__(self):
+        self.cache_versions = FakeCollection([{"_id": "review_data", "version": 1}])
+        self.analyst_category = FakeCollection([{"user_id": "a1", "category": "Books"}])
+
+
+registry = ToolRegistry(cache_size=16)
+runs = {"count": 0}
+
+
+@registry.tool(
+    types.FunctionDeclaration(
+        name="count",
+        description="test tool",
+        parameters=types.Schema(
+            type="OBJECT",
+            properties={
+                "category": types.Schema(type="STRING"),
+                "ids": types.Schema(type="ARRAY", items=types.Schema(type="INTEGER"), min_items=2, max_items=3),
+                "delay": types.Schema(type="NUMBER"),
+                "date_from": types.Schema(type="STRING"),
+            },
+            required=["category"]
+        )
+    ),
+    timeout=0.2, cache_ttl=60
+)
+async def _count(db, user_id, role, args, date_from, date_to):
+    runs["count"] += 1
+    await asyncio.sleep(args.get("delay", 0))
+    return {"category": args["category"], "ids": args.get("ids"), "run": runs["count"]}, None
+
+
+def check(name, cond):
+    print(f"  {'PASS' if cond else 'FAIL'}  {name}")
+    return bool(cond)
+
+
+async def main():
+    ok = True
+    db = FakeDB()
+
+    print("\n=== Chat tools ===")
+    names = [f.name for f in TOOLS[0].function_declarations]
+    ok &= check("six tools offered to Gemini, in registration order", names == chat_registry.names and len(names) == 6)
+
+    print("\n=== Validation ===")
+    schema = registry.specs["count"].declaration.parameters
+    ok &= check("floats coerced to ints, unknown keys dropped",
+                validate_args(schema, {"category": " Books ", "ids": [1.0, 2], "x": 1}) == {"category": "Books", "ids": [1, 2]})
+    result, _ = await registry.dispatch("count", {"ids": [1, 2]}, db, "u", "admin")
+    ok &= check("missing required arg reported", result == {"error": "'category' is required"})
+    result, _ = await registry.dispatch("count", {"category": "Books", "ids": [1, 2, 3, 4]}, db, "u", "admin")
+    ok &= check("array length checked", "error" in result and "2 to 3" in result["error"])
+    result, _ = await registry.dispatch("count", {"category": "Books", "date_from": "March"}, db, "u", "admin")
+    ok &= check("bad date reported", result == {"error": "Invalid date range; dates must be YYYY-MM-DD"})
+    result, _ = await registry.dispatch("nope", {}, db, "u", "admin")
+    ok &= check("unknown tool reported", result == {"error": "Unknown tool: nope"})
+    ok &= check("handler never ran", runs["count"] == 0)
+
+    print("\n=== Deadline ===")
+    result, _ = await registry.dispatch("count", {"category": "Slow", "delay": 1}, db, "u", "admin")
+    ok &= check("slow handler times out", result == {"error": "count timed out after 0.2s"})
+
+    print("\n=== Result cache ===")
+    first, _ = await registry.dispatch("count", {"category": "Books"}, db, "u", "admin")
+    again, _ = await registry.dispatch("count", {"category": "Books"}, db, "u2", "admin")
+    ok &= check("same scope + args served from cache", again == first)
+    analyst, _ = await registry.dispatch("count", {"category": "Books"}, db, "a1", "analyst")
+    ok &= check("different scope runs again", analyst["run"] != first["run"])
+    again["category"] = "mutated"
+    third, _ = await registry.dispatch("count", {"category": "Books"}, db, "u", "admin")
+    ok &= check("callers get copies", third == first)
+    db.cache_versions.docs[0]["version"] = 2
+    data_version._checked_at = float("-inf")
+    fresh, _ = await registry.dispatch("count", {"category": "Books"}, db, "u", "admin")
+    ok &= check("data version change drops cached results", fresh["run"] != first["run"])
+
+    print("\n=== Stats ===")
+    stats = registry.stats()["tools"]["count"]
+    ok &= check("calls / invalid / timeouts / hits counted",
+                stats["calls"] == 9 and stats["invalid_args"] == 3 and stats["timeouts"] == 1
+                and stats["cache_hits"] == 2)
+    ok &= check("latency histogram covers executed calls", stats["latency_ms"]["count"] == 4
+                and stats["latency_ms"]["max"] >= 200)
+
+    print("\nALL PASS" if ok else "\nSOME CHECKS FAILED")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -1,17 +1,25 @@
 """
 test_tools.py — Direct test of the Phase 3/4 tool dispatcher (no LLM needed).
-Tests all 6 tools against the live DB. Run from backend/ directory.
+Tests all 6 tools, and a compound (multi-call) dispatch, against the live DB.
+The compound-question test routes through _choose_tools with Gemini replaced
+by fake_gemini_server.py on a free local port.
+Run from backend/ directory.
 
 Usage:
     cd backend
     python test_tools.py
 """
-import asyncio, os
+import asyncio, os, socket, threading, time
 from dotenv import load_dotenv
 load_dotenv()
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import uvicorn
 
 from app.database import get_db
-from app.services.llm_service import _dispatch_tool
+from app.services.llm_service import _dispatch_tool, _dispatch_all, _choose_tools
+from app.services.gemini_gateway import gateway, make_client
+from fake_gemini_server import create_app as create_fake_gemini
 
 # ─── Config ───────────────────────────────────────────────────────────────────
 ADMIN_USER_ID = 1
@@ -44,6 +52,19 @@ async def auto_detect_test_data(db):
     print(f"  Auto-detected → Category: {TEST_CATEGORY!r}, Products: {TEST_PRODUCT_ID_1}, {TEST_PRODUCT_ID_2}\n")
 
 
+def use_fake_gemini():
+    """Point the gateway at a fake Gemini server running in a background thread."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_fake_gemini(latency_ms=5), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{port}"
+    gateway.client = make_client()
+
+
 async def run_tests():
     db = await get_db()
     await auto_detect_test_data(db)
@@ -55,7 +76,7 @@ async def run_tests():
     results = []
 
     # ── Test 1: get_nps ───────────────────────────────────────────────────────
-    print(f"[1/6] Testing get_nps — category={TEST_CATEGORY!r}")
+    print(f"[1/8] Testing get_nps — category={TEST_CATEGORY!r}")
     try:
         r, _ = await _dispatch_tool("get_nps", {"category": TEST_CATEGORY}, db, ADMIN_USER_ID, ADMIN_ROLE)
         assert "nps" in r, f"Missing 'nps' key: {r}"
@@ -67,7 +88,7 @@ async def run_tests():
         results.append(False)
 
     # ── Test 2: get_best_worst_products ───────────────────────────────────────
-    print(f"\n[2/6] Testing get_best_worst_products — category={TEST_CATEGORY!r}")
+    print(f"\n[2/8] Testing get_best_worst_products — category={TEST_CATEGORY!r}")
     try:
         r, chart = await _dispatch_tool("get_best_worst_products", {"category": TEST_CATEGORY}, db, ADMIN_USER_ID, ADMIN_ROLE)
         assert "top_products" in r, f"Missing 'top_products': {r}"
@@ -81,7 +102,7 @@ async def run_tests():
 
     # ── Test 3: get_product_sentiment ─────────────────────────────────────────
     if TEST_PRODUCT_ID_1:
-        print(f"\n[3/6] Testing get_product_sentiment — product_id={TEST_PRODUCT_ID_1}")
+        print(f"\n[3/8] Testing get_product_sentiment — product_id={TEST_PRODUCT_ID_1}")
         try:
             r, chart = await _dispatch_tool("get_product_sentiment", {"product_id": TEST_PRODUCT_ID_1}, db, ADMIN_USER_ID, ADMIN_ROLE)
             assert "happy" in r and "unhappy" in r, f"Missing sentiment keys: {r}"
@@ -92,11 +113,11 @@ async def run_tests():
             print(f"  ❌ FAILED: {e}")
             results.append(False)
     else:
-        print("\n[3/6] ⚠️  Skipped (no product ID found)")
+        print("\n[3/8] ⚠️  Skipped (no product ID found)")
         results.append(None)
 
     # ── Test 4: get_trend ─────────────────────────────────────────────────────
-    print(f"\n[4/6] Testing get_trend — category={TEST_CATEGORY!r}")
+    print(f"\n[4/8] Testing get_trend — category={TEST_CATEGORY!r}")
     try:
         r, chart = await _dispatch_tool("get_trend", {"category": TEST_CATEGORY}, db, ADMIN_USER_ID, ADMIN_ROLE)
         assert "labels" in r and "nps_trend" in r, f"Missing trend keys: {r}"
@@ -110,7 +131,7 @@ async def run_tests():
 
     # ── Test 5: compare_products ──────────────────────────────────────────────
     if TEST_PRODUCT_ID_1 and TEST_PRODUCT_ID_2:
-        print(f"\n[5/6] Testing compare_products — ids={[TEST_PRODUCT_ID_1, TEST_PRODUCT_ID_2]}")
+        print(f"\n[5/8] Testing compare_products — ids={[TEST_PRODUCT_ID_1, TEST_PRODUCT_ID_2]}")
         try:
             r, chart = await _dispatch_tool("compare_products", {"product_ids": [TEST_PRODUCT_ID_1, TEST_PRODUCT_ID_2]}, db, ADMIN_USER_ID, ADMIN_ROLE)
             assert "products" in r and len(r["products"]) >= 1, f"No products in compare result: {r}"
@@ -123,12 +144,12 @@ async def run_tests():
             print(f"  ❌ FAILED: {e}")
             results.append(False)
     else:
-        print("\n[5/6] ⚠️  Skipped (need 2 product IDs)")
+        print("\n[5/8] ⚠️  Skipped (need 2 product IDs)")
         results.append(None)
 
     # ── Test 6: summarize_product_reviews ─────────────────────────────────────
     if TEST_PRODUCT_ID_1:
-        print(f"\n[6/6] Testing summarize_product_reviews — product_id={TEST_PRODUCT_ID_1}")
+        print(f"\n[6/8] Testing summarize_product_reviews — product_id={TEST_PRODUCT_ID_1}")
         try:
             r, chart = await _dispatch_tool(
                 "summarize_product_reviews",
@@ -146,9 +167,46 @@ async def run_tests():
             print(f"  ❌ FAILED: {e}")
             results.append(False)
     else:
-        print("\n[6/6] ⚠️  Skipped (no product ID found)")
+        print("\n[6/8] ⚠️  Skipped (no product ID found)")
         results.append(None)
 
+    # ── Test 7: several tools in one turn ─────────────────────────────────────
+    print("\n[7/8] Testing compound dispatch — get_nps + get_trend + bad call")
+    try:
+        calls = [
+            ("get_nps", {"category": TEST_CATEGORY}),
+            ("get_trend", {"category": TEST_CATEGORY}),
+            ("get_nps", {}),   # missing argument: reported as an error, others still run
+        ]
+        rs, charts = await _dispatch_all(calls, db, ADMIN_USER_ID, ADMIN_ROLE)
+        assert len(rs) == 3 and "nps" in rs[0] and "labels" in rs[1], f"Unexpected results: {rs}"
+        assert "error" in rs[2], f"Bad call should report an error: {rs[2]}"
+        assert len(charts) == 1 and charts[0].get("type") == "line", f"Bad charts: {charts}"
+        print(f"  ✅ {len(rs)} results in call order, {len(charts)} chart(s)")
+        results.append(True)
+    except Exception as e:
+        print(f"  ❌ FAILED: {e}")
+        results.append(False)
+
+    # ── Test 8: a compound question goes to Gemini and every call runs ───────
+    print("\n[8/8] Testing compound question — two categories + a trend through _choose_tools")
+    try:
+        categories = await db.products.distinct("category")
+        other = next((c for c in categories if c != TEST_CATEGORY), TEST_CATEGORY)
+        # The fake Gemini answers one call per ";"-separated clause
+        query = f"What is the NPS of {TEST_CATEGORY} and {other}; show the trend for {TEST_CATEGORY}"
+        use_fake_gemini()
+        calls, routed_by, _ = await _choose_tools(query, query, db, None)
+        assert routed_by == "gemini", f"Compound question was routed locally: {calls}"
+        assert [name for name, _ in calls] == ["get_nps", "get_trend"], f"Unexpected calls: {calls}"
+        rs, charts = await _dispatch_all(calls, db, ADMIN_USER_ID, ADMIN_ROLE)
+        assert len(rs) == len(calls), f"Not every call was dispatched: {rs}"
+        print(f"  ✅ {len(calls)} calls chosen by Gemini, {len(rs)} results")
+        results.append(True)
+    except Exception as e:
+        print(f"  ❌ FAILED: {e}")
+        results.append(False)
+
     # ── Summary ───────────────────────────────────────────────────────────────
     passed = sum(1 for r in results if r is True)
     failed = sum(1 for r in results if r is False)
@@ -26,7 +26,8 @@ export default function Analytics() {
     const token = localStorage.getItem("token");
     const [data, setData] = useState({
         current_nps: 0,
-        trend: [0, 0, 0, 0, 0, 0],
+        trend: [],
+        trend_labels: [],
         distribution: {}
     });
 
@@ -70,7 +71,7 @@ export default function Analytics() {
     };
 
     const chartData = {
-        labels: ['Sep', 'Oct', 'Nov', 'Dec', 'Jan', 'Feb'],
+        labels: data.trend_labels || [],
         datasets: [
             {
                 label: 'NPS Score',
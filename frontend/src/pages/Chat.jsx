@@ -83,6 +83,7 @@ const TOOL_META = {
   get_trend:                { icon: "📈", label: "Trend Analysis",     color: "#3b82f6" },
   compare_products:         { icon: "⚖️",  label: "Product Comparison", color: "#8b5cf6" },
   summarize_product_reviews:{ icon: "🔍", label: "Review Summary",    color: "#ef4444" },
+  multiple:                 { icon: "🧩", label: "Multiple Analyses",  color: "#0ea5e9" },
 };
 
 function ToolBadge({ toolName }) {
@@ -149,7 +150,7 @@ export default function Chat() {
 
     try {
       const res = await askQuestion(q, token, contextProduct ? parseInt(contextProduct) : null);
-      const { answer, tool_used, chart_data } = res.data;
+      const { answer, tool_used, chart_data, charts } = res.data;
 
       setMessages(prev => {
         const updated = [...prev];
@@ -158,6 +159,7 @@ export default function Chat() {
           text: answer,
           tool_used,
           chart_data,
+          charts: charts || (chart_data ? [chart_data] : []),
           questionRef: q,
           isLoading: false
         };
@@ -285,12 +287,12 @@ export default function Chat() {
                     )}
                   </div>
 
-                  {/* Inline chart */}
-                  {m.role === "ai" && !m.isLoading && m.chart_data && (
-                    <div style={{ width: "100%" }}>
-                      <InlineChart chartData={m.chart_data} />
+                  {/* Inline charts (one per tool for compound questions) */}
+                  {m.role === "ai" && !m.isLoading && (m.charts || []).map((chart, j) => (
+                    <div key={j} style={{ width: "100%" }}>
+                      <InlineChart chartData={chart} />
                     </div>
-                  )}
+                  ))}
 
                   {/* Save button */}
                   {m.role === "ai" && !m.isLoading && !m.isError && m.text && (